@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import shlex
+import subprocess
+import time
+from typing import Iterable, List, Optional, Set
+
+from giftmaster import logger as loggermod
+from giftmaster import parse, signtool
+
+STREAM_LIMIT = 1 << 20
+
+
+class SigntoolTimeoutException(Exception):
+    def __init__(self, cmd, timeout):
+        cmdline = shlex.join(loggermod.mask_args(cmd))
+        self.message = f"signtool didn't finish within {timeout}s: {cmdline}"
+        super().__init__(self.message)
+
+
+class AsyncSignTool(signtool.SignTool):
+    """SignTool whose invocations run on an asyncio event loop.
+
+    Output is read line by line as it arrives, so a private key failure is
+    spotted before the process exits, and an invocation running longer than
+    ``TIMEOUT`` seconds is killed.  Verify chunks of a batch are multiplexed
+    on one loop, at most ``CONCURRENCY`` processes at a time.
+    """
+
+    CONCURRENCY = 4
+    TIMEOUT = None
+
+    def run_process(self, cmd) -> subprocess.CompletedProcess:
+        if not cmd:
+            return super().run_process(cmd)
+        return asyncio.run(self.run_process_async(cmd))
+
+    async def run_process_async(self, cmd) -> subprocess.CompletedProcess:
+        logging.debug(shlex.join(loggermod.mask_args(cmd)))
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=STREAM_LIMIT,
+            )
+        except FileNotFoundError as ex:
+            logging.exception(ex)
+            raise ex
+
+        started = time.time()
+        stdout = [] if self.keeps_output() else None
+        stderr = []
+        parser = parse.OutputParser()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    self._pump(process.stdout, stdout, parser),
+                    self._pump(process.stderr, stderr, parser, stderr=True),
+                    process.wait(),
+                ),
+                timeout=type(self).TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logging.error(SigntoolTimeoutException(cmd, type(self).TIMEOUT).message)
+        except signtool.SigntoolPrivatekeyException:
+            process.kill()
+            await process.wait()
+        duration = time.time() - started
+
+        return self.completed(
+            cmd,
+            process.returncode,
+            b"".join(stdout or []).decode(errors="replace"),
+            b"".join(stderr).decode(errors="replace"),
+            started,
+            duration,
+            parser.close(),
+        )
+
+    @staticmethod
+    async def _pump(stream, sink: Optional[List[bytes]], parser, stderr=False):
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        while line := await stream.readline():
+            if sink is not None:
+                sink.append(line)
+            parser.feed(line, stderr=stderr)
+            if debug:
+                logging.debug(line.decode(errors="replace").rstrip())
+            if parser.private_key_missing:
+                raise signtool.SigntoolPrivatekeyException(line.decode())
+
+    def verify_chunks(self, chunks: Iterable[List[str]]) -> Set[str]:
+        return asyncio.run(self.verify_chunks_async(list(chunks)))
+
+    async def verify_chunks_async(self, chunks: List[List[str]]) -> Set[str]:
+        semaphore = asyncio.Semaphore(type(self).CONCURRENCY)
+        results = await asyncio.gather(
+            *(self.verify_signed_async(chunk, semaphore) for chunk in chunks)
+        )
+        return set().union(*results)
+
+    async def verify_signed_async(self, paths: List[str], semaphore) -> Set[str]:
+        if not paths:
+            return set()
+
+        async with semaphore:
+            start = time.monotonic()
+            result = await self.run_process_async(self.verify_cmd(*paths))
+            self.record_timing("verify", len(paths), time.monotonic() - start)
+        if (signed := self.verified_subset(paths, result)) is not None:
+            return signed
+
+        middle = len(paths) // 2
+        halves = await asyncio.gather(
+            self.verify_signed_async(paths[:middle], semaphore),
+            self.verify_signed_async(paths[middle:], semaphore),
+        )
+        return halves[0] | halves[1]
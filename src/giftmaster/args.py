@@ -1,7 +1,20 @@
 import argparse
 import logging
 
-from giftmaster import __version__
+
+class _VersionAction(argparse.Action):
+    """Like action="version", but only looks the version up when asked for it"""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, help=None):
+        super().__init__(
+            option_strings, dest, default=argparse.SUPPRESS, nargs=0, help=help
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from giftmaster import __version__
+
+        print(f"giftmaster {__version__}")
+        parser.exit()
 
 
 def add_common_args(parser):
@@ -23,8 +36,54 @@ def add_common_args(parser):
     )
     parser.add_argument(
         "--version",
-        action="version",
-        version="giftmaster {ver}".format(ver=__version__),
+        action=_VersionAction,
+        help="show program's version number and exit",
+    )
+
+
+def add_backend_args(parser):
+    parser.add_argument(
+        "--backend",
+        choices=["signtool", "osslsigncode"],
+        default="signtool",
+        help="signing tool to drive; --signtool then gives the path to that tool",
+    )
+    parser.add_argument(
+        "--pkcs11-module",
+        default=None,
+        help="with --backend osslsigncode, the token's PKCS#11 library",
+    )
+    parser.add_argument(
+        "--pkcs11-key",
+        default=None,
+        help="with --backend osslsigncode, PKCS#11 URI or id of the signing key",
+    )
+    parser.add_argument(
+        "--certs",
+        default=None,
+        help="with --backend osslsigncode, the signing certificate chain",
+    )
+
+
+def add_retry_args(parser):
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="times to retry files that failed to sign for a transient reason",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        metavar="SECONDS",
+        default=1.0,
+        help="base delay before a retry, doubled (with jitter) after each one",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=int,
+        default=20,
+        help="most retries in the whole run, across all batches",
     )
 
 
@@ -44,24 +103,361 @@ def parse_args(args):
         "--dry-run",
         action="store_true",
         default=False,
-        help="don't actually run signtool if using --dry-run bool",
+        help="don't run signtool; print the batches and calls a run would make",
     )
     parser.add_argument(
         "--signtool",
         nargs="*",
-        default=[
-            r"C:\Program Files*\Windows Kits\*\bin\*\x64\signtool.exe",
-        ],
+        default=None,
         help="list of absolute paths possibly containing wildcards that will match path to signtool.exe",
     )
+    add_backend_args(parser)
     parser.add_argument(
         dest="files", help="list of absolue paths to files to sign", nargs="*"
     )
+    parser.add_argument(
+        "--files-from",
+        action="append",
+        metavar="PATH",
+        help="read files to sign from PATH, one per line; - reads stdin",
+    )
+    parser.add_argument(
+        "-0",
+        "--null",
+        action="store_true",
+        default=False,
+        help="entries in --files-from are NUL-delimited",
+    )
+    parser.add_argument(
+        "--walk",
+        action="append",
+        metavar="DIR",
+        help="sign files found by walking DIR recursively",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="with --walk, only take files whose name or relative path matches GLOB",
+    )
+    parser.add_argument(
+        "--drop-unsupported",
+        action="store_true",
+        default=False,
+        help="skip inputs that aren't PE, MSI, CAB, catalog, script or package files",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="only take files that changed since the last run, per --manifest",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="PATH",
+        default=None,
+        help="where --incremental keeps size, mtime and inode of signed files",
+    )
+    parser.add_argument(
+        "--scan-jobs",
+        type=int,
+        default=8,
+        help="with --incremental, directories of --walk scanned concurrently",
+    )
     parser.add_argument(
         "-b",
         "--batch-size",
-        help="instead of signing all files at once, sign in batches of --batch-size",
+        help="sign in batches of --batch-size files; 0 fills one command line "
+        "per batch",
         default=0,
         type=int,
     )
+    parser.add_argument(
+        "--verify-batch-size",
+        help="number of files checked per signtool verify invocation",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of batches to verify and sign concurrently",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "-k",
+        "--keep-going",
+        action="store_true",
+        default=False,
+        help="keep signing the remaining batches after a batch fails",
+    )
+    parser.add_argument(
+        "--token-jobs",
+        help="maximum number of concurrent sign calls against one hardware token",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--target",
+        action="append",
+        metavar="SPEC",
+        help="spread batches over signing targets: local:TOKEN[@SIGNTOOL] signs "
+        "here with another token, remote:SOCKET sends to a giftmaster server; "
+        "repeat for each target",
+    )
+    parser.add_argument(
+        "--target-retries",
+        default=2,
+        type=int,
+        help="times a batch that fails on one target is retried on another",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["subprocess", "asyncio"],
+        default="subprocess",
+        help="how signtool processes are run; asyncio multiplexes verify calls",
+    )
+    parser.add_argument(
+        "--timeout",
+        default=None,
+        type=float,
+        help="with --engine asyncio, kill a signtool call after this many seconds",
+    )
+    parser.add_argument(
+        "--verify-jobs",
+        default=4,
+        type=int,
+        help="with --engine asyncio, concurrent verify calls per batch",
+    )
+    parser.add_argument(
+        "--timestamp-url",
+        action="append",
+        metavar="URL",
+        help="RFC 3161 timestamp server to use; repeat to give several",
+    )
+    parser.add_argument(
+        "--timestamp-stats",
+        default=None,
+        help="where timestamp server latency and failure stats are kept between runs",
+    )
+    add_retry_args(parser)
+    parser.add_argument(
+        "--timings",
+        metavar="PATH",
+        default=None,
+        help="where signtool call durations are kept for --dry-run estimates",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="path to the signature cache database (default: per-user cache dir)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="don't consult or update the signature cache",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        default=False,
+        help="discard the signature cache and repopulate it from this run",
+    )
+    parser.add_argument(
+        "--sign-once",
+        action="store_true",
+        default=False,
+        help="sign one file per unique content and copy it over identical files",
+    )
+    parser.add_argument(
+        "--artifact-store",
+        metavar="DIR",
+        default=None,
+        help="keep signed binaries in DIR and reuse them; implies --sign-once",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="path of the signtool run journal "
+        "(default: journal/giftmaster-<time>-<id>.jsonl in the per-user cache dir)",
+    )
+    parser.add_argument(
+        "--journal-level",
+        choices=["off", "summary", "failures", "all"],
+        default="failures",
+        help="how much of each signtool invocation to keep in the journal",
+    )
+    parser.add_argument(
+        "--journal-max-bytes",
+        default=64 << 20,
+        type=int,
+        help="rotate the journal after this many bytes",
+    )
+    parser.add_argument(
+        "--journal-compress",
+        action="store_true",
+        default=False,
+        help="gzip the journal",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        default=None,
+        help="where progress is recorded after every batch "
+        "(default: one per working directory and inputs in the per-user "
+        "cache dir)",
+    )
+    parser.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        default=False,
+        help="don't record progress",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="skip files that --checkpoint records as done by an earlier run",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        default=False,
+        help="log per-phase timings and counters at the end of the run",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        metavar="PATH",
+        default=None,
+        help="write metrics as a Prometheus textfile (implies --metrics)",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="PATH",
+        default=None,
+        help="write metrics as OpenTelemetry-style JSON (implies --metrics)",
+    )
+    return parser.parse_args(args)
+
+
+def add_socket_arg(parser):
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Unix socket path, pipe:NAME or tcp:HOST:PORT of the giftmaster server "
+        "(default: a per-user named pipe on Windows, else giftmaster.sock in the "
+        "per-user cache dir)",
+    )
+    parser.add_argument(
+        "--key-file",
+        metavar="PATH",
+        default=None,
+        help="secret shared by server and clients (default: server.key in the "
+        "per-user cache dir, created by the server)",
+    )
+
+
+def parse_serve_args(args):
+    """Parse ``giftmaster serve`` command line parameters"""
+    parser = argparse.ArgumentParser(
+        prog="giftmaster serve",
+        description="Sign files submitted by giftmaster submit clients",
+    )
+    add_common_args(parser)
+    add_socket_arg(parser)
+    parser.add_argument(
+        "--signtool",
+        nargs="*",
+        default=None,
+        help="paths possibly containing wildcards that will match signtool.exe",
+    )
+    add_backend_args(parser)
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        help="most files merged into one batch from queued requests; 0 is no limit",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--window",
+        help="seconds to wait after a request for others to merge into its batch",
+        default=0.05,
+        type=float,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of batches signed concurrently across all clients",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--token-jobs",
+        help="maximum number of concurrent sign calls against one hardware token",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--timestamp-url",
+        action="append",
+        metavar="URL",
+        help="RFC 3161 timestamp server to use; repeat to give several",
+    )
+    parser.add_argument(
+        "--timestamp-stats",
+        default=None,
+        help="where timestamp server latency and failure stats are kept between runs",
+    )
+    add_retry_args(parser)
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="path to the signature cache database (default: per-user cache dir)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="don't consult or update the signature cache",
+    )
+    return parser.parse_args(args)
+
+
+def parse_submit_args(args):
+    """Parse ``giftmaster submit`` command line parameters"""
+    parser = argparse.ArgumentParser(
+        prog="giftmaster submit",
+        description="Have a running giftmaster server sign files",
+    )
+    add_common_args(parser)
+    add_socket_arg(parser)
+    parser.add_argument(dest="files", help="files to sign", nargs="*")
+    parser.add_argument(
+        "--files-from",
+        action="append",
+        metavar="PATH",
+        help="read files to sign from PATH, one per line; - reads stdin",
+    )
+    parser.add_argument(
+        "-0",
+        "--null",
+        action="store_true",
+        default=False,
+        help="entries in --files-from are NUL-delimited",
+    )
+    parser.add_argument(
+        "--timeout",
+        default=None,
+        type=float,
+        help="give up waiting for the server after this many seconds",
+    )
+    parser.add_argument(
+        "--shutdown",
+        action="store_true",
+        default=False,
+        help="ask the server to exit once running batches finish",
+    )
     return parser.parse_args(args)
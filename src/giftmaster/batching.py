@@ -0,0 +1,47 @@
+import subprocess
+from typing import Iterable, Iterator, List
+
+# CreateProcess caps lpCommandLine at 32,767 UTF-16 code units including the
+# terminating NUL.
+CMDLINE_LIMIT = 32767
+
+
+def encoded_length(s: str) -> int:
+    """Length of s in UTF-16 code units, as CreateProcess counts it"""
+    return len(s.encode("utf-16-le")) // 2
+
+
+def cmdline_length(args: List[str]) -> int:
+    """Length of the command line Windows builds from args, without the NUL"""
+    return encoded_length(subprocess.list2cmdline(args))
+
+
+def pack(
+    paths: Iterable[str],
+    prefix: List[str],
+    limit: int = CMDLINE_LIMIT,
+    max_files: int = 0,
+) -> Iterator[List[str]]:
+    """Split paths into chunks so that prefix + chunk fits in limit.
+
+    Chunks are filled greedily in input order, and hold at most max_files
+    paths when that is set.  Raises ValueError for a path that can't fit on a
+    command line of its own.
+    """
+    budget = limit - 1
+    base = cmdline_length(prefix)
+    chunk, length = [], base
+    for path in paths:
+        size = 1 + cmdline_length([path])
+        if base + size > budget:
+            raise ValueError(
+                f"{path} doesn't fit on a {limit:,d} character command line"
+            )
+        full = max_files and len(chunk) >= max_files
+        if chunk and (full or length + size > budget):
+            yield chunk
+            chunk, length = [], base
+        chunk.append(path)
+        length += size
+    if chunk:
+        yield chunk
@@ -0,0 +1,374 @@
+"""
+Throughput benchmark for :func:`giftmaster.skeleton.client`.
+
+Every scenario signs a freshly generated synthetic tree with the fake
+signtool from :mod:`giftmaster.fakesigntool`, in a child process of its own
+so that peak RSS is per scenario.  Results are printed, or written with
+``--output``, as JSON so runs from different releases can be compared.
+
+``--parse MB`` instead measures :mod:`giftmaster.parse` on synthetic
+``verify /v`` and ``sign /v`` output of about that size.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from giftmaster import __version__
+from giftmaster import args as argsmod
+from giftmaster import fakesigntool, logger
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+def synthetic_pe(size: int = 4096, signed: bool = False) -> bytes:
+    """A PE32+ header padded to size; signed ones carry a certificate table"""
+    e_lfanew = 0x80
+    data = bytearray(max(size, 0x200))
+    data[:2] = b"MZ"
+    struct.pack_into("<I", data, 0x3C, e_lfanew)
+    data[e_lfanew : e_lfanew + 4] = b"PE\0\0"
+    optional = e_lfanew + 24
+    struct.pack_into("<HI", data, optional, 0x20B, 0)
+    struct.pack_into("<I", data, optional + 108, 16)
+    if signed:
+        struct.pack_into("<II", data, optional + 112 + 8 * 4, len(data), 8)
+        return bytes(data) + fakesigntool.MARKER
+    return bytes(data)
+
+
+def make_tree(
+    root, count: int, size: int = 4096, per_dir: int = 100, signed_ratio=0.0, seed=0
+) -> List[str]:
+    """Create count synthetic PE files below root and return their paths"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        directory = os.path.join(root, f"d{i // per_dir:04d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i:07d}.dll")
+        with open(path, "wb") as f:
+            f.write(synthetic_pe(size, signed=rng.random() < signed_ratio))
+        paths.append(path)
+    return paths
+
+
+def peak_rss_kib() -> int:
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def run_scenario(scenario: Dict) -> Dict:
+    """Sign one synthetic tree in this process and return its measurements"""
+    from giftmaster import signtool, skeleton
+
+    workdir = tempfile.mkdtemp(prefix="giftmaster-bench-")
+    try:
+        tool = fakesigntool.install(os.path.join(workdir, "bin"))
+        calls = os.path.join(workdir, "calls.txt")
+        os.environ.update(
+            {
+                "FAKE_SIGNTOOL_CALLS": calls,
+                "FAKE_SIGNTOOL_VERIFY_LATENCY": str(scenario["verify_latency"]),
+                "FAKE_SIGNTOOL_SIGN_LATENCY": str(scenario["sign_latency"]),
+                "FAKE_SIGNTOOL_TSA_DELAY": str(scenario["tsa_delay"]),
+                "FAKE_SIGNTOOL_FAILURE_RATE": str(scenario["failure_rate"]),
+            }
+        )
+        os.environ.setdefault("SAFENET_CLIENT_CREDENTIALS", "YmVuY2g=")
+        signtool.SignTool.journal = None
+
+        files = make_tree(
+            os.path.join(workdir, "tree"),
+            scenario["files"],
+            size=scenario["size"],
+            signed_ratio=scenario["signed_ratio"],
+        )
+
+        start = time.perf_counter()
+        results = skeleton.client(
+            iter(files),
+            [str(tool)],
+            scenario["batch_size"],
+            jobs=scenario["jobs"],
+            keep_going=True,
+            token_jobs=scenario["token_jobs"],
+        )
+        elapsed = time.perf_counter() - start
+
+        with open(calls) as f:
+            spawns = sum(1 for _ in f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        **scenario,
+        "seconds": round(elapsed, 4),
+        "files_per_second": round(scenario["files"] / elapsed, 2),
+        "spawns": spawns,
+        "spawns_per_file": round(spawns / max(scenario["files"], 1), 4),
+        "batches": len(results),
+        "failed_batches": sum(not result.ok for result in results),
+        "signed": sum(len(result.signed) for result in results),
+        "peak_rss_kib": peak_rss_kib(),
+    }
+
+
+VERIFY_ENTRY = """Verifying: {path}
+
+Signature Index: 0 (Primary Signature)
+Hash of file (sha256): {digest}
+
+Signing Certificate Chain:
+    Issued to: Sectigo Public Code Signing Root R46
+    Issued by: Sectigo Public Code Signing Root R46
+    Expires:   Fri Mar 22 00:00:00 2046
+    SHA1 hash: {digest40}
+
+        Issued to: Sectigo Public Code Signing CA EV R36
+        Issued by: Sectigo Public Code Signing Root R46
+        Expires:   Sat Mar 22 00:00:00 2036
+        SHA1 hash: {digest40}
+
+            Issued to: Streambox Inc.
+            Issued by: Sectigo Public Code Signing CA EV R36
+            Expires:   Wed Jan 21 00:00:00 2026
+            SHA1 hash: {digest40}
+
+The signature is timestamped: Mon Jun 02 10:21:13 2025
+Timestamp Verified by:
+    Issued to: DigiCert Trusted Root G4
+    Issued by: DigiCert Trusted Root G4
+    Expires:   Fri Jan 15 00:00:00 2038
+    SHA1 hash: {digest40}
+
+"""
+
+SIGN_ENTRY = """Done Adding Additional Store
+Successfully signed: {path}
+
+"""
+
+
+def synthetic_output(command: str, megabytes: float, signed_ratio=0.9, seed=0):
+    """(stdout, stderr, files) of signtool verbose output about megabytes long"""
+    rng = random.Random(seed)
+    entry = VERIFY_ENTRY if command == "verify" else SIGN_ENTRY
+    stdout, stderr = [], []
+    size = files = ok = 0
+    while size < megabytes * (1 << 20):
+        path = f"C:\\build\\out\\d{files // 100:04d}\\file{files:07d}.dll"
+        digest = f"{rng.getrandbits(256):064X}"
+        if rng.random() < signed_ratio:
+            text = entry.format(path=path, digest=digest, digest40=digest[:40])
+            if command == "verify":
+                text += f"Successfully verified: {path}\n\n"
+            ok += 1
+        elif command == "verify":
+            text = f"Verifying: {path}\n\n"
+            stderr.append(b"SignTool Error: No signature found.\r\n")
+        else:
+            text = ""
+            stderr.append(f"SignTool Error: {path}\r\n".encode())
+        chunk = text.replace("\n", "\r\n").encode()
+        stdout.append(chunk)
+        size += len(chunk)
+        files += 1
+    counted = "Verified" if command == "verify" else "Signed"
+    stdout.append(f"Number of files successfully {counted}: {ok}\r\n".encode())
+    return b"".join(stdout), b"".join(stderr), files
+
+
+def run_parse_scenario(scenario: Dict) -> Dict:
+    """Feed synthetic output through the parser in pipe-sized chunks"""
+    from giftmaster import parse
+
+    stdout, stderr, files = synthetic_output(scenario["command"], scenario["megabytes"])
+    chunk = scenario["chunk_size"]
+    start = time.perf_counter()
+    parser = parse.OutputParser()
+    for i in range(0, len(stdout), chunk):
+        parser.feed(stdout[i : i + chunk])
+    for i in range(0, len(stderr), chunk):
+        parser.feed(stderr[i : i + chunk], stderr=True)
+    parser.close()
+    elapsed = time.perf_counter() - start
+
+    size = len(stdout) + len(stderr)
+    return {
+        **scenario,
+        "bytes": size,
+        "files": files,
+        "parsed": len(parser.files),
+        "seconds": round(elapsed, 4),
+        "megabytes_per_second": round(size / (1 << 20) / elapsed, 2),
+        "files_per_second": round(files / elapsed, 2),
+    }
+
+
+def run_isolated(scenario: Dict) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "giftmaster.bench", "--scenario", json.dumps(scenario)],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return json.loads(proc.stdout)
+
+
+def scenarios(args) -> List[Dict]:
+    if args.parse:
+        return [
+            {
+                "command": command,
+                "megabytes": args.parse,
+                "chunk_size": 1 << 16,
+            }
+            for command in ("verify", "sign")
+        ]
+    return [
+        {
+            "files": args.files,
+            "size": args.size,
+            "batch_size": batch_size,
+            "jobs": jobs,
+            "token_jobs": args.token_jobs,
+            "signed_ratio": args.signed_ratio,
+            "verify_latency": args.verify_latency,
+            "sign_latency": args.sign_latency,
+            "tsa_delay": args.tsa_delay,
+            "failure_rate": args.failure_rate,
+        }
+        for batch_size, jobs in itertools.product(args.batch_sizes, args.jobs)
+    ]
+
+
+def report(results: List[Dict]) -> Dict:
+    return {
+        "giftmaster": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Measure giftmaster throughput against a fake signtool"
+    )
+    argsmod.add_common_args(parser)
+    parser.add_argument("--files", type=int, default=1000, help="files per tree")
+    parser.add_argument("--size", type=int, default=4096, help="bytes per file")
+    parser.add_argument(
+        "--batch-sizes",
+        type=int_list,
+        default=[0, 100],
+        help="comma separated --batch-size values to try",
+    )
+    parser.add_argument(
+        "--jobs", type=int_list, default=[1, 4], help="comma separated --jobs values"
+    )
+    parser.add_argument(
+        "--token-jobs",
+        type=int,
+        default=1,
+        help="concurrent sign calls allowed per token",
+    )
+    parser.add_argument(
+        "--signed-ratio",
+        type=float,
+        default=0.1,
+        help="fraction of files that start out signed",
+    )
+    parser.add_argument(
+        "--verify-latency", type=float, default=0.0, help="seconds per verified file"
+    )
+    parser.add_argument(
+        "--sign-latency", type=float, default=0.0, help="seconds per signed file"
+    )
+    parser.add_argument(
+        "--tsa-delay", type=float, default=0.0, help="timestamp seconds per file"
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="probability that signing a file fails",
+    )
+    parser.add_argument(
+        "--parse",
+        type=float,
+        metavar="MB",
+        help="benchmark output parsing on MB of synthetic signtool output instead",
+    )
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+
+    if args.scenario:
+        logging.basicConfig(level=logging.CRITICAL)
+        scenario = json.loads(args.scenario)
+        run = run_parse_scenario if "command" in scenario else run_scenario
+        json.dump(run(scenario), sys.stdout)
+        return
+
+    logger.setup_logging(args.loglevel or logging.INFO)
+    results = []
+    for scenario in scenarios(args):
+        result = run_isolated(scenario)
+        if args.parse:
+            _logger.info(
+                f"parse {result['command']} output: "
+                f"{result['megabytes_per_second']:,.1f} MB/s, "
+                f"{result['files_per_second']:,.0f} files/s"
+            )
+            results.append(result)
+            continue
+        _logger.info(
+            f"batch size {result['batch_size']}, jobs {result['jobs']}: "
+            f"{result['files_per_second']:,.1f} files/s, "
+            f"{result['spawns_per_file']:.3f} spawns/file, "
+            f"peak RSS {result['peak_rss_kib']:,d} KiB"
+        )
+        results.append(result)
+
+    output = json.dumps(report(results), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Tuple
+
+_logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def default_cache_dir() -> pathlib.Path:
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = pathlib.Path.home() / ".cache"
+    return pathlib.Path(base) / "giftmaster"
+
+
+def file_digest(path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SignatureCache:
+    """On-disk record of files already known to carry a good signature.
+
+    Entries are keyed by path and validated against size and mtime_ns; when
+    only the mtime moved the content hash decides.  The database runs in WAL
+    mode with a busy timeout so several giftmaster processes on one host can
+    share it.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS signed (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            updated REAL NOT NULL
+        )
+    """
+
+    def __init__(self, path=None, timeout: float = 30.0):
+        self.path = pathlib.Path(path or default_cache_dir() / "signed.sqlite3")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._write() as conn:
+            conn.execute(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self) -> "_Transaction":
+        return _Transaction(self._connect())
+
+    def is_signed(self, path: str) -> bool:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+
+        row = (
+            self._connect()
+            .execute(
+                "SELECT size, mtime_ns, digest FROM signed WHERE path = ?", (path,)
+            )
+            .fetchone()
+        )
+        if row is None:
+            return False
+
+        size, mtime_ns, digest = row
+        if size != st.st_size:
+            self.forget([path])
+            return False
+        if mtime_ns == st.st_mtime_ns:
+            return True
+
+        if file_digest(path) != digest:
+            self.forget([path])
+            return False
+
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE signed SET mtime_ns = ?, updated = ? WHERE path = ?",
+                (st.st_mtime_ns, time.time(), path),
+            )
+        return True
+
+    def split(self, paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Partition paths into (known signed, unknown)"""
+        signed, unknown = [], []
+        for path in paths:
+            (signed if self.is_signed(path) else unknown).append(path)
+        return signed, unknown
+
+    def record(self, paths: Iterable[str]):
+        rows = []
+        now = time.time()
+        for path in paths:
+            try:
+                st = os.stat(path)
+                rows.append((path, st.st_size, st.st_mtime_ns, file_digest(path), now))
+            except OSError as ex:
+                _logger.debug(f"not caching {path}: {ex}")
+        if not rows:
+            return
+
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO signed (path, size, mtime_ns, digest, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def forget(self, paths: Iterable[str]):
+        with self._write() as conn:
+            conn.executemany(
+                "DELETE FROM signed WHERE path = ?", [(path,) for path in paths]
+            )
+
+    def clear(self):
+        with self._write() as conn:
+            conn.execute("DELETE FROM signed")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM signed").fetchone()[0]
+
+
+class _Transaction:
+    """``with`` block that holds a write lock (BEGIN IMMEDIATE) until it exits"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def open_cache(path=None, rebuild: bool = False) -> SignatureCache:
+    cache = SignatureCache(path)
+    if rebuild:
+        _logger.info(f"clearing signature cache {cache.path}")
+        cache.clear()
+    return cache
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import threading
+from typing import Iterable, Iterator, Set
+
+_logger = logging.getLogger(__name__)
+
+
+class CheckpointInUse(RuntimeError):
+    """Another run holds the checkpoint"""
+
+
+def job_key(*inputs) -> str:
+    """Short hash of the working directory and inputs, the same on a rerun"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps([os.getcwd(), *inputs]).encode())
+    return digest.hexdigest()
+
+
+def default_path(key: str = None) -> pathlib.Path:
+    """checkpoint-<key>.jsonl in the cache dir, one per job given a job_key()"""
+    from giftmaster import cache
+
+    name = f"checkpoint-{key}.jsonl" if key else "checkpoint.jsonl"
+    return cache.default_cache_dir() / name
+
+
+def _try_lock(f) -> bool:
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class Checkpoint:
+    """Durable per-batch progress record that lets an interrupted run resume.
+
+    One JSON line is appended and fsync'ed as each batch finishes, listing
+    the files it left signed (``done``) and those still needing work
+    (``pending``), and :meth:`finish` marks a run that got to the end.  A
+    torn last line from a crash is ignored on load.
+
+    Without ``resume`` a new record is started, but one left by an
+    unfinished run is first moved aside to ``<path>.prev``, with a warning,
+    rather than lost.  A run holds an exclusive lock on ``<path>.lock``
+    until :meth:`close`; while it does, opening the same checkpoint raises
+    :class:`CheckpointInUse`.
+    """
+
+    def __init__(self, path=None, resume: bool = False):
+        self.path = pathlib.Path(path or default_path())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # the OS drops the lock if the process dies, so a crash can't leave
+        # the checkpoint locked
+        self._lockfile = open(self.path.with_name(self.path.name + ".lock"), "a")
+        if not _try_lock(self._lockfile):
+            self._lockfile.close()
+            raise CheckpointInUse(
+                f"checkpoint {self.path} is in use by another run "
+                "(use --checkpoint to give this one its own)"
+            )
+        if not resume and unfinished(self.path):
+            backup = self.path.with_name(self.path.name + ".prev")
+            _logger.warning(
+                f"checkpoint {self.path} is from an unfinished run; moved it to "
+                f"{backup} (use --resume to continue a run)"
+            )
+            self.path.replace(backup)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def completed(self) -> Set[str]:
+        """Files that a batch recorded as done, unless a later batch undid it"""
+        done = set()
+        for entry in read(self.path):
+            done.update(entry.get("done", []))
+            done.difference_update(entry.get("pending", []))
+        return done
+
+    def record(self, index: int, done: Iterable[str], pending: Iterable[str]):
+        self._write({"batch": index, "done": list(done), "pending": list(pending)})
+
+    def finish(self):
+        """Mark the run as having got to the end"""
+        self._write({"finished": True})
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._lockfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recorders:
+    """Hands each finished batch to several recorders, e.g. a checkpoint too"""
+
+    def __init__(self, *recorders):
+        self.recorders = [recorder for recorder in recorders if recorder is not None]
+
+    def record(self, index: int, done: Iterable[str], pending: Iterable[str]):
+        done, pending = list(done), list(pending)
+        for recorder in self.recorders:
+            recorder.record(index, done, pending)
+
+
+def unfinished(path) -> bool:
+    """Whether path records a run that stopped early or left files pending"""
+    finished, pending = True, set()
+    for entry in read(path):
+        if entry.get("finished"):
+            finished = True
+            continue
+        finished = False
+        pending.difference_update(entry.get("done", []))
+        pending.update(entry.get("pending", []))
+    return not finished or bool(pending)
+
+
+def skip_completed(paths: Iterable[str], done: Set[str]) -> Iterator[str]:
+    for path in paths:
+        if str(pathlib.Path(path).resolve()) not in done:
+            yield path
+
+
+def read(path) -> Iterator[dict]:
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                _logger.warning(f"ignoring torn checkpoint entry in {path}")
@@ -0,0 +1,107 @@
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Sequence
+
+from giftmaster import metrics
+
+_logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Coalescer:
+    """Merges small submissions that arrive close together into one call.
+
+    ``handler`` takes the list of submissions in a batch and returns one
+    result per submission, in the same order.  A batch is closed ``window``
+    seconds after its first submission arrives, or as soon as it holds
+    ``max_items`` items; with no window it takes only what is already
+    queued.  At most ``jobs`` batches run at once, and while all of them
+    are busy new submissions keep piling into the next batch, so the busier
+    it gets the larger the batches.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Sequence]], List],
+        jobs: int = 1,
+        window: float = 0.0,
+        max_items: int = 0,
+    ):
+        self.handler = handler
+        self.jobs = max(jobs, 1)
+        self.window = window
+        self.max_items = max_items
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.jobs)
+        self._pool = None
+        self._dispatcher = None
+
+    def start(self):
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def close(self):
+        """Finish what has been submitted, then stop"""
+        if self._dispatcher is None:
+            return
+        self._queue.put(_STOP)
+        self._dispatcher.join()
+        self._pool.shutdown(wait=True)
+        self._dispatcher = None
+
+    def submit(self, items: Sequence) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        self._queue.put((items, future))
+        return future
+
+    def _take(self):
+        """Wait for a submission, then gather others until the batch closes"""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        taken = [first]
+        count = len(first[0])
+        deadline = time.monotonic() + self.window
+        while not self.max_items or count < self.max_items:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            taken.append(item)
+            count += len(item[0])
+        return taken
+
+    def _dispatch(self):
+        while True:
+            # hold off forming a batch until a worker can run it
+            self._slots.acquire()
+            taken = self._take()
+            if taken is None:
+                self._slots.release()
+                return
+            metrics.count("coalesced_submissions", len(taken))
+            self._pool.submit(self._run, taken)
+
+    def _run(self, taken):
+        try:
+            results = self.handler([items for items, _ in taken])
+        except BaseException as ex:
+            for _, future in taken:
+                future.set_exception(ex)
+        else:
+            for (_, future), result in zip(taken, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
@@ -0,0 +1,166 @@
+"""
+Stand-in for signtool.exe so the signing pipeline can be exercised on Linux.
+
+A file counts as signed when it contains ``MARKER``; ``sign`` appends it.
+Files containing ``CORRUPT`` can't be signed.
+Every invocation is appended to ``$FAKE_SIGNTOOL_CALLS`` when that is set,
+and ``$FAKE_SIGNTOOL_TERSE`` drops the per-file verify lines so callers
+have to cope with output they can't parse.  ``$FAKE_SIGNTOOL_BUSY`` fails
+every sign as if another process held the token.
+"""
+
+import hashlib
+import os
+import pathlib
+import random
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+MARKER = b"\x00FAKESIGNED\x00"
+CORRUPT = b"\x00FAKECORRUPT\x00"
+
+OPTIONS_WITH_VALUES = {"/f", "/csp", "/kc", "/n", "/fd", "/d", "/tr", "/td"}
+FLAGS = {"/debug", "/v", "/pa", "/a", "/q"}
+
+
+def split_args(argv):
+    files = []
+    options = {}
+    it = iter(argv)
+    for arg in it:
+        if arg in OPTIONS_WITH_VALUES:
+            options[arg] = next(it)
+        elif arg in FLAGS:
+            options[arg] = True
+        else:
+            files.append(arg)
+    return options, files
+
+
+def latency(name):
+    return float(os.environ.get(f"FAKE_SIGNTOOL_{name}", 0))
+
+
+def is_signed(path):
+    return MARKER in pathlib.Path(path).read_bytes()
+
+
+def verify(files):
+    terse = os.environ.get("FAKE_SIGNTOOL_TERSE")
+    ok = 0
+    for path in files:
+        time.sleep(latency("VERIFY_LATENCY"))
+        if not terse:
+            print(f"Verifying: {path}")
+        if os.path.exists(path) and is_signed(path):
+            ok += 1
+            if not terse:
+                print(f"Successfully verified: {path}")
+        else:
+            print("SignTool Error: No signature found.", file=sys.stderr)
+        print()
+    print(f"Number of files successfully Verified: {ok}")
+    print("Number of warnings: 0")
+    print(f"Number of errors: {len(files) - ok}")
+    return 0 if ok == len(files) else 1
+
+
+SHA256_ALGORITHM = bytes.fromhex("300d06096086480165030402010500")
+TIMESTAMP_ERROR = (
+    "SignTool Error: The specified timestamp server either could not be "
+    "reached or returned an invalid response."
+)
+
+
+def timestamp(url, path):
+    if urllib.parse.urlsplit(url).hostname not in ("127.0.0.1", "localhost"):
+        return True
+
+    digest = hashlib.sha256(pathlib.Path(path).read_bytes()).digest()
+    imprint = b"\x30\x31" + SHA256_ALGORITHM + b"\x04\x20" + digest
+    body = b"\x02\x01\x01" + imprint + b"\x01\x01\xff"
+    request = urllib.request.Request(
+        url,
+        data=b"\x30" + bytes([len(body)]) + body,
+        headers={"Content-Type": "application/timestamp-query"},
+    )
+    try:
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        with opener.open(request, timeout=5) as response:
+            return response.read()[2:7] == b"\x30\x03\x02\x01\x00"
+    except OSError:
+        return False
+
+
+def is_corrupt(path):
+    return CORRUPT in pathlib.Path(path).read_bytes()
+
+
+def sign(files, url=None):
+    failure_rate = latency("FAILURE_RATE")
+    terse = os.environ.get("FAKE_SIGNTOOL_TERSE")
+    ok = 0
+    for path in files:
+        time.sleep(latency("SIGN_LATENCY") + latency("TSA_DELAY"))
+        if url and not timestamp(url, path):
+            print(TIMESTAMP_ERROR, file=sys.stderr)
+            return 1
+        if random.random() < failure_rate or is_corrupt(path):
+            print(
+                "SignTool Error: An unexpected internal error has occurred.",
+                file=sys.stderr,
+            )
+            if terse:
+                return 1
+            print(f"SignTool Error: {path}", file=sys.stderr)
+            continue
+        with open(path, "ab") as f:
+            f.write(MARKER)
+        ok += 1
+        if not terse:
+            print(f"Successfully signed: {path}")
+    print(f"Number of files successfully Signed: {ok}")
+    print("Number of warnings: 0")
+    print(f"Number of errors: {len(files) - ok}")
+    return 0 if ok == len(files) else 1
+
+
+def main(argv):
+    if calls := os.environ.get("FAKE_SIGNTOOL_CALLS"):
+        with open(calls, "a") as f:
+            f.write(" ".join(argv) + "\n")
+
+    time.sleep(latency("DELAY"))
+    if os.environ.get("FAKE_SIGNTOOL_NO_KEY") and argv[0] == "sign":
+        print("SignTool Error: No private key is available.", file=sys.stderr)
+        sys.stderr.flush()
+        time.sleep(30)
+        return 1
+
+    if os.environ.get("FAKE_SIGNTOOL_BUSY") and argv[0] == "sign":
+        print("SignTool Error: The requested resource is in use.", file=sys.stderr)
+        return 1
+
+    command, *rest = argv
+    options, files = split_args(rest)
+    if command == "verify":
+        return verify(files)
+    if command == "sign":
+        return sign(files, url=options.get("/tr"))
+    print(f"SignTool Error: Invalid command: {command}", file=sys.stderr)
+    return 1
+
+
+def install(directory, name="signtool") -> pathlib.Path:
+    """Write this module out as an executable script in directory (POSIX only)"""
+    path = pathlib.Path(directory) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"#!{sys.executable}\n" + pathlib.Path(__file__).read_text())
+    path.chmod(0o755)
+    return path
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
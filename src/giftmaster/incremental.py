@@ -0,0 +1,185 @@
+import concurrent.futures
+import json
+import logging
+import os
+import pathlib
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from giftmaster import inputs, metrics
+
+_logger = logging.getLogger(__name__)
+
+# (size, mtime_ns, inode): a file whose entry changed may have been rebuilt
+Entry = Tuple[int, int, int]
+
+
+def stat_entry(path: str) -> Optional[Entry]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _scan_dir(directory: str, root: str, include: Optional[List[str]]):
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                if include and not inputs.matches(
+                    os.path.relpath(entry.path, root), include
+                ):
+                    continue
+                st = entry.stat()
+                files.append((entry.path, (st.st_size, st.st_mtime_ns, entry.inode())))
+    except OSError as ex:
+        # like os.walk, carry on past directories that vanish or can't be read
+        _logger.warning(f"can't scan {directory}: {ex}")
+    files.sort()
+    return files, subdirs
+
+
+def scan(
+    roots: Iterable[str], include: List[str] = None, jobs: int = 8
+) -> Iterator[Tuple[str, Entry]]:
+    """Yield (path, entry) for each file below roots, scanning directories in parallel.
+
+    Every directory is one ``os.scandir`` task on a pool of ``jobs`` threads,
+    so both deep and wide trees keep the pool busy.  Paths are absolute and
+    only ordered within a directory.  ``include`` filters like ``--walk``.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        pending = {}
+        for root in roots:
+            root = os.path.abspath(root)
+            pending[pool.submit(_scan_dir, root, root, include)] = root
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                root = pending.pop(future)
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    pending[pool.submit(_scan_dir, subdir, root, include)] = root
+                yield from files
+
+
+class Manifest:
+    """The (size, mtime_ns, inode) of every file the last run left signed.
+
+    Kept as JSON; :meth:`save` replaces the file atomically.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.entries: Dict[str, Entry] = {}
+        self.load()
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            _logger.warning(f"ignoring unreadable manifest {self.path}: {ex}")
+            return
+        if data.get("version") != type(self).VERSION:
+            _logger.warning(f"ignoring manifest {self.path} from another version")
+            return
+        self.entries = {path: tuple(entry) for path, entry in data["files"].items()}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"version": type(self).VERSION, "files": self.entries})
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(data)
+        os.replace(tmp, self.path)
+
+
+class Incremental:
+    """Passes on only the inputs that changed since the last successful run.
+
+    :meth:`changed` compares the inputs, and files found by scanning the
+    walk roots, against the manifest.  Changed files are signed as usual;
+    each batch is reported to :meth:`record`, which re-stats the files it
+    left signed, since signing rewrites them.  :meth:`save` then writes the
+    manifest: unchanged files keep their entries, files that failed get
+    none so the next run tries them again, and files that disappeared from
+    a scanned root are dropped.  Files that preflight set aside, reported
+    to :meth:`dropped`, are recorded too, so they aren't classified again
+    on every run.
+    """
+
+    def __init__(self, path, jobs: int = 8):
+        self.manifest = Manifest(path)
+        self.jobs = jobs
+        self._seen: Dict[str, Entry] = {}
+        self._changed: Dict[str, str] = {}
+        self._roots: List[str] = []
+        self._dropped: Set[str] = set()
+        self.unchanged = 0
+
+    def _check(self, path: str, entry: Optional[Entry]) -> bool:
+        if entry is None:
+            # let preflight report it
+            return True
+        if self.manifest.entries.get(path) == tuple(entry):
+            self._seen[path] = entry
+            self.unchanged += 1
+            return False
+        self._changed[str(pathlib.Path(path).resolve())] = path
+        return True
+
+    def changed(
+        self,
+        paths: Iterable[str] = (),
+        roots: Iterable[str] = (),
+        include: List[str] = None,
+    ) -> Iterator[str]:
+        for path in paths:
+            if self._check(key := os.path.abspath(path), stat_entry(key)):
+                yield path
+        self._roots = [os.path.abspath(root) for root in roots]
+        for path, entry in scan(self._roots, include=include, jobs=self.jobs):
+            if self._check(path, entry):
+                yield path
+        metrics.count("files_unchanged", self.unchanged)
+        _logger.info(f"incremental: {self.unchanged:,d} file(s) unchanged")
+
+    def record(self, index: int, done: Iterable[str], pending: Iterable[str]):
+        for path in done:
+            key = self._changed.get(path, path)
+            if (entry := stat_entry(key)) is not None:
+                self._seen[key] = entry
+
+    def dropped(self, path: str):
+        # stat'ed in save(), after signing may have rewritten a duplicate's twin
+        self._dropped.add(self._changed.get(path, path))
+
+    def _scanned(self, path: str) -> bool:
+        return any(
+            path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+            for root in self._roots
+        )
+
+    def save(self):
+        changed = set(self._changed.values())
+        entries = {
+            path: entry
+            for path, entry in self.manifest.entries.items()
+            if path not in changed and not self._scanned(path)
+        }
+        entries.update(self._seen)
+        for path in self._dropped:
+            if (entry := stat_entry(path)) is not None:
+                entries[path] = entry
+        self.manifest.entries = entries
+        self.manifest.save()
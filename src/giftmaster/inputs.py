@@ -0,0 +1,87 @@
+import fnmatch
+import itertools
+import os
+import sys
+from typing import Iterable, Iterator, List
+
+from giftmaster import batching
+
+READ_CHUNK_SIZE = 1 << 16
+# room kept on a command line for the signtool path and sign options when
+# batched() packs paths by length
+PREFIX_ROOM = 4096
+
+
+def read_file_list(path: str, null: bool = False) -> Iterator[str]:
+    """Yield paths from a newline- or NUL-delimited list; ``-`` reads stdin"""
+    sep = b"\0" if null else b"\n"
+    if path == "-":
+        yield from _split(sys.stdin.buffer, sep)
+        return
+    with open(path, "rb") as f:
+        yield from _split(f, sep)
+
+
+def _split(stream, sep: bytes) -> Iterator[str]:
+    tail = b""
+    while chunk := stream.read(READ_CHUNK_SIZE):
+        *entries, tail = (tail + chunk).split(sep)
+        yield from _decode(entries)
+    yield from _decode([tail])
+
+
+def _decode(entries) -> Iterator[str]:
+    for entry in entries:
+        entry = entry.rstrip(b"\r")
+        if entry:
+            yield os.fsdecode(entry)
+
+
+def walk(root: str, include: List[str] = None) -> Iterator[str]:
+    """Yield files below root whose name or relative path matches an include glob"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if include and not matches(os.path.relpath(path, root), include):
+                continue
+            yield path
+
+
+def matches(relpath: str, include: List[str]) -> bool:
+    name = os.path.basename(relpath)
+    relpath = relpath.replace(os.sep, "/")
+    return any(
+        fnmatch.fnmatch(name, glob) or fnmatch.fnmatch(relpath, glob)
+        for glob in include
+    )
+
+
+def iter_inputs(
+    files: Iterable[str] = (),
+    files_from: List[str] = None,
+    null: bool = False,
+    walk_roots: List[str] = None,
+    include: List[str] = None,
+) -> Iterator[str]:
+    """Chain argv files, file lists and directory walks into one lazy stream"""
+    yield from files
+    for path in files_from or []:
+        yield from read_file_list(path, null=null)
+    for root in walk_roots or []:
+        yield from walk(root, include=include)
+
+
+def batched(iterable: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """Yield lists of batch_size items as they arrive.
+
+    batch_size 0 cuts a batch whenever its paths fill one command line,
+    less PREFIX_ROOM, so the input is never held in memory all at once.
+    """
+    it = iter(iterable)
+    if not batch_size:
+        limit = batching.CMDLINE_LIMIT - PREFIX_ROOM
+        yield from batching.pack(it, [], limit=limit)
+        return
+    while batch := list(itertools.islice(it, batch_size)):
+        yield batch
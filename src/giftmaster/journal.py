@@ -0,0 +1,140 @@
+import datetime
+import gzip
+import itertools
+import json
+import logging
+import os
+import pathlib
+import shlex
+import threading
+import uuid
+
+from giftmaster import logger as loggermod
+
+_logger = logging.getLogger(__name__)
+
+LEVELS = ["off", "summary", "failures", "all"]
+
+
+def default_path(run_id: str, compress: bool = False) -> pathlib.Path:
+    """giftmaster-<time>-<id>.jsonl under journal/ in the cache dir"""
+    from giftmaster import cache
+
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    name = f"giftmaster-{stamp}-{run_id[:8]}.jsonl" + (".gz" if compress else "")
+    return cache.default_cache_dir() / "journal" / name
+
+
+class RunJournal:
+    """Append-only JSON-lines record of every signtool invocation in a run.
+
+    ``level`` controls how much is kept: ``summary`` records the command, exit
+    code and duration; ``failures`` adds the captured output of invocations
+    that failed or wrote to stderr; ``all`` keeps output for every
+    invocation.  The file is rotated once ``max_bytes`` have been written,
+    keeping ``backups`` old files, and gzip-compressed when ``compress`` is
+    set.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        level: str = "failures",
+        max_bytes: int = 64 << 20,
+        backups: int = 3,
+        compress: bool = False,
+    ):
+        if level not in LEVELS:
+            raise ValueError(f"journal level must be one of {LEVELS}, not {level!r}")
+
+        self.run_id = uuid.uuid4().hex
+        self.path = pathlib.Path(path or default_path(self.run_id, compress))
+        self.level = level
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._file = None
+        self._written = 0
+
+    @property
+    def wants_output(self) -> bool:
+        """Whether record() may keep an invocation's stdout and stderr"""
+        return self.level in ("failures", "all")
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compress:
+            return gzip.open(self.path, "at", encoding="utf-8")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._written = 0
+
+    def record(
+        self, cmd, returncode: int, stdout: str, stderr: str, started: float, duration
+    ) -> str:
+        """Append one invocation and return its id"""
+        invocation_id = f"{self.run_id}-{next(self._counter):06d}"
+        if self.level == "off":
+            return invocation_id
+
+        entry = {
+            "id": invocation_id,
+            "started": datetime.datetime.fromtimestamp(started).isoformat(),
+            "duration": round(duration, 6),
+            "returncode": returncode,
+            # mask before quoting: a quoted password is one word to signtool but
+            # not to SensitiveFormatter's pattern
+            "cmd": shlex.join(loggermod.mask_args(cmd)),
+        }
+        failed = bool(returncode) or bool(stderr)
+        if self.level == "all" or (self.level == "failures" and failed):
+            entry["stdout"] = stdout
+            entry["stderr"] = stderr
+
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = self._open()
+            self._file.write(line)
+            if not self.compress:
+                self._file.flush()
+            self._written += len(line)
+            if self._written >= self.max_bytes:
+                self._rotate()
+
+        return invocation_id
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read(path):
+    """Yield the entries of a journal file, compressed or not"""
+    path = pathlib.Path(path)
+    opener = gzip.open if ".gz" in path.suffixes else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
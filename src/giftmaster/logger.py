@@ -10,13 +10,25 @@ from giftmaster import logger as loggermod
 https://stackoverflow.com/a/48503066/16564820
 """
 
+# signtool's /kc and osslsigncode's -pass carry the token password
+PASSWORD_FLAGS = ("/kc", "-pass")
+
+
+def mask_args(cmd):
+    """Copy of the argument list cmd with the password after each flag masked"""
+    masked = list(cmd)
+    for i, arg in enumerate(masked[:-1]):
+        if arg in PASSWORD_FLAGS:
+            masked[i + 1] = "[MASKED]"
+    return masked
+
 
 class SensitiveFormatter(logging.Formatter):
     """Formatter that removes sensitive information in signtool command logs."""
 
     @staticmethod
     def _filter(s):
-        return re.sub(r"/kc +[^ ]+", r"/kc [MASKED]", s)
+        return re.sub(r"(/kc|-pass) +[^ ]+", r"\1 [MASKED]", s)
 
     def format(self, record):
         original = logging.Formatter.format(self, record)
@@ -0,0 +1,224 @@
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+from typing import Dict
+
+_logger = logging.getLogger(__name__)
+
+_NULL = contextlib.nullcontext()
+
+
+class Stat:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Per-phase timings and counters for one run.
+
+    Disabled by default; while disabled :meth:`phase` hands back a shared
+    no-op context manager and :meth:`count` returns straight away, so
+    instrumented code pays next to nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.phases: Dict[str, Stat] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.phases.setdefault(name, Stat()).add(seconds)
+
+    def count(self, name: str, n: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def reset(self):
+        with self._lock:
+            self.phases.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def summary(self) -> str:
+        lines = []
+        for name, stat in sorted(self.phases.items()):
+            lines.append(
+                f"{name}: {stat.count:,d} x, {stat.total:.3f}s total, "
+                f"{stat.total / stat.count:.3f}s mean, {stat.max:.3f}s max"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value:,}")
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        out = []
+
+        def family(name, kind, samples):
+            if samples:
+                out.append(f"# TYPE {name} {kind}")
+                out.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        phases = sorted(self.phases.items())
+        family(
+            "giftmaster_phase_seconds_total",
+            "counter",
+            [(f'{{phase="{n}"}}', s.total) for n, s in phases],
+        )
+        family(
+            "giftmaster_phase_count_total",
+            "counter",
+            [(f'{{phase="{n}"}}', s.count) for n, s in phases],
+        )
+        family(
+            "giftmaster_phase_seconds_max",
+            "gauge",
+            [(f'{{phase="{n}"}}', s.max) for n, s in phases],
+        )
+        for name, value in sorted(self.counters.items()):
+            family(f"giftmaster_{name}_total", "counter", [("", value)])
+        for (name, labels), value in sorted(self.gauges.items()):
+            text = ",".join(f'{k}="{v}"' for k, v in labels)
+            family(f"giftmaster_{name}", "gauge", [(f"{{{text}}}", value)])
+        return "\n".join(out) + "\n"
+
+    def otel(self) -> Dict:
+        """Metrics shaped like an OpenTelemetry OTLP/JSON export"""
+
+        def point(value, **attributes):
+            return {
+                "attributes": [
+                    {"key": k, "value": {"stringValue": str(v)}}
+                    for k, v in attributes.items()
+                ],
+                "timeUnixNano": str(time.time_ns()),
+                "asDouble": value,
+            }
+
+        def sum_metric(name, unit, points):
+            return {
+                "name": name,
+                "unit": unit,
+                "sum": {
+                    "dataPoints": points,
+                    "aggregationTemporality": 2,
+                    "isMonotonic": True,
+                },
+            }
+
+        phases = sorted(self.phases.items())
+        metrics = [
+            sum_metric(
+                "giftmaster.phase.duration",
+                "s",
+                [point(s.total, phase=n) for n, s in phases],
+            ),
+            sum_metric(
+                "giftmaster.phase.count",
+                "1",
+                [point(s.count, phase=n) for n, s in phases],
+            ),
+        ]
+        metrics += [
+            sum_metric(f"giftmaster.{name}", "1", [point(value)])
+            for name, value in sorted(self.counters.items())
+        ]
+        metrics += [
+            {
+                "name": f"giftmaster.{name}",
+                "gauge": {"dataPoints": [point(value, **dict(labels))]},
+            }
+            for (name, labels), value in sorted(self.gauges.items())
+        ]
+        return {
+            "resourceMetrics": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": "giftmaster"},
+                            }
+                        ]
+                    },
+                    "scopeMetrics": [
+                        {"scope": {"name": "giftmaster"}, "metrics": metrics}
+                    ],
+                }
+            ]
+        }
+
+    def write_prometheus(self, path):
+        _atomic_write(path, self.prometheus())
+
+    def write_json(self, path):
+        _atomic_write(path, json.dumps(self.otel(), indent=2))
+
+
+def _atomic_write(path, text: str):
+    # node_exporter's textfile collector may read at any moment
+    path = pathlib.Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+registry = Metrics()
+
+
+def phase(name: str):
+    return registry.phase(name)
+
+
+def observe(name: str, seconds: float):
+    registry.observe(name, seconds)
+
+
+def count(name: str, n: float = 1):
+    registry.count(name, n)
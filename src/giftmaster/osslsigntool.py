@@ -0,0 +1,107 @@
+import logging
+import os
+import pathlib
+import subprocess
+import tempfile
+from typing import List, Optional, Set, Tuple
+
+from giftmaster import metrics, signonce, signtool
+
+
+class OsslSignTool(signtool.SignTool):
+    """SignTool backend that drives osslsigncode through a PKCS#11 token.
+
+    Lets Linux hosts sign Authenticode files.  osslsigncode takes a single
+    file per call and writes the signed image to a new path, so verify and
+    sign run one file at a time and the signed copy replaces the original
+    atomically.  Caching, the PE precheck, batching and concurrency are
+    shared with signtool.
+    """
+
+    DEFAULT_PATHS = ["/usr/bin/osslsigncode", "/usr/local/bin/osslsigncode"]
+    MAX_FILES_PER_CALL = 1
+    PKCS11_MODULE = "/usr/lib/libeTPkcs11.so"
+    CERTS = "sectigo.cer"
+    KEY = None
+
+    @property
+    def token(self) -> str:
+        return type(self).KEY or type(self).PKCS11_MODULE
+
+    @classmethod
+    def for_token(cls, token: str):
+        return type(cls.__name__, (cls,), {"KEY": token})
+
+    def verify_cmd(self, *paths: List[str]):
+        """osslsigncode verify -in C:/dxLib.dll"""
+        return [str(self.path), "verify", "-in", *paths]
+
+    def verified_subset(
+        self, paths: List[str], result: subprocess.CompletedProcess
+    ) -> Optional[Set[str]]:
+        return set() if result.returncode else set(paths)
+
+    def sign_prefix(self, url: str = None, password: str = None) -> List[str]:
+        if password is None:
+            if not (password := os.environ.get("SAFENET_CLIENT_CREDENTIALS", "")):
+                msg = (
+                    "credentials for signing could not be found from "
+                    "$ENV:SAFENET_CLIENT_CREDENTIALS"
+                )
+                logging.critical(msg)
+                raise ValueError(msg)
+            password = self.decode_credentials(password)
+
+        cmd = [
+            str(self.path),
+            "sign",
+            "-pkcs11module",
+            type(self).PKCS11_MODULE,
+            "-certs",
+            type(self).CERTS,
+        ]
+        if type(self).KEY:
+            cmd += ["-key", type(self).KEY]
+        cmd += [
+            "-pass",
+            password,
+            "-h",
+            type(self).HASH_ALGORITHM.lower(),
+            "-n",
+            "Streambox",
+            "-ts",
+            url or type(self).url_manager.url,
+            "-in",
+        ]
+        return cmd
+
+    def sign_invocation(
+        self, files: List[str], url: str
+    ) -> subprocess.CompletedProcess:
+        (path,) = files
+        fd, signed = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=".giftmaster-", suffix=".signed"
+        )
+        os.close(fd)
+        # osslsigncode won't write over an existing file
+        os.unlink(signed)
+        try:
+            result = self.run_process(self.sign_prefix(url) + [path, "-out", signed])
+            if not result.returncode:
+                signonce.replace_atomically(signed, path)
+        finally:
+            pathlib.Path(signed).unlink(missing_ok=True)
+        return result
+
+    def sign_isolating(self, files: List[str]) -> Tuple[List[str], List[str]]:
+        """One call per file, so each result already names its file"""
+        signed, failed = [], []
+        for path in files:
+            result = self.sign_files([path])
+            if result.returncode:
+                failed.append(path)
+                self.record_failures([path], signtool.parsed(result).error_class)
+            else:
+                signed.append(path)
+        metrics.count("sign_isolations", bool(failed))
+        return signed, failed
@@ -0,0 +1,263 @@
+"""
+Incremental parser for ``signtool verify /v`` and ``signtool sign /v`` output.
+
+Bytes are fed as they arrive from the process.  Each complete run of lines
+is scanned with one precompiled pattern, so only the few lines that matter
+reach Python code, and only the paths and names they carry are decoded.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+from giftmaster import timestamp
+
+# one pass of this over a whole chunk finds every line worth looking at
+_LINE_RE = re.compile(
+    rb"^(?:Verifying: (?P<verifying>.+)"
+    rb"|Successfully verified: (?P<verified>.+)"
+    rb"|Successfully signed: (?P<signed>.+)"
+    rb"|Number of files successfully (?P<counted>Verified|Signed): (?P<count>\d+)"
+    rb"|[ \t]*Issued to: (?P<issued_to>.+)"
+    rb"|The signature is timestamped: (?P<timestamped>.+)"
+    rb"|(?P<chain>Signing Certificate Chain:|The following certificate was selected:)"
+    rb"|(?P<tsa_chain>Timestamp Verified by:)"
+    rb"|SignTool Error: (?P<error>.+))",
+    re.MULTILINE,
+)
+
+# error class for each phrase an error line may contain, most specific first
+ERROR_CLASSES = [
+    (b"No private key is available", "private_key"),
+    *((m.encode(), "timestamp") for m in timestamp.TIMESTAMP_FAILURE_MARKERS),
+    (b"No signature found", "unsigned"),
+    (b"not trusted", "untrusted"),
+    (b"unexpected internal error", "internal"),
+    # another process holds the token
+    (b"other connections outstanding", "busy"),
+    (b"The requested resource is in use", "busy"),
+    (b"File not found", "not_found"),
+]
+
+
+def classify_error(message: bytes) -> str:
+    for phrase, error_class in ERROR_CLASSES:
+        if phrase in message:
+            return error_class
+    return "error"
+
+
+def _text(value: bytes) -> str:
+    return value.rstrip().decode(errors="replace")
+
+
+class FileResult:
+    """What signtool output said about one file"""
+
+    __slots__ = ("path", "signed", "signer", "timestamp", "error")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signed: Optional[bool] = None
+        self.signer: Optional[str] = None
+        self.timestamp: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def __repr__(self):
+        return (
+            f"FileResult({self.path!r}, signed={self.signed}, "
+            f"signer={self.signer!r}, error={self.error!r})"
+        )
+
+
+class OutputParser:
+    """Turns signtool verbose output into per-file results as it streams in.
+
+    Feed stdout and stderr separately with :meth:`feed`, in whatever chunks
+    they arrive, then call :meth:`close`.  Error lines are classified
+    (``private_key``, ``timestamp``, ``unsigned``, ...) as soon as they are
+    complete, so a caller can react to a missing private key before the
+    process exits.
+
+    signtool verify writes one error line to stderr for each file it
+    fails.  The two pipes can't be interleaved reliably, so :meth:`close`
+    pairs those lines with the failed files in order, when their numbers
+    agree, to fill in ``FileResult.error``.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, FileResult] = {}
+        self.verifying: List[str] = []
+        self.counts: Dict[str, int] = {}
+        self.errors: List[str] = []
+        self.error_classes: Set[str] = set()
+        self.bytes_fed = {False: 0, True: 0}
+        self._stderr_errors: List[str] = []
+        self._partial = {False: b"", True: b""}
+        self._current: Optional[FileResult] = None
+        self._section = None
+        self._signer: Optional[str] = None
+
+    @property
+    def private_key_missing(self) -> bool:
+        return "private_key" in self.error_classes
+
+    @property
+    def timestamp_failed(self) -> bool:
+        return "timestamp" in self.error_classes
+
+    @property
+    def error_class(self) -> Optional[str]:
+        """The most specific error class seen, None if there were no errors"""
+        for _, error_class in ERROR_CLASSES:
+            if error_class in self.error_classes:
+                return error_class
+        return "error" if self.error_classes or self.errors else None
+
+    def feed(self, data: bytes, stderr: bool = False):
+        if not data:
+            return
+        self.bytes_fed[stderr] += len(data)
+        data = self._partial[stderr] + data
+        end = data.rfind(b"\n") + 1
+        self._partial[stderr] = data[end:]
+        self._lines(data[:end], stderr)
+
+    def close(self) -> "OutputParser":
+        for stderr, rest in self._partial.items():
+            if rest:
+                self._lines(rest, stderr)
+        self._partial = {False: b"", True: b""}
+        self._link_stderr_errors()
+        return self
+
+    def _link_stderr_errors(self):
+        errors, self._stderr_errors = self._stderr_errors, []
+        failed = [
+            result
+            for result in dict.fromkeys(self.files[path] for path in self.verifying)
+            if not result.signed and result.error is None
+        ]
+        if errors and len(errors) == len(failed):
+            for result, error_class in zip(failed, errors):
+                result.error = error_class
+
+    def _lines(self, data: bytes, stderr: bool):
+        if stderr:
+            # every error line is kept; osslsigncode's lack "SignTool Error:"
+            for line in data.splitlines():
+                if line.strip():
+                    self.errors.append(_text(line))
+                    if (error_class := classify_error(line)) != "error":
+                        self.error_classes.add(error_class)
+        for match in _LINE_RE.finditer(data):
+            self._match(match, stderr)
+
+    def _file(self, path: str) -> FileResult:
+        if (result := self.files.get(path)) is None:
+            result = self.files[path] = FileResult(path)
+        return result
+
+    def _match(self, match: re.Match, stderr: bool):
+        kind = match.lastgroup
+        value = match[kind]
+        if kind == "verifying":
+            path = _text(value)
+            self.verifying.append(path)
+            self._current = self._file(path)
+            self._current.signed = False
+            self._section = None
+        elif kind == "verified":
+            result = self._file(_text(value))
+            result.signed = True
+            self._section = None
+        elif kind == "signed":
+            result = self._file(_text(value))
+            result.signed = True
+            result.signer = self._signer
+        elif kind == "count":
+            self.counts[match["counted"].decode().lower()] = int(value)
+        elif kind == "issued_to":
+            if self._section == "chain":
+                # the chain runs from the root down; the last entry signed
+                self._signer = _text(value)
+                if self._current is not None:
+                    self._current.signer = self._signer
+        elif kind == "timestamped":
+            if self._current is not None:
+                self._current.timestamp = _text(value)
+        elif kind == "chain":
+            self._section = "chain"
+        elif kind == "tsa_chain":
+            self._section = "timestamp"
+        elif kind == "error":
+            error_class = classify_error(value)
+            self.error_classes.add(error_class)
+            if stderr:
+                self._stderr_errors.append(error_class)
+            elif self._current is not None:
+                self._current.error = error_class
+
+    def verify_status(self, paths: List[str]) -> Optional[Dict[str, bool]]:
+        """Map the verified files onto paths, None unless each appears once.
+
+        The "Number of files successfully Verified" total has to agree too,
+        otherwise the output can't be trusted and the caller should bisect.
+        """
+        wanted = {os.path.normcase(path): path for path in paths}
+        if len(wanted) != len(paths):
+            return None
+
+        seen = [os.path.normcase(path) for path in self.verifying]
+        if len(seen) != len(wanted) or set(seen) != set(wanted):
+            return None
+
+        verified = {
+            os.path.normcase(path)
+            for path, result in self.files.items()
+            if result.signed
+        }
+        if not verified <= set(wanted):
+            return None
+
+        if "verified" in self.counts and self.counts["verified"] != len(verified):
+            return None
+
+        return {path: key in verified for key, path in wanted.items()}
+
+    def signed_paths(self, paths: List[str]) -> Set[str]:
+        """Those of paths that the output reports as successfully signed"""
+        wanted = {os.path.normcase(path): path for path in paths}
+        signed = (os.path.normcase(p) for p, r in self.files.items() if r.signed)
+        return {wanted[key] for key in signed if key in wanted}
+
+    def file_errors(self, paths: List[str]) -> Dict[str, str]:
+        """Error class of each of paths that an error line names.
+
+        A line naming a file often says no more than that; its class is then
+        that of the error line before it, e.g. "SignTool Error: An unexpected
+        internal error has occurred." followed by "SignTool Error: <path>".
+        """
+        wanted = {os.path.normcase(path): path for path in paths}
+        errors = {}
+        previous = "error"
+        for line in self.errors:
+            error_class = classify_error(line.encode())
+            key = os.path.normcase(line)
+            for i, c in enumerate(key):
+                if c in " :\t" and (path := wanted.get(key[i + 1 :])):
+                    if error_class == "error":
+                        error_class = previous
+                    errors[path] = error_class
+                    break
+            else:
+                previous = error_class
+        return errors
+
+
+def parse(stdout: bytes = b"", stderr: bytes = b"") -> OutputParser:
+    """Parse complete output in one go"""
+    parser = OutputParser()
+    parser.feed(stdout)
+    parser.feed(stderr, stderr=True)
+    return parser.close()
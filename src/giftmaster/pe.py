@@ -0,0 +1,78 @@
+"""
+Just enough PE parsing to tell whether an image carries an Authenticode
+certificate table, without spawning signtool.
+
+https://learn.microsoft.com/en-us/windows/win32/debug/pe-format
+"""
+
+import contextlib
+import mmap
+import struct
+from typing import Optional
+
+PE32_MAGIC = 0x10B
+PE32_PLUS_MAGIC = 0x20B
+IMAGE_DIRECTORY_ENTRY_SECURITY = 4
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """Yield a read-only mmap of path, or None for empty or unreadable files"""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        yield None
+        return
+
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            yield None
+            return
+        with mm:
+            yield mm
+
+
+def security_directory(mm) -> Optional[tuple]:
+    """Return (file offset, size) of the certificate table, or None if not a PE"""
+    if mm is None or len(mm) < 0x40 or mm[:2] != b"MZ":
+        return None
+
+    (e_lfanew,) = struct.unpack_from("<I", mm, 0x3C)
+    optional = e_lfanew + 24
+    if len(mm) < optional + 2 or mm[e_lfanew : e_lfanew + 4] != b"PE\0\0":
+        return None
+
+    (magic,) = struct.unpack_from("<H", mm, optional)
+    if magic == PE32_MAGIC:
+        count_offset, directories = optional + 92, optional + 96
+    elif magic == PE32_PLUS_MAGIC:
+        count_offset, directories = optional + 108, optional + 112
+    else:
+        return None
+
+    if len(mm) < count_offset + 4:
+        return None
+    (count,) = struct.unpack_from("<I", mm, count_offset)
+    if count <= IMAGE_DIRECTORY_ENTRY_SECURITY:
+        return (0, 0)
+
+    entry = directories + 8 * IMAGE_DIRECTORY_ENTRY_SECURITY
+    if len(mm) < entry + 8:
+        return None
+    return struct.unpack_from("<II", mm, entry)
+
+
+def has_certificate_table(path) -> Optional[bool]:
+    """True/False for PE images, None when path isn't something we can parse.
+
+    False means definitely unsigned.  True only means a certificate table is
+    present; whether it holds a valid signature is for signtool to decide.
+    """
+    with mapped(path) as mm:
+        directory = security_directory(mm)
+    if directory is None:
+        return None
+    offset, size = directory
+    return bool(offset and size)
@@ -0,0 +1,160 @@
+import dataclasses
+import logging
+import os
+from typing import Iterable, List, Optional
+
+from giftmaster import batching, inputs, pe
+from giftmaster import timings as timingsmod
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class BatchPlan:
+    index: int
+    files: int
+    cached: int = 0
+    unsigned: int = 0
+    unknown: int = 0
+    verify_cmdlines: List[int] = dataclasses.field(default_factory=list)
+    verify_files: List[int] = dataclasses.field(default_factory=list)
+    sign_cmdlines: List[int] = dataclasses.field(default_factory=list)
+    sign_files: List[int] = dataclasses.field(default_factory=list)
+
+    @property
+    def spawns(self) -> int:
+        return len(self.verify_cmdlines) + len(self.sign_cmdlines)
+
+    def estimate(self, timings: timingsmod.Timings, kind: str) -> float:
+        files = self.verify_files if kind == "verify" else self.sign_files
+        return sum(timings.estimate(kind, n) for n in files)
+
+
+def plan_batch(index, batch, tool, verify_batch_size=None, password=None) -> BatchPlan:
+    """What sign_batch would run for batch, using only the cheap checks.
+
+    Files the cache knows are signed are skipped.  PE images with no
+    certificate table go straight to signing.  The rest would be verified;
+    PE images with a certificate table are assumed to verify as signed and
+    anything else to need signing, so the sign side is an upper bound.
+    ``password`` stands in for the token password when sizing sign calls.
+    """
+    plan = BatchPlan(index=index, files=len(batch))
+    candidates = tool.files_to_sign
+    if tool.cache is not None:
+        cached, candidates = tool.cache.split(candidates)
+        plan.cached = len(cached)
+
+    unsigned, unknown, to_verify = [], [], []
+    for path in candidates:
+        table = pe.has_certificate_table(path)
+        if table is False:
+            unsigned.append(path)
+            continue
+        to_verify.append(path)
+        if table is None:
+            unknown.append(path)
+    plan.unsigned, plan.unknown = len(unsigned), len(unknown)
+
+    prefix = tool.verify_cmd()
+    batch_size = verify_batch_size or type(tool).VERIFY_BATCH_SIZE
+    for chunk in batching.pack(
+        to_verify, prefix, max_files=tool.files_per_call(batch_size)
+    ):
+        plan.verify_cmdlines.append(batching.cmdline_length(prefix + chunk))
+        plan.verify_files.append(len(chunk))
+
+    to_sign = set(unsigned) | set(unknown)
+    tool.files_to_sign = [path for path in tool.files_to_sign if path in to_sign]
+    prefix = tool.sign_prefix(type(tool).url_manager.longest_url, password=password)
+    for chunk in batching.pack(
+        tool.files_to_sign, prefix, max_files=tool.files_per_call()
+    ):
+        plan.sign_cmdlines.append(batching.cmdline_length(prefix + chunk))
+        plan.sign_files.append(len(chunk))
+    return plan
+
+
+@dataclasses.dataclass
+class Plan:
+    tool: str
+    batches: List[BatchPlan]
+    jobs: int = 1
+    token_jobs: int = 1
+
+    def total(self, field: str) -> int:
+        return sum(getattr(batch, field) for batch in self.batches)
+
+    def estimate(self, timings: timingsmod.Timings) -> float:
+        """Wall-clock seconds: verify spreads over jobs, sign over token slots"""
+        verify = sum(batch.estimate(timings, "verify") for batch in self.batches)
+        sign = sum(batch.estimate(timings, "sign") for batch in self.batches)
+        return verify / max(self.jobs, 1) + sign / max(
+            min(self.jobs, self.token_jobs), 1
+        )
+
+    def render(self, timings: timingsmod.Timings) -> str:
+        lines = [f"signtool: {self.tool}"]
+        for batch in self.batches:
+            lines.append(
+                f"batch {batch.index + 1}: {batch.files:,d} file(s), "
+                f"{batch.cached:,d} cached as signed, "
+                f"{len(batch.verify_cmdlines):,d} verify call(s) "
+                f"for {sum(batch.verify_files):,d} file(s)"
+                f"{_lengths(batch.verify_cmdlines)}, "
+                f"{len(batch.sign_cmdlines):,d} sign call(s) "
+                f"for {sum(batch.sign_files):,d} file(s)"
+                f"{_lengths(batch.sign_cmdlines)}"
+            )
+        verify = sum(len(batch.verify_cmdlines) for batch in self.batches)
+        sign = sum(len(batch.sign_cmdlines) for batch in self.batches)
+        verify_spawn, verify_file = timings.coefficients("verify")
+        sign_spawn, sign_file = timings.coefficients("sign")
+        lines += [
+            f"total: {len(self.batches):,d} batch(es), {self.total('files'):,d} "
+            f"file(s), {self.total('cached'):,d} cached as signed, "
+            f"{self.total('unsigned'):,d} without a certificate table, "
+            f"{self.total('unknown'):,d} of unknown type",
+            f"process spawns: {sum(batch.spawns for batch in self.batches):,d} "
+            f"({verify:,d} verify, {sign:,d} sign)",
+            f"cost model: verify {verify_spawn:.2f}s + {verify_file:.3f}s/file, "
+            f"sign {sign_spawn:.2f}s + {sign_file:.3f}s/file",
+            f"estimated duration with --jobs {self.jobs} --token-jobs "
+            f"{self.token_jobs}: {self.estimate(timings):.1f}s",
+        ]
+        return "\n".join(lines)
+
+
+def _lengths(cmdlines: List[int]) -> str:
+    if not cmdlines:
+        return ""
+    return f" (command line {min(cmdlines):,d}-{max(cmdlines):,d} chars)"
+
+
+def plan(
+    file_list: Iterable[str],
+    signtool_candidates,
+    batch_size: int,
+    tool_class,
+    verify_batch_size: Optional[int] = None,
+    jobs: int = 1,
+    token_jobs: int = 1,
+    cache=None,
+) -> Plan:
+    """Work out the batches and signtool calls a run would make, running none"""
+    password = None
+    if not os.environ.get("SAFENET_CLIENT_CREDENTIALS"):
+        _logger.warning("no signing credentials; sign command lengths are approximate")
+        password = "*" * 16
+
+    batches = []
+    tool = None
+    for index, batch in enumerate(inputs.batched(file_list, batch_size)):
+        tool = tool_class.from_list(batch, signtool=signtool_candidates, cache=cache)
+        batches.append(plan_batch(index, batch, tool, verify_batch_size, password))
+    return Plan(
+        tool=str(tool.path) if tool is not None else "",
+        batches=batches,
+        jobs=jobs,
+        token_jobs=token_jobs,
+    )
@@ -0,0 +1,113 @@
+import collections
+import logging
+import os
+import pathlib
+from typing import Callable, Iterable, Iterator, Optional
+
+from giftmaster import pe
+
+_logger = logging.getLogger(__name__)
+
+OLE_MAGIC = bytes.fromhex("d0cf11e0a1b11ae1")
+CAB_MAGIC = b"MSCF"
+# DER encoding of szOID_CTL (1.3.6.1.4.1.311.10.1), the content type of a catalog
+CTL_OID = bytes.fromhex("06092b0601040182370a01")
+
+# signable through a SIP but not recognisable from magic bytes
+SIGNABLE_EXTENSIONS = {
+    ".ps1": "script",
+    ".psm1": "script",
+    ".psd1": "script",
+    ".ps1xml": "script",
+    ".vbs": "script",
+    ".js": "script",
+    ".wsf": "script",
+    ".appx": "package",
+    ".appxbundle": "package",
+    ".msix": "package",
+    ".msixbundle": "package",
+}
+
+
+def detect_format(mm) -> Optional[str]:
+    """Name the signable format of a mapped file from its magic bytes"""
+    if mm is None:
+        return None
+    if pe.security_directory(mm) is not None:
+        return "pe"
+    head = mm[:8]
+    if head == OLE_MAGIC:
+        return "msi"
+    if head[:4] == CAB_MAGIC:
+        return "cab"
+    if head[:1] == b"\x30" and mm.find(CTL_OID, 0, 256) != -1:
+        return "cat"
+    return None
+
+
+def classify(path) -> Optional[str]:
+    with pe.mapped(path) as mm:
+        kind = detect_format(mm)
+    return kind or SIGNABLE_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+class Preflight:
+    """Drops duplicate and unsignable inputs before any signtool call.
+
+    Duplicates are caught by resolved path and by (device, inode), so the
+    same file reached through different spellings or links is only signed
+    once.  With ``drop_unsupported`` files that aren't PE, MSI, CAB, catalog
+    or a known script/package type are dropped; otherwise they are passed
+    through and only reported.  ``on_drop`` is called with the resolved
+    path of each duplicate or unsupported file dropped.
+    """
+
+    def __init__(
+        self,
+        drop_unsupported: bool = False,
+        on_drop: Optional[Callable[[str], None]] = None,
+    ):
+        self.drop_unsupported = drop_unsupported
+        self.on_drop = on_drop
+        self.counts = collections.Counter()
+        self._seen_paths = set()
+        self._seen_inodes = set()
+
+    def __call__(self, paths: Iterable[str]) -> Iterator[str]:
+        for path in paths:
+            resolved = str(pathlib.Path(path).resolve())
+            try:
+                st = os.stat(resolved)
+            except OSError as ex:
+                _logger.warning(f"skipping {path}: {ex}")
+                self.counts["missing"] += 1
+                continue
+
+            inode = (st.st_dev, st.st_ino)
+            if resolved in self._seen_paths or (
+                st.st_ino and inode in self._seen_inodes
+            ):
+                _logger.debug(f"skipping duplicate {path}")
+                self.counts["duplicate"] += 1
+                self._dropped(resolved)
+                continue
+            self._seen_paths.add(resolved)
+            self._seen_inodes.add(inode)
+
+            kind = classify(resolved)
+            if kind is None:
+                self.counts["unsupported"] += 1
+                if self.drop_unsupported:
+                    _logger.warning(f"skipping {path}: not a signable file type")
+                    self._dropped(resolved)
+                    continue
+                _logger.warning(f"{path} doesn't look like a signable file type")
+            self.counts[kind or "unknown"] += 1
+            yield resolved
+
+    def _dropped(self, path: str):
+        if self.on_drop is not None:
+            self.on_drop(path)
+
+    def summary(self) -> str:
+        return ", ".join(f"{n:,d} {kind}" for kind, n in sorted(self.counts.items()))
@@ -0,0 +1,121 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from giftmaster import metrics
+
+_logger = logging.getLogger(__name__)
+
+# error classes from giftmaster.parse worth another try after a pause; the
+# rest (a missing private key, a file signtool can't handle, ...) won't fix
+# themselves.  "internal" isn't here: signtool reports a bad file that way
+# too, and its output doesn't tell that apart from a token or CSP fault.
+TRANSIENT = frozenset({"timestamp", "busy"})
+
+
+class RetryBudget:
+    """Retries left for the whole run, shared by every batch and thread"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.used >= self.total:
+                return False
+            self.used += 1
+            return True
+
+
+class RetryPolicy:
+    """Retries the files of a sign call that failed for a transient reason.
+
+    Each retry waits a random time between zero and ``backoff * 2**attempt``
+    seconds, capped at ``max_backoff`` (exponential backoff with full
+    jitter), so batches that failed together against a struggling timestamp
+    server don't all come back at once.  A file is retried at most
+    ``retries`` times, and every retry is taken from ``budget`` so a run
+    that keeps failing soon stops retrying altogether.
+
+    Only the files that failed are retried.  Files that failed permanently
+    are given up on straight away, and exceptions such as
+    :class:`giftmaster.signtool.SigntoolPrivatekeyException` aren't caught.
+    """
+
+    def __init__(
+        self,
+        retries: int = 2,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self._exhausted = False
+
+    @staticmethod
+    def is_transient(error_class: Optional[str]) -> bool:
+        return error_class in TRANSIENT
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _take(self) -> bool:
+        if self.budget is None or self.budget.take():
+            return True
+        if not self._exhausted:
+            self._exhausted = True
+            _logger.warning(
+                f"retry budget of {self.budget.total:,d} used up, no more retries"
+            )
+        metrics.count("retries_refused")
+        return False
+
+    def run(
+        self,
+        sign: Callable[[List[str]], Tuple[List[str], List[str]]],
+        files: List[str],
+        classify: Callable[[str], Optional[str]],
+    ) -> Tuple[List[str], List[str]]:
+        """Call sign on files, then again on the transient failures.
+
+        ``sign`` returns (signed, failed) and ``classify`` gives the error
+        class a failed path failed with.  Returns (signed, failed) overall.
+        """
+        signed, failed = [], []
+        pending = list(files)
+        for attempt in range(self.retries + 1):
+            done, pending = sign(pending)
+            signed += done
+            if not pending:
+                break
+            transient = {path for path in pending if self.is_transient(classify(path))}
+            failed += [path for path in pending if path not in transient]
+            pending = [path for path in pending if path in transient]
+            if not pending or attempt == self.retries or not self._take():
+                break
+            delay = self.delay(attempt)
+            _logger.warning(
+                f"retrying {len(pending):,d} file(s) after a transient failure "
+                f"({classify(pending[0])}) in {delay:.1f}s"
+            )
+            metrics.count("retries")
+            time.sleep(delay)
+        return signed, failed + pending
+
+
+def from_args(args) -> Optional[RetryPolicy]:
+    """The policy for --retries, --retry-backoff and --retry-budget"""
+    if args.retries <= 0 or args.retry_budget <= 0:
+        return None
+    return RetryPolicy(
+        retries=args.retries,
+        backoff=args.retry_backoff,
+        budget=RetryBudget(args.retry_budget),
+    )
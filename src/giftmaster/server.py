@@ -0,0 +1,366 @@
+import concurrent.futures
+import getpass
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import secrets
+import socket
+import sys
+import threading
+from multiprocessing import connection
+from typing import Dict, List, Tuple
+
+from giftmaster import args as argsmod
+from giftmaster import cache as cachemod
+from giftmaster import coalesce, inputs, logger, retry, signtool, skeleton, timestamp
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TCP_ADDRESS = "tcp:127.0.0.1:47017"
+PIPE_PREFIX = "\\\\.\\pipe\\"
+
+
+class AuthError(ConnectionError):
+    pass
+
+
+def default_address() -> str:
+    if sys.platform == "win32":
+        return f"pipe:giftmaster-{getpass.getuser()}"
+    if hasattr(socket, "AF_UNIX"):
+        return str(cachemod.default_cache_dir() / "giftmaster.sock")
+    return DEFAULT_TCP_ADDRESS
+
+
+def parse_address(address: str) -> Tuple[str, object]:
+    """Connection family and address for ``tcp:HOST:PORT``, ``pipe:NAME`` or a path"""
+    if address.startswith("tcp:"):
+        host, _, port = address[len("tcp:") :].rpartition(":")
+        return "AF_INET", (host or "127.0.0.1", int(port))
+    if address.startswith("pipe:"):
+        return "AF_PIPE", PIPE_PREFIX + address[len("pipe:") :]
+    return "AF_UNIX", address
+
+
+def default_key_path() -> pathlib.Path:
+    return cachemod.default_cache_dir() / "server.key"
+
+
+def read_key(path=None, create: bool = False) -> bytes:
+    """The secret clients authenticate with, made by the server on first start.
+
+    It lives in the per-user cache dir, readable only by its owner; to use a
+    server on another host, copy it there or point ``--key-file`` at it.
+    """
+    path = pathlib.Path(path or default_key_path())
+    if create and not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        return path.read_bytes().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"no giftmaster server key at {path}") from None
+
+
+class SignQueue:
+    """Signs files submitted by many clients, merging requests into batches.
+
+    Requests arriving within ``window`` seconds of each other, up to
+    ``max_files`` files, are coalesced by a :class:`giftmaster.coalesce.Coalescer`
+    and signed with a single :func:`giftmaster.skeleton.sign_batch`.  ``jobs``
+    caps how many batches run at once across all clients, and ``token_jobs``
+    how many of those sign against one token at the same time.
+    """
+
+    def __init__(
+        self,
+        signtool_candidates,
+        jobs: int = 1,
+        token_jobs: int = 1,
+        max_files: int = 0,
+        cache=None,
+        window: float = 0.0,
+        tool_class=None,
+    ):
+        self.signtool_candidates = signtool_candidates
+        self.cache = cache
+        self.tool_class = tool_class
+        self.limiter = skeleton.TokenLimiter(token_jobs)
+        self.coalescer = coalesce.Coalescer(
+            self._sign, jobs=jobs, window=window, max_items=max_files
+        )
+        self._batches = itertools.count()
+
+    def start(self):
+        self.coalescer.start()
+
+    def close(self):
+        self.coalescer.close()
+
+    def submit(self, files: List[str]) -> concurrent.futures.Future:
+        """Queue files for signing; the future resolves to a result dict"""
+        return self.coalescer.submit(list(files))
+
+    def _sign(self, requests: List[List[str]]) -> List[Dict]:
+        files = list(dict.fromkeys(path for paths in requests for path in paths))
+        result = skeleton.sign_batch(
+            next(self._batches),
+            files,
+            self.signtool_candidates,
+            limiter=self.limiter,
+            cache=self.cache,
+            tool_class=self.tool_class,
+        )
+        _logger.info(f"{result.summary()} for {len(requests):,d} request(s)")
+        return [split_result(result, paths) for paths in requests]
+
+
+def split_result(result: "skeleton.BatchResult", paths: List[str]) -> Dict:
+    """The part of a coalesced batch result that concerns one request"""
+    wanted = set(paths)
+    return {
+        "files": list(paths),
+        "already_signed": [p for p in result.already_signed if p in wanted],
+        "signed": [p for p in result.signed if p in wanted],
+        "failed": [p for p in result.failed if p in wanted],
+        "error": None if result.error is None else str(result.error),
+    }
+
+
+class SignServer:
+    """Front end to a :class:`SignQueue` on a Unix socket, named pipe or TCP port.
+
+    Every connection has to prove it holds the server key before it is
+    served, whatever the transport, since anyone who gets through can sign
+    with the token.  Requests are JSON messages: ``{"op": "sign", "files":
+    [...]}``, ``{"op": "ping"}`` and ``{"op": "shutdown"}``.  Paths must be
+    absolute since the server doesn't share the client's working directory.
+    """
+
+    def __init__(self, address: str, sign_queue: SignQueue, key: bytes = None):
+        self.address = address
+        self.family, server_address = parse_address(address)
+        self.sign_queue = sign_queue
+        self.key = key if key is not None else read_key(create=True)
+        self._stop = threading.Event()
+        if self.family == "AF_UNIX":
+            path = pathlib.Path(server_address)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                if _listening(address, key=self.key):
+                    raise OSError(f"a giftmaster server is already listening on {path}")
+                path.unlink()
+        elif self.family == "AF_INET" and server_address[0] not in (
+            "127.0.0.1",
+            "localhost",
+            "::1",
+        ):
+            _logger.warning(
+                f"listening on {address}: requests are authenticated but not encrypted"
+            )
+        self.listener = connection.Listener(
+            server_address, family=self.family, backlog=64
+        )
+        if self.family == "AF_UNIX":
+            os.chmod(server_address, 0o600)
+        elif self.family == "AF_INET":
+            # with port 0 the system picked one
+            host, port = self.listener.address[:2]
+            self.address = f"tcp:{host}:{port}"
+
+    def serve_forever(self):
+        while not self._stop.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                if self._stop.is_set():
+                    break
+                raise
+            if self._stop.is_set():
+                conn.close()
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                # the same handshake as Listener(authkey=...), off the accept loop
+                connection.deliver_challenge(conn, self.key)
+                connection.answer_challenge(conn, self.key)
+            except (multiprocessing.AuthenticationError, EOFError, OSError) as ex:
+                if not self._stop.is_set():
+                    _logger.warning(f"rejected a connection to {self.address}: {ex}")
+                return
+            while True:
+                try:
+                    message = conn.recv_bytes()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = self.dispatch(json.loads(message))
+                except Exception as ex:
+                    reply = {"error": f"{type(ex).__name__}: {ex}"}
+                conn.send_bytes(json.dumps(reply).encode("utf-8"))
+
+    def shutdown(self):
+        """Stop serve_forever, waking its accept with a connection of our own"""
+        self._stop.set()
+        family, address = parse_address(self.address)
+        try:
+            connection.Client(address, family=family).close()
+        except OSError:
+            pass
+
+    def server_close(self):
+        self.listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.server_close()
+
+    def dispatch(self, request: Dict) -> Dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        if op == "sign":
+            files = request.get("files") or []
+            relative = [path for path in files if not os.path.isabs(path)]
+            if relative:
+                raise ValueError(f"paths must be absolute: {relative[:3]}")
+            return self.sign_queue.submit(files).result()
+        raise ValueError(f"unknown op {op!r}")
+
+
+def _listening(address: str, key: bytes = None) -> bool:
+    try:
+        request(address, {"op": "ping"}, timeout=1, key=key)
+    except AuthError:
+        # something answers, just not to our key
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def request(address: str, message: Dict, timeout: float = None, key=None) -> Dict:
+    """Send one request to a server and return its reply.
+
+    ``key`` defaults to the one in the per-user cache dir.
+    """
+    family, server_address = parse_address(address)
+    try:
+        conn = connection.Client(server_address, family=family)
+    except OSError as ex:
+        raise ConnectionError(f"no giftmaster server at {address}: {ex}") from ex
+    with conn:
+        key = key if key is not None else read_key()
+        try:
+            connection.answer_challenge(conn, key)
+            connection.deliver_challenge(conn, key)
+        except multiprocessing.AuthenticationError as ex:
+            raise AuthError(f"giftmaster server at {address} refused the key") from ex
+        except EOFError as ex:
+            raise ConnectionError(
+                f"no reply from giftmaster server at {address}"
+            ) from ex
+        conn.send_bytes(json.dumps(message).encode("utf-8"))
+        if not conn.poll(timeout):
+            raise TimeoutError(f"no reply from giftmaster server at {address}")
+        try:
+            return json.loads(conn.recv_bytes())
+        except EOFError as ex:
+            raise ConnectionError(
+                f"no reply from giftmaster server at {address}"
+            ) from ex
+
+
+def serve(argv: List[str]):
+    """``giftmaster serve``: sign files for clients until asked to shut down"""
+    args = argsmod.parse_serve_args(argv)
+    logger.setup_logging(args.loglevel)
+    address = args.socket or default_address()
+
+    url_manager = timestamp.TimeStampURLManager(
+        args.timestamp_url,
+        state_path=args.timestamp_stats or cachemod.default_cache_dir() / "tsa.json",
+    )
+    settings = skeleton.ClassSettings()
+    settings.set(signtool.SignTool, "url_manager", url_manager)
+    settings.set(signtool.SignTool, "retry_policy", retry.from_args(args))
+    try:
+        cache = None
+        if not args.no_cache:
+            cache = cachemod.open_cache(args.cache)
+            path_cache = cache.path.with_name("signtool-path.json")
+            settings.set(signtool.SignTool, "PATH_CACHE", path_cache)
+
+        tool_class = skeleton.backend_class(args, settings)
+        sign_queue = SignQueue(
+            args.signtool or tool_class.DEFAULT_PATHS,
+            jobs=args.jobs,
+            token_jobs=args.token_jobs,
+            max_files=args.batch_size,
+            cache=cache,
+            window=args.window,
+            tool_class=tool_class,
+        )
+        sign_queue.start()
+        try:
+            key = read_key(args.key_file, create=True)
+            with SignServer(address, sign_queue, key=key) as server:
+                _logger.info(f"giftmaster server listening on {address}")
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+        finally:
+            sign_queue.close()
+            url_manager.save()
+    finally:
+        settings.restore()
+
+
+def submit(argv: List[str]) -> int:
+    """``giftmaster submit``: have a running server sign files; 1 if any failed"""
+    args = argsmod.parse_submit_args(argv)
+    logger.setup_logging(args.loglevel)
+    address = args.socket or default_address()
+    key = read_key(args.key_file) if args.key_file else None
+
+    if args.shutdown:
+        request(address, {"op": "shutdown"}, timeout=args.timeout, key=key)
+        return 0
+
+    files = signtool.get_abs_path(
+        inputs.iter_inputs(args.files, files_from=args.files_from, null=args.null)
+    )
+    if not files:
+        return 0
+
+    reply = request(
+        address, {"op": "sign", "files": files}, timeout=args.timeout, key=key
+    )
+    if reply.get("error"):
+        _logger.error(f"giftmaster server: {reply['error']}")
+        return 1
+    for path in reply["failed"]:
+        _logger.error(f"couldn't sign {path}")
+    _logger.info(
+        f"{len(files):,d} file(s): {len(reply['already_signed']):,d} already signed, "
+        f"{len(reply['signed']):,d} signed, {len(reply['failed']):,d} failed"
+    )
+    return 1 if reply["failed"] else 0
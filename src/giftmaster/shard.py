@@ -0,0 +1,303 @@
+import collections
+import logging
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from giftmaster import metrics, server, signtool, skeleton
+
+_logger = logging.getLogger(__name__)
+
+
+class ShardError(Exception):
+    pass
+
+
+class LocalTarget:
+    """Signs batches in this process with one token"""
+
+    def __init__(
+        self,
+        token: Optional[str],
+        signtool_candidates,
+        tool_class=None,
+        verify_batch_size=None,
+        cache=None,
+    ):
+        tool_class = tool_class or signtool.SignTool
+        self.name = f"local:{token or tool_class.CSP}"
+        self.tool_class = tool_class.for_token(token) if token else tool_class
+        self.signtool_candidates = signtool_candidates
+        self.verify_batch_size = verify_batch_size
+        self.cache = cache
+
+    def sign(self, index: int, files: List[str]) -> skeleton.BatchResult:
+        return skeleton.sign_batch(
+            index,
+            files,
+            self.signtool_candidates,
+            verify_batch_size=self.verify_batch_size,
+            cache=self.cache,
+            tool_class=self.tool_class,
+        )
+
+
+class RemoteTarget:
+    """Hands batches to a ``giftmaster serve`` process; paths and key must be shared"""
+
+    def __init__(self, address: str, timeout: Optional[float] = None):
+        self.name = f"remote:{address}"
+        self.address = address
+        self.timeout = timeout
+
+    def sign(self, index: int, files: List[str]) -> skeleton.BatchResult:
+        result = skeleton.BatchResult(index=index, files=list(files))
+        start = time.monotonic()
+        try:
+            reply = server.request(
+                self.address,
+                {"op": "sign", "files": signtool.get_abs_path(files)},
+                timeout=self.timeout,
+            )
+            if reply.get("error"):
+                raise ShardError(f"{self.name}: {reply['error']}")
+            result.already_signed = reply["already_signed"]
+            result.signed = reply["signed"]
+            result.failed = reply["failed"]
+            result.returncode = 1 if result.failed else 0
+        except (OSError, ValueError, KeyError, ShardError) as ex:
+            result.error = ex
+        result.duration = time.monotonic() - start
+        return result
+
+
+def parse_target(spec: str, signtool_candidates, **local_options):
+    """``local:TOKEN[@SIGNTOOL]`` or ``remote:SOCKET`` (``remote:tcp:HOST:PORT``)"""
+    kind, _, rest = spec.partition(":")
+    if kind == "remote" and rest:
+        return RemoteTarget(rest)
+    if kind == "local":
+        token, _, path = rest.partition("@")
+        candidates = [path] if path else signtool_candidates
+        return LocalTarget(token or None, candidates, **local_options)
+    raise ValueError(f"bad signing target {spec!r}, expected local:... or remote:...")
+
+
+class _Work:
+    def __init__(self, index: int, files: List[str]):
+        self.index = index
+        self.files = files
+        self.remaining = files
+        self.attempts = 0
+        self.tried = set()
+        self.already_signed: List[str] = []
+        self.signed: List[str] = []
+
+
+class ShardScheduler:
+    """Spreads batches over several signing targets with work stealing.
+
+    Every target has a worker pulling batches from the shared input, so a
+    fast target simply takes more of them.  A batch that fails on a target
+    with an error, as opposed to files that wouldn't sign, is queued again
+    for its unsigned files on the least loaded healthy target that hasn't
+    tried it, up to ``retries`` times; an idle target steals such queued
+    work from the others.  After ``MAX_FAILURES`` errors in a row a target
+    is considered unhealthy and gets no more work.
+
+    Unless ``keep_going`` is set, no new batch is taken from the input once
+    one has failed for good.
+
+    The input is read on a thread of its own, at most ``READ_AHEAD`` batches
+    per target ahead of the workers, so a slow ``--walk`` or file list
+    never holds up retries and stealing.
+    """
+
+    MAX_FAILURES = 2
+    READ_AHEAD = 2
+
+    def __init__(self, targets: List, retries: int = 2, keep_going: bool = False):
+        if not targets:
+            raise ValueError("no signing targets")
+        self.targets = targets
+        self.retries = retries
+        self.keep_going = keep_going
+        self._cond = threading.Condition()
+        self._queues = {target: collections.deque() for target in targets}
+        self._failures = collections.Counter()
+        self._healthy = {target: True for target in targets}
+        self._in_flight = 0
+        self._stop = False
+        self._ready = collections.deque()
+        self._reading = False
+        self._read_error = None
+        self._results = queue.Queue()
+
+    def run(self, batches: Iterable[List[str]]) -> Iterator["skeleton.BatchResult"]:
+        """Yield a BatchResult per batch as each one finishes"""
+        self._reading = True
+        reader = threading.Thread(target=self._read, args=(batches,), daemon=True)
+        reader.start()
+        workers = [
+            threading.Thread(target=self._work, args=(target,), daemon=True)
+            for target in self.targets
+        ]
+        for worker in workers:
+            worker.start()
+        running = len(workers)
+        while running:
+            if (result := self._results.get()) is None:
+                running -= 1
+            else:
+                yield result
+
+        # every target gave up; whatever was queued for a retry has failed
+        for work in (work for q in self._queues.values() for work in q):
+            yield self._finish(work, None, ShardError("no healthy signing target"))
+        with self._cond:
+            stopped = self._stop
+            unread = self._reading or bool(self._ready)
+            # a reader still waiting for room has nobody left to read for
+            self._stop = True
+            self._cond.notify_all()
+        if self._read_error is not None:
+            raise self._read_error
+        if stopped:
+            _logger.warning("remaining batches not run after an earlier failure")
+        elif unread:
+            _logger.warning("remaining batches not run: no healthy signing target")
+
+    def _read(self, batches: Iterable[List[str]]):
+        """Move batches from the input to the ready queue, outside the lock"""
+        limit = type(self).READ_AHEAD * len(self.targets)
+        try:
+            for index, batch in enumerate(batches):
+                work = _Work(index, list(batch))
+                with self._cond:
+                    while len(self._ready) >= limit and self._wanted():
+                        self._cond.wait()
+                    if not self._wanted():
+                        return
+                    self._ready.append(work)
+                    self._cond.notify_all()
+        except Exception as ex:
+            self._read_error = ex
+        finally:
+            with self._cond:
+                self._reading = False
+                self._cond.notify_all()
+
+    def _wanted(self) -> bool:
+        return not self._stop and any(self._healthy.values())
+
+    def _work(self, target):
+        try:
+            while (work := self._next(target)) is not None:
+                try:
+                    result = target.sign(work.index, work.remaining)
+                except Exception as ex:
+                    result = skeleton.BatchResult(work.index, work.remaining)
+                    result.error = ex
+                result.target = target.name
+                with self._cond:
+                    self._in_flight -= 1
+                    self._done(target, work, result)
+                    self._cond.notify_all()
+        finally:
+            self._results.put(None)
+
+    def _next(self, target) -> Optional[_Work]:
+        with self._cond:
+            while self._healthy[target]:
+                if self._queues[target]:
+                    work = self._queues[target].popleft()
+                elif (work := self._steal(target)) is None and not self._stop:
+                    work = self._ready.popleft() if self._ready else None
+                if work is not None:
+                    self._in_flight += 1
+                    self._cond.notify_all()
+                    return work
+                if not self._in_flight and (self._stop or not self._reading):
+                    return None
+                self._cond.wait()
+            return None
+
+    def _steal(self, thief) -> Optional[_Work]:
+        victims = sorted(self._queues.items(), key=lambda item: -len(item[1]))
+        for target, q in victims:
+            if target is thief:
+                continue
+            for work in reversed(q):
+                if thief not in work.tried:
+                    q.remove(work)
+                    metrics.count("shard_steals")
+                    return work
+        return None
+
+    def _done(self, target, work: _Work, result: "skeleton.BatchResult"):
+        work.already_signed += result.already_signed
+        work.signed += result.signed
+        if result.error is None:
+            self._failures[target] = 0
+            self._results.put(self._finish(work, result, None))
+            return
+
+        self._failures[target] += 1
+        if self._failures[target] >= type(self).MAX_FAILURES:
+            _logger.warning(f"{target.name} is failing, giving it no more work")
+            self._healthy[target] = False
+
+        done = set(result.already_signed) | set(result.signed)
+        work.remaining = [path for path in work.remaining if path not in done]
+        work.tried.add(target)
+        work.attempts += 1
+        candidates = [
+            other
+            for other in self.targets
+            if self._healthy[other] and other not in work.tried
+        ]
+        if work.attempts <= self.retries and candidates:
+            other = min(candidates, key=lambda t: len(self._queues[t]))
+            _logger.warning(
+                f"batch {work.index + 1} failed on {target.name} "
+                f"({result.error}), retrying on {other.name}"
+            )
+            metrics.count("shard_retries")
+            self._queues[other].append(work)
+            return
+
+        self._results.put(self._finish(work, result, result.error))
+        if not self.keep_going:
+            self._stop = True
+
+    def _finish(self, work: _Work, result, error) -> "skeleton.BatchResult":
+        final = skeleton.BatchResult(index=work.index, files=work.files)
+        final.already_signed = work.already_signed
+        final.signed = work.signed
+        if result is not None:
+            final.failed = result.failed
+            final.returncode = result.returncode
+            final.duration = result.duration
+            final.target = result.target
+        final.error = error
+        return final
+
+
+def client(
+    file_list,
+    targets: List,
+    batch_size: int,
+    retries: int = 2,
+    keep_going: bool = False,
+    collect: bool = True,
+    checkpoint=None,
+) -> "skeleton.RunResults":
+    """Like :func:`giftmaster.skeleton.client`, but spread over targets"""
+    from giftmaster import inputs
+
+    scheduler = ShardScheduler(targets, retries=retries, keep_going=keep_going)
+    results = scheduler.run(inputs.batched(file_list, batch_size))
+    return skeleton.report(
+        results, keep_going=keep_going, collect=collect, checkpoint=checkpoint
+    )
@@ -0,0 +1,155 @@
+import collections
+import concurrent.futures
+import logging
+import os
+import pathlib
+import shutil
+import stat
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+from giftmaster import cache as cachemod
+from giftmaster import metrics
+
+_logger = logging.getLogger(__name__)
+
+
+def group_by_content(paths: Iterable[str], jobs: Optional[int] = None):
+    """Map content digest to the paths holding that content, in input order.
+
+    Files are hashed on ``jobs`` threads; hashlib drops the GIL while it
+    digests, so this scales with the disks rather than the interpreter.
+    """
+    groups: Dict[str, List[str]] = {}
+    paths = list(paths)
+    with metrics.phase("hash"):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+            for path, digest in zip(paths, pool.map(_digest, paths)):
+                if digest is not None:
+                    groups.setdefault(digest, []).append(path)
+    return groups
+
+
+def _digest(path) -> Optional[str]:
+    try:
+        return cachemod.file_digest(path)
+    except OSError as ex:
+        _logger.warning(f"couldn't hash {path}: {ex}")
+        return None
+
+
+def replace_atomically(src, dst):
+    """Overwrite dst with the bytes of src without ever exposing a partial file.
+
+    The copy lands in a temporary file next to dst and is renamed over it.
+    It takes its timestamps from src but keeps the permissions and, where
+    allowed, the owner of an existing dst.
+    """
+    dst = pathlib.Path(dst)
+    try:
+        st = os.stat(dst)
+    except FileNotFoundError:
+        st = None
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copy2(src, tmp)
+        if st is not None:
+            os.chmod(tmp, stat.S_IMODE(st.st_mode))
+        if st is not None and hasattr(os, "chown"):
+            try:
+                os.chown(tmp, st.st_uid, st.st_gid)
+            except PermissionError:
+                pass
+        os.replace(tmp, dst)
+    except BaseException:
+        pathlib.Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class ArtifactStore:
+    """Signed copies of binaries keyed by the digest of their unsigned content.
+
+    Lets a later build reuse a signature for a binary that hasn't changed
+    instead of going back to the token and timestamp server.
+    """
+
+    def __init__(self, root=None):
+        self.root = pathlib.Path(root or cachemod.default_cache_dir() / "artifacts")
+
+    def path_for(self, digest: str) -> pathlib.Path:
+        return self.root / digest[:2] / digest
+
+    def get(self, digest: str) -> Optional[pathlib.Path]:
+        path = self.path_for(digest)
+        return path if path.is_file() else None
+
+    def put(self, digest: str, signed_path):
+        path = self.path_for(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        replace_atomically(signed_path, path)
+
+
+class SignOnce:
+    """Signs one representative per unique content and copies it to the rest.
+
+    :meth:`plan` hashes the inputs and returns the representatives that still
+    need signing, filling any group the ``store`` already holds a signed copy
+    for.  Once they've been through signtool, :meth:`distribute` copies each
+    representative whose content changed over the other members of its group
+    and files the signed bytes in the store.
+    """
+
+    def __init__(self, store: Optional[ArtifactStore] = None, jobs=None):
+        self.store = store
+        self.jobs = jobs
+        self.groups: Dict[str, List[str]] = {}
+        self.counts = collections.Counter()
+
+    def plan(self, paths: Iterable[str]) -> List[str]:
+        self.groups = group_by_content(paths, jobs=self.jobs)
+        representatives = []
+        for digest, members in list(self.groups.items()):
+            self.counts["unique"] += 1
+            self.counts["copies"] += len(members) - 1
+            stored = self.store.get(digest) if self.store is not None else None
+            if stored is None:
+                representatives.append(members[0])
+                continue
+            for path in members:
+                replace_atomically(stored, path)
+            self.counts["from_store"] += len(members)
+            del self.groups[digest]
+        _logger.info(
+            f"{self.counts['unique']:,d} unique file(s), "
+            f"{self.counts['copies']:,d} identical copies, "
+            f"{self.counts['from_store']:,d} restored from the artifact store"
+        )
+        return representatives
+
+    def distribute(self, cache=None) -> List[str]:
+        """Copy signed representatives over their duplicates; return the copies"""
+        copied = []
+        for digest, (first, *rest) in self.groups.items():
+            new_digest = _digest(first)
+            if new_digest is None or new_digest == digest:
+                # already signed, in which case so are its copies, or failed
+                continue
+            if self.store is not None:
+                self.store.put(digest, first)
+            for path in rest:
+                try:
+                    replace_atomically(first, path)
+                except OSError as ex:
+                    _logger.error(f"couldn't copy {first} to {path}: {ex}")
+                    self.counts["copy_failed"] += 1
+                    continue
+                copied.append(path)
+        self.counts["copied"] += len(copied)
+        metrics.count("files_copied", len(copied))
+        if cache is not None:
+            cache.record(copied)
+        return copied
+
+    def summary(self) -> str:
+        return ", ".join(f"{n:,d} {kind}" for kind, n in sorted(self.counts.items()))
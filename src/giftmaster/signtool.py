@@ -1,15 +1,17 @@
 import base64
+import functools
 import logging
 import os
 import pathlib
 import shlex
 import subprocess
+import threading
 import time
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from foodsale import pathfromglob
-
-from giftmaster import timestamp
+from giftmaster import batching
+from giftmaster import logger as loggermod
+from giftmaster import metrics, parse, pe, retry, timestamp, toolpath
 
 
 class SigntoolPrivatekeyException(Exception):
@@ -31,66 +33,196 @@ def unsign_cmd(*paths, signtool="signtool"):
     return cmd
 
 
+# signtool output is read and parsed this much at a time
+READ_SIZE = 1 << 16
+
+
+def _pump(stream, sink: Optional[List[bytes]], parser, lock, stderr=False):
+    """Feed stream to parser as it arrives, keeping it in sink unless None"""
+    with stream:
+        while chunk := stream.read1(READ_SIZE):
+            if sink is not None:
+                sink.append(chunk)
+            with lock:
+                parser.feed(chunk, stderr=stderr)
+
+
+def parsed(result: subprocess.CompletedProcess) -> parse.OutputParser:
+    """The parsed output of result, parsing it now if run_process didn't"""
+    if (parser := getattr(result, "parsed", None)) is None:
+        parser = parse.parse(
+            (result.stdout or "").encode(), (result.stderr or "").encode()
+        )
+        result.parsed = parser
+    return parser
+
+
+def verified_subset(
+    paths: List[str], result: subprocess.CompletedProcess
+) -> Optional[Set[str]]:
+    """Signed subset of paths per a verify result, None if it needs bisecting"""
+    if result.returncode == 0:
+        return set(paths)
+
+    if len(paths) == 1:
+        return set()
+
+    output = parsed(result)
+    status = output.verify_status(paths)
+    if status is not None:
+        return {path for path, signed in status.items() if signed}
+    if output.counts.get("verified") == 0:
+        # no need to know which files the output is about when it's none
+        return set()
+
+    logging.debug(f"can't map verify output onto {len(paths):,d} files, bisecting")
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def _decode_credentials(_str: str) -> str:
+    # memoized for long-lived processes that build many sign commands
+    base64_bytes = _str.encode("ascii")
+    message_bytes = base64.b64decode(base64_bytes)
+    return message_bytes.decode("ascii")
+
+
 def get_abs_path(file_list: List) -> List[pathlib.Path]:
     return [str(pathlib.Path(_str).resolve()) for _str in file_list]
 
 
 class SignTool:
+    """Signs and verifies files with Windows signtool.exe.
+
+    Subclasses adapt it to other signing tools by overriding the command
+    builders (``verify_cmd``, ``sign_prefix``, ``sign_invocation``) and the
+    output parsing (``verified_subset``), and ``MAX_FILES_PER_CALL`` when
+    the tool can't take many files at once; see
+    :class:`giftmaster.osslsigntool.OsslSignTool`.
+    """
+
+    DEFAULT_PATHS = [r"C:\Program Files*\Windows Kits\*\bin\*\x64\signtool.exe"]
+    MAX_FILES_PER_CALL = 0
     HASH_ALGORITHM = "SHA256"
+    VERIFY_BATCH_SIZE = 256
+    NATIVE_PRECHECK = True
+    PATH_CACHE = None
+    CSP = "eToken Base Cryptographic Provider"
     url_manager = timestamp.TimeStampURLManager()
+    journal = None
+    timings = None
+    retry_policy = None
 
     def __init__(self, files_to_sign):
         self.files_to_sign = get_abs_path(files_to_sign)
+        self.cache = None
+        # error class (see giftmaster.parse) of each file that failed to sign
+        self.failure_classes: Dict[str, str] = {}
 
     @classmethod
-    def from_list(cls, paths: List[str], signtool: List[str]):
+    def from_list(cls, paths: List[str], signtool: List[str], cache=None):
         tool = cls(paths)
         tool.set_path(signtool)
+        tool.cache = cache
         return tool
 
+    @property
+    def token(self) -> str:
+        """Name of the hardware token that sign_cmd will use"""
+        return type(self).CSP
+
+    @classmethod
+    def for_token(cls, token: str):
+        """A subclass of this class that signs with token instead"""
+        return type(cls.__name__, (cls,), {"CSP": token})
+
     def set_path(self, globs: List[str]):
-        def validate(globs):
-            paths = pathfromglob.abspathglob(*globs)
-            if len(paths) < 1:
-                msg = f"no glob from list {globs} matche any paths on filesystem"
-                logging.exception(msg)
-                raise ValueError(msg)
-
-            path = paths[0]
-
-            if len(paths) > 1:
-                msg = (
-                    f"globs {globs} match too many paths on filesystem: {paths}.  "
-                    f"Not sure i'm choosing the one you want, namely {path}.  Its "
-                    "the first one in the list"
-                )
-                logging.warning(msg)
-
-            if not path.exists():
-                msg = f"{path} does not exist"
-                logging.exception(msg)
-                raise ValueError(msg)
-
-            return path
-
-        self.path = validate(globs)
-
-    def remove_already_signed(self):
-        done = []
-        for path in self.files_to_sign:
-            ret = self.run(self.verify_cmd(path))
-            if ret == 0:
+        self.path = toolpath.resolve(globs, cache_path=type(self).PATH_CACHE)
+
+    def remove_already_signed(self, batch_size: int = None):
+        """Drop files that signtool reports as already signed.
+
+        PE images without a certificate table are known to be unsigned from
+        their headers alone and never reach signtool.  The rest are verified
+        ``batch_size`` at a time, fewer if the command line would get too
+        long, with a single ``signtool verify /pa`` per chunk.  A chunk whose
+        verbose output can't be mapped back onto its files is bisected until
+        it can.
+        """
+        with metrics.phase("verify"):
+            batch_size = batch_size or type(self).VERIFY_BATCH_SIZE
+            done = set()
+            candidates = self.files_to_sign
+            if self.cache is not None:
+                cached, candidates = self.cache.split(candidates)
+                logging.debug(f"{len(cached):,d} file(s) known signed from cache")
+                done.update(cached)
+                metrics.count("files_cached", len(cached))
+
+            if type(self).NATIVE_PRECHECK:
+                unsigned = {
+                    p for p in candidates if pe.has_certificate_table(p) is False
+                }
+                logging.debug(f"{len(unsigned):,d} file(s) have no certificate table")
+                candidates = [p for p in candidates if p not in unsigned]
+                metrics.count("files_precheck_unsigned", len(unsigned))
+
+            metrics.count("files_verified", len(candidates))
+            chunks = batching.pack(
+                candidates,
+                self.verify_cmd(),
+                max_files=self.files_per_call(batch_size),
+            )
+            verified = self.verify_chunks(chunks)
+            if self.cache is not None:
+                self.cache.record(verified)
+            done |= verified
+
+            for path in done:
                 logging.debug(f"{path} is already signed")
-                done.append(path)
-        self.files_to_sign = list(set(self.files_to_sign) - set(done))
+
+        self.files_to_sign = [path for path in self.files_to_sign if path not in done]
+
+    def verify_chunks(self, chunks: Iterable[List[str]]) -> Set[str]:
+        verified = set()
+        for chunk in chunks:
+            verified |= self.verify_signed(chunk)
+        return verified
+
+    def verify_signed(self, paths: List[str], count: int = None) -> Set[str]:
+        """Return the subset of paths that signtool verifies as signed.
+
+        ``count`` is how many of paths are signed, when an earlier verify
+        said so; it spares verifying paths that are all signed or none.
+        """
+        if not paths or count == 0:
+            return set()
+        if count == len(paths):
+            return set(paths)
+
+        start = time.monotonic()
+        result = self.run_process(self.verify_cmd(*paths))
+        self.record_timing("verify", len(paths), time.monotonic() - start)
+        if (signed := self.verified_subset(paths, result)) is not None:
+            return signed
+
+        count = parsed(result).counts.get("verified")
+        middle = len(paths) // 2
+        left = self.verify_signed(paths[:middle])
+        if count is not None:
+            count -= len(left)
+        return left | self.verify_signed(paths[middle:], count)
 
     def run(self, cmd) -> int:
+        return self.run_process(cmd).returncode
+
+    def run_process(self, cmd) -> subprocess.CompletedProcess:
         if not cmd:
             logging.debug(f"skipping running cmd because cmd is empty")
-            return 0
+            return subprocess.CompletedProcess(cmd, 0, "", "")
 
         try:
-            logging.debug(shlex.join(cmd))
+            logging.debug(shlex.join(loggermod.mask_args(cmd)))
             process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -100,28 +232,94 @@ class SignTool:
             logging.exception(ex)
             raise ex
 
-        epoch = int(time.time())
-        stdout, stderr = process.communicate()
-
-        log_path = pathlib.Path(f"signtool-{epoch}.log")
-        log_path.write_text(stdout.decode())
-
-        err_path = pathlib.Path(f"signtool-{epoch}.err")
-        err_path.write_text(stderr.decode())
-
-        log_cmd_path = pathlib.Path(f"signtool-{epoch}-cmd.txt")
-        log_cmd_path.write_text(shlex.join(cmd))
-        
-        if err := stderr.decode():
-            if "No private key is available" in err:
-                raise SigntoolPrivatekeyException(err)
-            logging.warning(err)
-
-        logging.debug(f"singtool.exe's returncode: {process.returncode}")
-        return process.returncode
+        started = time.time()
+        parser = parse.OutputParser()
+        lock = threading.Lock()
+        # stdout, the bulk of verify /v output, is kept only for the journal
+        stdout = [] if self.keeps_output() else None
+        stderr = []
+        reader = threading.Thread(
+            target=_pump, args=(process.stderr, stderr, parser, lock, True)
+        )
+        reader.start()
+        _pump(process.stdout, stdout, parser, lock)
+        reader.join()
+        process.wait()
+        duration = time.time() - started
+
+        return self.completed(
+            cmd,
+            process.returncode,
+            b"".join(stdout or []).decode(errors="replace"),
+            b"".join(stderr).decode(errors="replace"),
+            started,
+            duration,
+            parser.close(),
+        )
+
+    def keeps_output(self) -> bool:
+        """Whether an invocation's stdout is kept as text, for the journal"""
+        journal = type(self).journal
+        return journal is not None and journal.wants_output
+
+    def completed(
+        self,
+        cmd,
+        returncode: int,
+        stdout: str,
+        stderr: str,
+        started,
+        duration,
+        parser: Optional[parse.OutputParser] = None,
+    ) -> subprocess.CompletedProcess:
+        """Journal a finished invocation and check it for fatal errors.
+
+        The result carries the parsed output as ``parsed``; without a parser
+        the output is parsed here.  stdout is empty unless
+        :meth:`keeps_output`.
+        """
+        metrics.observe(f"invocation.{cmd[1]}", duration)
+        metrics.count("invocations")
+        if parser is None:
+            parser = parse.parse(stdout.encode(), stderr.encode())
+        metrics.count("bytes_stdout", parser.bytes_fed[False])
+        metrics.count("bytes_stderr", parser.bytes_fed[True])
+        if (journal := type(self).journal) is not None:
+            invocation = journal.record(
+                cmd, returncode, stdout, stderr, started, duration
+            )
+            logging.debug(f"signtool invocation {invocation} took {duration:.3f}s")
+
+        for error_class in parser.error_classes:
+            metrics.count(f"errors_{error_class}")
+        if parser.private_key_missing:
+            raise SigntoolPrivatekeyException(stderr)
+        if stderr:
+            logging.warning(stderr)
+
+        logging.debug(f"singtool.exe's returncode: {returncode}")
+        result = subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+        result.parsed = parser
+        return result
+
+    def record_timing(self, kind: str, files: int, seconds: float):
+        """Feed an invocation's duration to the run-to-run cost model, if any"""
+        if (timings := type(self).timings) is not None:
+            timings.observe(kind, files, seconds)
+
+    def files_per_call(self, limit: int = 0) -> int:
+        """Most files one invocation may take when asked for limit; 0 is any"""
+        most = type(self).MAX_FILES_PER_CALL
+        return min(limit, most) if limit and most else limit or most
+
+    def verified_subset(
+        self, paths: List[str], result: subprocess.CompletedProcess
+    ) -> Optional[Set[str]]:
+        """Which of paths a verify invocation passed, or None if it can't tell"""
+        return verified_subset(paths, result)
 
     def verify_cmd(self, *paths: List[str]):
-        """
+        r"""
         signtool.exe verify /debug /v /pa C:\dxLib.dll
         """
         prefix = [
@@ -141,15 +339,133 @@ class SignTool:
         return cmd
 
     def decode_credentials(self, _str) -> str:
-        base64_bytes = _str.encode("ascii")
-        message_bytes = base64.b64decode(base64_bytes)
-        return message_bytes.decode("ascii")
+        return _decode_credentials(_str)
 
     def sign_cmd(self):
         if not self.files_to_sign:
             return None
 
-        if not (password := os.environ.get("SAFENET_CLIENT_CREDENTIALS", "")):
+        cmd = self.sign_prefix()
+        cmd.extend(self.files_to_sign)
+
+        return cmd
+
+    def sign_chunks(self, limit: int = batching.CMDLINE_LIMIT) -> List[List[str]]:
+        """files_to_sign split so no sign command line exceeds limit characters.
+
+        Chunks are sized for the longest timestamp URL, so they fit whichever
+        one ``sign_files`` ends up using.
+        """
+        if not self.files_to_sign:
+            return []
+
+        return list(
+            batching.pack(
+                self.files_to_sign,
+                self.sign_prefix(type(self).url_manager.longest_url),
+                limit,
+                max_files=self.files_per_call(),
+            )
+        )
+
+    def sign_cmds(self, limit: int = batching.CMDLINE_LIMIT) -> List[List[str]]:
+        """sign_cmd split so no command line exceeds limit characters"""
+        prefix = self.sign_prefix(type(self).url_manager.longest_url)
+        return [prefix + chunk for chunk in self.sign_chunks(limit)]
+
+    def sign_files(self, files: List[str]) -> subprocess.CompletedProcess:
+        """Sign files, moving on to the next best timestamp server if one fails"""
+        manager = type(self).url_manager
+        for url in manager.ranked():
+            start = time.monotonic()
+            with metrics.phase("sign"):
+                result = self.sign_invocation(files, url)
+            if not parsed(result).timestamp_failed:
+                elapsed = time.monotonic() - start
+                manager.record_success(url, elapsed / len(files))
+                self.record_timing("sign", len(files), elapsed)
+                metrics.count("files_signed", 0 if result.returncode else len(files))
+                return result
+            manager.record_failure(url)
+            metrics.count("timestamp_retries")
+            logging.warning(f"timestamp server {url} failed, trying the next one")
+        return result
+
+    def sign_invocation(
+        self, files: List[str], url: str
+    ) -> subprocess.CompletedProcess:
+        """One sign call for files, timestamped by url"""
+        return self.run_process(self.sign_prefix(url) + list(files))
+
+    def record_failures(self, paths: Iterable[str], error_class: Optional[str]):
+        for path in paths:
+            self.failure_classes[path] = error_class or "error"
+
+    def sign_isolating(self, files: List[str]) -> Tuple[List[str], List[str]]:
+        """Sign files and, if some fail, work out which; returns (signed, failed).
+
+        Files that signtool reports as signed are kept, falling back to a
+        batched verify when its output names no files.  Files it names in
+        its errors are set aside as failed.  The rest are retried together,
+        or split in half when a retry makes no progress, so good files are
+        signed in as few invocations as possible and never one by one
+        unless they sit next to a bad one.  Failed files are recorded in
+        ``failure_classes`` with the error class they failed with.
+        """
+        if not files:
+            return [], []
+
+        result = self.sign_files(files)
+        if not result.returncode:
+            return list(files), []
+        output = parsed(result)
+        if output.timestamp_failed or output.error_class in retry.TRANSIENT:
+            # the whole batch failed for a reason that may pass; bisecting
+            # would only hammer the TSA or token, so leave it to the retry
+            self.record_failures(files, output.error_class)
+            return [], list(files)
+        errors = output.file_errors(files)
+        if len(files) == 1:
+            self.record_failures(files, errors.get(files[0], output.error_class))
+            return [], list(files)
+
+        signed = output.signed_paths(files)
+        blamed = set(errors) - signed
+        for path in blamed:
+            self.record_failures([path], errors[path])
+        if not (signed or blamed):
+            # output names nothing; ask verify which files did get signed
+            signed = self.verify_signed(list(files), output.counts.get("signed"))
+        rest = [path for path in files if path not in signed and path not in blamed]
+        metrics.count("sign_isolations")
+        logging.info(
+            f"sign failed for {len(files):,d} file(s): {len(signed):,d} signed, "
+            f"{len(blamed):,d} named in errors, retrying {len(rest):,d}"
+        )
+
+        if signed or blamed:
+            more_signed, failed = self.sign_isolating(rest)
+        else:
+            middle = len(files) // 2
+            left_signed, left_failed = self.sign_isolating(files[:middle])
+            right_signed, right_failed = self.sign_isolating(files[middle:])
+            more_signed = left_signed + right_signed
+            failed = left_failed + right_failed
+
+        signed = [path for path in files if path in signed]
+        return signed + more_signed, sorted(blamed, key=files.index) + failed
+
+    def sign_prefix(self, url: str = None, password: str = None) -> List[str]:
+        """The sign command line up to, but not including, the files.
+
+        The token password comes from $SAFENET_CLIENT_CREDENTIALS unless
+        given already decoded as ``password``.
+        """
+        if password is not None:
+            password_decoded = password
+        elif password := os.environ.get("SAFENET_CLIENT_CREDENTIALS", ""):
+            password_decoded = self.decode_credentials(password)
+        else:
             msg = (
                 "credentials for signing could not be found from "
                 "$ENV:SAFENET_CLIENT_CREDENTIALS"
@@ -157,8 +473,6 @@ class SignTool:
             logging.critical(msg)
             raise ValueError(msg)
 
-        password_decoded = self.decode_credentials(password)
-
         cmd = [
             str(self.path),
             "sign",
@@ -167,7 +481,7 @@ class SignTool:
             "/f",
             "c:/sectigo.cer",
             "/csp",
-            "eToken Base Cryptographic Provider",
+            type(self).CSP,
             "/kc",
             password_decoded,
             "/n",
@@ -177,13 +491,11 @@ class SignTool:
             "/d",
             "Streambox",
             "/tr",
-            type(self).url_manager.url,
+            url or type(self).url_manager.url,
             "/td",
             type(self).HASH_ALGORITHM,
         ]
 
-        cmd.extend(self.files_to_sign)
-
         return cmd
 
 
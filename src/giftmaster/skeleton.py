@@ -1,9 +1,15 @@
+import collections
 import logging
 import sys
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
 
-from giftmaster import __version__
 from giftmaster import args as argsmod
-from giftmaster import logger, signtool
+from giftmaster import logger
+
+# Everything that spawns or talks to signtool is imported where it's used,
+# so that --help, --version and runs with nothing to sign start quickly.
 
 __author__ = "Taylor Monacelli"
 __copyright__ = "Taylor Monacelli"
@@ -12,54 +18,546 @@ __license__ = "MPL-2.0"
 _logger = logging.getLogger(__name__)
 
 
-def client(file_list, signtool_candidates, batch_size, dry_run=None):
-    if not file_list:
-        return
+class BatchResult:
+    # a plain class rather than a dataclass: importing dataclasses costs more
+    # start-up time than the rest of this module
 
-    _logger.debug(f"file list length: {len(file_list):,d}")
+    def __init__(self, index: int, files: List[str]):
+        self.index = index
+        self.files = files
+        self.already_signed: List[str] = []
+        self.signed: List[str] = []
+        self.failed: List[str] = []
+        self.returncode: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.duration = 0.0
+        self.target: Optional[str] = None
 
-    batch_size = len(file_list) if not batch_size else batch_size
-    batches = [
-        file_list[i : i + batch_size] for i in range(0, len(file_list), batch_size)
-    ]
-    _logger.debug(
-        f"there are {len(batches):,d} batch(s), with most having length {len(batches[0]):,d}"
-    )
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.returncode
+
+    def summary(self) -> str:
+        status = "ok" if self.ok else f"FAILED ({self.error or self.returncode})"
+        where = f" on {self.target}" if self.target else ""
+        return (
+            f"batch {self.index + 1}{where}: {len(self.files):,d} file(s), "
+            f"{len(self.already_signed):,d} already signed, "
+            f"{len(self.signed):,d} signed, {len(self.failed):,d} failed "
+            f"in {self.duration:.2f}s: {status}"
+        )
+
+
+class RunResults(list):
+    """BatchResults in batch order, along with the totals of the whole run"""
+
+    def __init__(self, results: Iterable[BatchResult] = (), totals=None):
+        super().__init__(results)
+        self.totals = totals if totals is not None else collections.Counter()
+
+    @property
+    def ok(self) -> bool:
+        return not (self.totals["failed"] or self.totals["failed_files"])
+
+
+class TokenLimiter:
+    """Hands out one semaphore per token so each caps its concurrent sign calls"""
 
-    dry_run = dry_run
+    def __init__(self, limit: int = 1):
+        self.limit = max(limit, 1)
+        self._semaphores = {}
+        self._lock = threading.Lock()
 
-    for batch in batches:
-        tool = signtool.SignTool.from_list(
+    def __call__(self, token: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if token not in self._semaphores:
+                self._semaphores[token] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[token]
+
+
+def sign_batch(
+    index,
+    batch,
+    signtool_candidates,
+    dry_run=None,
+    verify_batch_size=None,
+    limiter=None,
+    cache=None,
+    tool_class=None,
+) -> BatchResult:
+    from giftmaster import metrics, signtool
+
+    tool_class = tool_class or signtool.SignTool
+    result = BatchResult(index=index, files=list(batch))
+    start = time.monotonic()
+    try:
+        tool = tool_class.from_list(
             batch,
             signtool=signtool_candidates,
+            cache=cache,
         )
         if not dry_run:
-            tool.remove_already_signed()
-            tool.run(tool.sign_cmd())
+            candidates = tool.files_to_sign
+            tool.remove_already_signed(batch_size=verify_batch_size)
+            remaining = set(tool.files_to_sign)
+            result.already_signed = [p for p in candidates if p not in remaining]
+            limiter = limiter or TokenLimiter()
+
+            def sign(files):
+                with limiter(tool.token):
+                    return tool.sign_isolating(files)
+
+            policy = type(tool).retry_policy
+            for chunk in tool.sign_chunks():
+                if policy is None:
+                    signed, failed = sign(chunk)
+                else:
+                    # backing off outside the limiter leaves the token free
+                    signed, failed = policy.run(sign, chunk, tool.failure_classes.get)
+                result.signed.extend(signed)
+                result.failed.extend(failed)
+            result.returncode = 1 if result.failed else 0
+            if cache is not None:
+                cache.record(result.signed)
+            for path in result.failed:
+                reason = tool.failure_classes.get(path, "error")
+                _logger.error(f"couldn't sign {path} ({reason})")
+    except Exception as ex:
+        result.error = ex
+    result.duration = time.monotonic() - start
+    metrics.observe("batch", result.duration)
+    metrics.count("batches_failed", not result.ok)
+    return result
+
+
+def run_batches(
+    batches: Iterable[List[str]],
+    signtool_candidates,
+    dry_run=None,
+    verify_batch_size=None,
+    jobs=1,
+    keep_going=False,
+    token_jobs=1,
+    cache=None,
+    tool_class=None,
+) -> Iterator[BatchResult]:
+    """Yield a BatchResult per batch, in batch order, running up to jobs at once.
+
+    Batches are pulled from the iterable only as workers free up, so at most
+    ``2 * jobs`` of them are held in memory.  Unless ``keep_going`` is set, no
+    new batch starts after one fails.
+    """
+    import concurrent.futures
+
+    jobs = max(jobs, 1)
+    limiter = TokenLimiter(token_jobs)
+    stop = threading.Event()
+
+    def work(index, batch):
+        if stop.is_set():
+            return None
+        return sign_batch(
+            index,
+            batch,
+            signtool_candidates,
+            dry_run=dry_run,
+            verify_batch_size=verify_batch_size,
+            limiter=limiter,
+            cache=cache,
+            tool_class=tool_class,
+        )
+
+    def on_done(future):
+        result = future.result()
+        if result is not None and not result.ok and not keep_going:
+            stop.set()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = collections.deque()
+        for index, batch in enumerate(batches):
+            if stop.is_set():
+                _logger.warning("remaining batches not run after an earlier failure")
+                break
+            future = pool.submit(work, index, batch)
+            future.add_done_callback(on_done)
+            pending.append(future)
+            while len(pending) >= 2 * jobs:
+                if (result := pending.popleft().result()) is not None:
+                    yield result
+        while pending:
+            if (result := pending.popleft().result()) is not None:
+                yield result
+
+
+def client(
+    file_list,
+    signtool_candidates,
+    batch_size,
+    dry_run=None,
+    verify_batch_size=None,
+    jobs=1,
+    keep_going=False,
+    token_jobs=1,
+    cache=None,
+    collect=True,
+    tool_class=None,
+    checkpoint=None,
+) -> RunResults:
+    """Verify and sign file_list in batches, up to ``jobs`` batches at a time.
+
+    file_list may be any iterable, including a lazy stream; it is consumed
+    one batch at a time.  Unless ``keep_going`` is set, the first failed batch
+    stops batches that haven't started yet and its error, if any, is
+    re-raised once the running ones finish.  At most ``token_jobs`` sign calls
+    run against the same token at once.  Files recorded in ``cache`` are
+    skipped without spawning signtool, and files found or made signed are
+    added to it.
+
+    Each finished batch is recorded in ``checkpoint`` when one is given.
+    ``tool_class`` picks the signing tool and execution engine, e.g.
+    :class:`giftmaster.osslsigntool.OsslSignTool` or
+    :class:`giftmaster.aiosigntool.AsyncSignTool`.
+
+    Returns the BatchResults in batch order, or none when ``collect`` is
+    false so that memory doesn't grow with the input; either way ``ok`` on
+    the returned :class:`RunResults` tells whether every file got signed.
+    """
+    from giftmaster import inputs
+
+    batches = inputs.batched(file_list, batch_size)
+    results = run_batches(
+        batches,
+        signtool_candidates,
+        dry_run=dry_run,
+        verify_batch_size=verify_batch_size,
+        jobs=jobs,
+        keep_going=keep_going,
+        token_jobs=token_jobs,
+        cache=cache,
+        tool_class=tool_class,
+    )
+    return report(
+        results, keep_going=keep_going, collect=collect, checkpoint=checkpoint
+    )
+
+
+def report(
+    results: Iterable[BatchResult], keep_going=False, collect=True, checkpoint=None
+) -> RunResults:
+    """Log and checkpoint BatchResults as they arrive, then log the totals.
+
+    Re-raises the first batch error unless ``keep_going`` is set.
+    """
+    from giftmaster import metrics, signtool
+
+    start = time.monotonic()
+    collected = []
+    totals = collections.Counter()
+    first_error = None
+    for result in results:
+        _logger.info(result.summary())
+        if checkpoint is not None:
+            files = signtool.get_abs_path(result.files)
+            done = set(result.already_signed) | set(result.signed)
+            checkpoint.record(
+                result.index,
+                [path for path in files if path in done],
+                [path for path in files if path not in done],
+            )
+        totals.update(
+            batches=1,
+            files=len(result.files),
+            already_signed=len(result.already_signed),
+            signed=len(result.signed),
+            failed_files=len(result.failed),
+            failed=not result.ok,
+        )
+        if first_error is None and result.error is not None:
+            first_error = result.error
+        if collect:
+            collected.append(result)
+
+    metrics.observe("run", time.monotonic() - start)
+    if totals["batches"]:
+        _logger.info(
+            f"{totals['batches']:,d} batch(s), {totals['files']:,d} file(s): "
+            f"{totals['already_signed']:,d} already signed, "
+            f"{totals['signed']:,d} signed, {totals['failed_files']:,d} failed; "
+            f"{totals['failed']:,d} batch(s) failed"
+        )
+
+    if first_error is not None and not keep_going:
+        raise first_error
 
     _logger.info("Script ends here")
+    return RunResults(collected, totals)
+
+
+class ClassSettings:
+    """Class attributes set for one run, put back by :meth:`restore`.
+
+    The per-process services (``url_manager``, ``journal``, ...) live on
+    the tool classes; setting them through here keeps one run's from
+    leaking into the next in the same process.
+    """
+
+    _MISSING = object()
+
+    def __init__(self):
+        self._saved = []
+
+    def set(self, cls, name: str, value):
+        self._saved.append((cls, name, cls.__dict__.get(name, self._MISSING)))
+        setattr(cls, name, value)
+
+    def restore(self):
+        while self._saved:
+            cls, name, old = self._saved.pop()
+            if old is self._MISSING:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, old)
+
+
+def backend_class(args, settings: ClassSettings = None):
+    """The SignTool class for --backend, configured from the command line"""
+    from giftmaster import signtool
+
+    if args.backend != "osslsigncode":
+        return signtool.SignTool
+
+    from giftmaster import osslsigntool
+
+    settings = settings or ClassSettings()
+    tool_class = osslsigntool.OsslSignTool
+    if args.pkcs11_module:
+        settings.set(tool_class, "PKCS11_MODULE", args.pkcs11_module)
+    if args.pkcs11_key:
+        settings.set(tool_class, "KEY", args.pkcs11_key)
+    if args.certs:
+        settings.set(tool_class, "CERTS", args.certs)
+    return tool_class
 
 
 def main(args):
+    if args and args[0] in ("serve", "submit"):
+        from giftmaster import server
+
+        return getattr(server, args[0])(args[1:])
+
     args = argsmod.parse_args(args)
     logger.setup_logging(args.loglevel)
 
     _logger.debug(f"file list {args.files}")
 
-    file_list = args.files
-
-    if not file_list:
+    if not (args.files or args.files_from or args.walk):
         return
 
-    _logger.debug(f"file list length: {len(file_list):,d}")
-    signtool_candidates = args.signtool
+    settings = ClassSettings()
+    try:
+        return sign_inputs(args, settings)
+    finally:
+        settings.restore()
+
+
+def sign_inputs(args, settings: ClassSettings):
+    """Sign what the parsed command line args name; main's exit status"""
+    from giftmaster import cache as cachemod
+    from giftmaster import checkpoint as checkpointmod
+    from giftmaster import inputs, journal, metrics
+    from giftmaster import preflight as preflightmod
+    from giftmaster import retry, signonce, signtool, timestamp
+    from giftmaster import timings as timingsmod
+
+    metrics.registry.enabled = bool(
+        args.metrics or args.metrics_prom or args.metrics_json
+    )
+
+    incremental = None
+    if args.incremental:
+        from giftmaster import incremental as incrementalmod
+
+        incremental = incrementalmod.Incremental(
+            args.manifest or cachemod.default_cache_dir() / "manifest.json",
+            jobs=args.scan_jobs,
+        )
+        file_list = incremental.changed(
+            inputs.iter_inputs(args.files, files_from=args.files_from, null=args.null),
+            roots=args.walk or [],
+            include=args.include,
+        )
+    else:
+        file_list = inputs.iter_inputs(
+            args.files,
+            files_from=args.files_from,
+            null=args.null,
+            walk_roots=args.walk,
+            include=args.include,
+        )
+    preflight = preflightmod.Preflight(
+        drop_unsupported=args.drop_unsupported,
+        on_drop=incremental.dropped if incremental is not None else None,
+    )
+    file_list = preflight(file_list)
+
+    if args.journal_level != "off":
+        run_journal = journal.RunJournal(
+            args.journal,
+            level=args.journal_level,
+            max_bytes=args.journal_max_bytes,
+            compress=args.journal_compress,
+        )
+        settings.set(signtool.SignTool, "journal", run_journal)
+
+    url_manager = timestamp.TimeStampURLManager(
+        args.timestamp_url,
+        state_path=args.timestamp_stats or cachemod.default_cache_dir() / "tsa.json",
+    )
+    settings.set(signtool.SignTool, "url_manager", url_manager)
+    timings = timingsmod.Timings(
+        args.timings or cachemod.default_cache_dir() / "timings.json"
+    )
+    settings.set(signtool.SignTool, "timings", timings)
+    settings.set(signtool.SignTool, "retry_policy", retry.from_args(args))
+
+    tool_class = backend_class(args, settings)
+    signtool_candidates = args.signtool or tool_class.DEFAULT_PATHS
+    if args.engine == "asyncio":
+        from giftmaster import aiosigntool
+
+        if tool_class is signtool.SignTool:
+            tool_class = aiosigntool.AsyncSignTool
+        else:
+            tool_class = type(
+                f"Async{tool_class.__name__}",
+                (aiosigntool.AsyncSignTool, tool_class),
+                {},
+            )
+        settings.set(tool_class, "TIMEOUT", args.timeout)
+        settings.set(tool_class, "CONCURRENCY", args.verify_jobs)
+
+    ckpt = None
+    if not (args.no_checkpoint or args.dry_run):
+        path = args.checkpoint or checkpointmod.default_path(
+            checkpointmod.job_key(args.files, args.files_from, args.walk, args.include)
+        )
+        try:
+            ckpt = checkpointmod.Checkpoint(path, resume=args.resume)
+        except checkpointmod.CheckpointInUse as ex:
+            _logger.error(ex)
+            return 1
+        if args.resume:
+            done = ckpt.completed()
+            _logger.info(f"resuming: skipping {len(done):,d} file(s) already done")
+            file_list = checkpointmod.skip_completed(file_list, done)
+
+    cache = None
+    if not args.no_cache:
+        rebuild = args.rebuild_cache and not args.dry_run
+        cache = cachemod.open_cache(args.cache, rebuild=rebuild)
+        path_cache = cache.path.with_name("signtool-path.json")
+        settings.set(signtool.SignTool, "PATH_CACHE", path_cache)
+        if rebuild:
+            path_cache.unlink(missing_ok=True)
+
+    once = None
+    if args.sign_once or args.artifact_store:
+        store = None
+        if args.artifact_store and not args.dry_run:
+            store = signonce.ArtifactStore(args.artifact_store)
+        once = signonce.SignOnce(store=store)
+        file_list = once.plan(file_list)
+
+    recorder = ckpt
+    if incremental is not None and not args.dry_run:
+        recorder = checkpointmod.Recorders(ckpt, incremental)
+
+    results = None
+    if args.dry_run:
+        from giftmaster import plan as planmod
+
+        plan = planmod.plan(
+            file_list,
+            signtool_candidates,
+            args.batch_size,
+            tool_class,
+            verify_batch_size=args.verify_batch_size,
+            jobs=args.jobs,
+            token_jobs=args.token_jobs,
+            cache=cache,
+        )
+        print(plan.render(timings))
+    elif args.target:
+        from giftmaster import shard
+
+        targets = [
+            shard.parse_target(
+                spec,
+                signtool_candidates,
+                tool_class=tool_class,
+                verify_batch_size=args.verify_batch_size,
+                cache=cache,
+            )
+            for spec in args.target
+        ]
+        results = shard.client(
+            file_list,
+            targets,
+            args.batch_size,
+            retries=args.target_retries,
+            keep_going=args.keep_going,
+            collect=False,
+            checkpoint=recorder,
+        )
+    else:
+        results = client(
+            file_list,
+            signtool_candidates,
+            args.batch_size,
+            verify_batch_size=args.verify_batch_size,
+            jobs=args.jobs,
+            keep_going=args.keep_going,
+            token_jobs=args.token_jobs,
+            cache=cache,
+            collect=False,
+            tool_class=tool_class,
+            checkpoint=recorder,
+        )
+
+    if once is not None:
+        once.distribute(cache=cache)
+        _logger.info(f"sign once: {once.summary()}")
+    _logger.info(f"inputs: {preflight.summary()}")
+    if ckpt is not None:
+        ckpt.finish()
+        ckpt.close()
+    if incremental is not None and not args.dry_run:
+        incremental.save()
+    url_manager.save()
+    timings.save()
+
+    if metrics.registry.enabled:
+        for url, stats in url_manager.stats.items():
+            if stats.latency is not None:
+                metrics.registry.gauge(
+                    "timestamp_latency_seconds", stats.latency, url=url
+                )
+        _logger.info("metrics:\n" + metrics.registry.summary())
+        if args.metrics_prom:
+            metrics.registry.write_prometheus(args.metrics_prom)
+        if args.metrics_json:
+            metrics.registry.write_json(args.metrics_json)
+
+    if signtool.SignTool.journal is not None:
+        signtool.SignTool.journal.close()
+        _logger.info(f"signtool journal written to {signtool.SignTool.journal.path}")
 
-    batch_size = len(args.files) if not args.batch_size else args.batch_size
-    client(file_list, signtool_candidates, batch_size, dry_run=args.dry_run)
+    if results is not None and not results.ok:
+        return 1
 
 
 def run():
-    main(sys.argv[1:])
+    sys.exit(main(sys.argv[1:]))
 
 
 if __name__ == "__main__":
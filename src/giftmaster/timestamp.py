@@ -1,7 +1,44 @@
+import json
+import logging
+import os
+import pathlib
 import random
+import threading
+import time
+from typing import Dict, List
+
+_logger = logging.getLogger(__name__)
+
+# signtool and osslsigncode report an unreachable or misbehaving TSA with these
+TIMESTAMP_FAILURE_MARKERS = (
+    "timestamp server either could not be reached",
+    "timestamp server could not be reached",
+    "The timestamp server's response was invalid",
+    "timestamping failed",
+)
+
+
+class URLStats:
+    def __init__(self, latency=None, failures=0, opened_at=None, successes=0):
+        self.latency = latency
+        self.failures = failures
+        self.opened_at = opened_at
+        self.successes = successes
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
 
 
 class TimeStampURLManager:
+    """Picks the timestamp server most likely to answer quickly.
+
+    Each URL keeps an exponentially weighted moving average of per-file
+    signing latency and a count of consecutive failures.  After
+    ``FAILURE_THRESHOLD`` failures in a row its circuit opens and it isn't
+    offered again until ``COOLDOWN`` seconds have passed, after which one
+    trial decides whether it closes again.
+    """
+
     urls = [
         "http://timestamp.comodoca.com/rfc3161",
         "http://timestamp.digicert.com",
@@ -14,7 +51,85 @@ class TimeStampURLManager:
         "http://timestamp.digicert.com",
     ]
 
+    EWMA_ALPHA = 0.3
+    FAILURE_THRESHOLD = 3
+    COOLDOWN = 300.0
+
+    def __init__(self, urls: List[str] = None, state_path=None):
+        self.urls = list(urls or type(self).urls)
+        self.state_path = pathlib.Path(state_path) if state_path else None
+        self.stats = {url: URLStats() for url in self.urls}
+        self._lock = threading.Lock()
+        if self.state_path is not None:
+            self.load()
+
     @property
     def url(self):
-        cls = type(self)
-        return random.choice(cls.urls)
+        return self.ranked()[0]
+
+    @property
+    def longest_url(self) -> str:
+        """The URL that makes the longest command line; size batches for it"""
+        return max(self.urls, key=len)
+
+    def _is_open(self, stats: URLStats, now: float) -> bool:
+        return stats.opened_at is not None and now - stats.opened_at < self.COOLDOWN
+
+    def ranked(self) -> List[str]:
+        """All URLs, best first; URLs with an open circuit come last"""
+        now = time.time()
+        with self._lock:
+            shuffled = random.sample(self.urls, len(self.urls))
+
+            def key(url):
+                stats = self.stats[url]
+                if self._is_open(stats, now):
+                    return (1, stats.opened_at, 0.0)
+                return (0, stats.failures, stats.latency or 0.0)
+
+            return sorted(shuffled, key=key)
+
+    def record_success(self, url: str, latency: float):
+        with self._lock:
+            stats = self.stats.setdefault(url, URLStats())
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                alpha = self.EWMA_ALPHA
+                stats.latency = alpha * latency + (1 - alpha) * stats.latency
+            stats.failures = 0
+            stats.opened_at = None
+            stats.successes += 1
+
+    def record_failure(self, url: str):
+        with self._lock:
+            stats = self.stats.setdefault(url, URLStats())
+            stats.failures += 1
+            if stats.failures >= self.FAILURE_THRESHOLD or stats.opened_at:
+                stats.opened_at = time.time()
+                _logger.warning(
+                    f"timestamp server {url} failed {stats.failures} time(s) in a "
+                    f"row, not using it for {self.COOLDOWN:.0f}s"
+                )
+
+    def load(self):
+        try:
+            state = json.loads(self.state_path.read_text())
+            loaded = {url: URLStats(**state[url]) for url in self.urls if url in state}
+        except (OSError, ValueError, TypeError) as ex:
+            _logger.debug(
+                f"no timestamp server stats loaded from {self.state_path}: {ex}"
+            )
+            return
+        with self._lock:
+            self.stats.update(loaded)
+
+    def save(self):
+        if self.state_path is None:
+            return
+        with self._lock:
+            state = {url: stats.to_dict() for url, stats in self.stats.items()}
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, self.state_path)
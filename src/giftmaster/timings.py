@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import pathlib
+import threading
+from typing import Dict, List
+
+_logger = logging.getLogger(__name__)
+
+
+class Timings:
+    """Cost of past signtool invocations, kept between runs to estimate new ones.
+
+    Each kind of invocation ("verify", "sign") is modelled as a fixed cost
+    per process plus a cost per file, fitted by least squares over the
+    observed (files, seconds) pairs with older observations decaying away.
+    Until there is enough history the DEFAULTS stand in.
+    """
+
+    DEFAULTS = {"verify": (0.2, 0.02), "sign": (1.0, 0.3)}
+    DECAY = 0.98
+
+    def __init__(self, path=None):
+        self.path = pathlib.Path(path) if path else None
+        self._sums: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.load()
+
+    def observe(self, kind: str, files: int, seconds: float):
+        with self._lock:
+            sums = self._sums.setdefault(kind, [0.0] * 5)
+            sums[:] = [s * type(self).DECAY for s in sums]
+            for i, value in enumerate(
+                (1, files, seconds, files * files, files * seconds)
+            ):
+                sums[i] += value
+
+    def coefficients(self, kind: str):
+        """(seconds per process, seconds per file) for kind"""
+        spawn, per_file = type(self).DEFAULTS.get(kind, (1.0, 0.0))
+        with self._lock:
+            w, wx, wy, wxx, wxy = self._sums.get(kind, [0.0] * 5)
+        if not w:
+            return spawn, per_file
+        denom = w * wxx - wx * wx
+        if denom > 1e-9 * w * wxx:
+            per_file = max((w * wxy - wx * wy) / denom, 0.0)
+        # with a single batch size seen, keep the default per-file cost
+        spawn = max((wy - per_file * wx) / w, 0.0)
+        return spawn, per_file
+
+    def estimate(self, kind: str, files: int) -> float:
+        spawn, per_file = self.coefficients(kind)
+        return spawn + per_file * files
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            _logger.warning(f"ignoring unreadable timings {self.path}: {ex}")
+            return
+        self._sums = {
+            kind: [float(s) for s in sums]
+            for kind, sums in data.items()
+            if isinstance(sums, list) and len(sums) == 5
+        }
+
+    def save(self):
+        if self.path is None or not self._sums:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = json.dumps(self._sums)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(data)
+        os.replace(tmp, self.path)
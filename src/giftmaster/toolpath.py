@@ -0,0 +1,130 @@
+import glob as globmod
+import json
+import logging
+import os
+import pathlib
+import re
+import threading
+from typing import Dict, List, Optional
+
+from foodsale import pathfromglob
+
+from giftmaster import metrics
+
+_logger = logging.getLogger(__name__)
+
+_VERSION_RE = re.compile(r"\d+(?:\.\d+)+")
+
+_resolved: Dict[tuple, pathlib.Path] = {}
+_resolved_lock = threading.Lock()
+
+
+def version_key(path: pathlib.Path):
+    """Sort key ranking paths by the version numbers in them, e.g. SDK dirs"""
+    versions = [
+        tuple(int(n) for n in match.split("."))
+        for match in _VERSION_RE.findall(str(path))
+    ]
+    return (versions, str(path))
+
+
+def newest(paths: List[pathlib.Path]) -> pathlib.Path:
+    return max(paths, key=version_key)
+
+
+def watched_dirs(path: pathlib.Path, globs: List[str]) -> List[pathlib.Path]:
+    """Directories whose mtime changes when a new match for path's glob appears"""
+    for pattern in globs:
+        parts = pathlib.PurePath(pattern).parts
+        if len(parts) != len(path.parts) or not path.match(pattern):
+            continue
+        return [
+            pathlib.Path(*path.parts[:i])
+            for i, part in enumerate(parts)
+            if globmod.has_magic(part)
+        ]
+    return []
+
+
+def fingerprint(path: pathlib.Path, globs: List[str]) -> Optional[Dict[str, int]]:
+    try:
+        return {
+            str(p): p.stat().st_mtime_ns for p in [path, *watched_dirs(path, globs)]
+        }
+    except OSError:
+        return None
+
+
+def _load(cache_path) -> Dict:
+    try:
+        return json.loads(pathlib.Path(cache_path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(cache_path, state: Dict):
+    cache_path = pathlib.Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, cache_path)
+
+
+def find(globs: List[str]) -> pathlib.Path:
+    """Glob for the tool and pick the match with the newest version in its path"""
+    paths = set()
+    for pattern in globs:
+        paths.update(pathfromglob.abspathglob(pattern))
+    paths = [path for path in paths if path.exists()]
+
+    if len(paths) < 1:
+        msg = f"no glob from list {globs} matche any paths on filesystem"
+        logging.exception(msg)
+        raise ValueError(msg)
+
+    path = newest(paths)
+    if len(paths) > 1:
+        _logger.info(
+            f"globs {globs} match {len(paths)} paths, using the newest version {path}"
+        )
+    return path
+
+
+def resolve(globs: List[str], cache_path=None) -> pathlib.Path:
+    """Resolve globs to a tool path once per process.
+
+    With cache_path the result is also kept between runs, and reused as long
+    as the tool and the directories its globs expanded over keep their mtime.
+    """
+    key = tuple(globs)
+    with _resolved_lock:
+        if key in _resolved:
+            return _resolved[key]
+
+        with metrics.phase("resolve_tool"):
+            path = _resolve(globs, cache_path)
+        _resolved[key] = path
+        return path
+
+
+def _resolve(globs: List[str], cache_path) -> pathlib.Path:
+    state = _load(cache_path) if cache_path else {}
+    entry = state.get(json.dumps(globs))
+    if entry and fingerprint(pathlib.Path(entry["path"]), globs) == entry["mtimes"]:
+        metrics.count("tool_path_cache_hits")
+        return pathlib.Path(entry["path"])
+
+    path = find(globs)
+    if cache_path:
+        state[json.dumps(globs)] = {
+            "path": str(path),
+            "mtimes": fingerprint(path, globs),
+        }
+        _save(cache_path, state)
+    return path
+
+
+def clear():
+    """Forget paths resolved by this process"""
+    with _resolved_lock:
+        _resolved.clear()
@@ -1,10 +1,65 @@
 """
-    Dummy conftest.py for giftmaster.
+Dummy conftest.py for giftmaster.
 
-    If you don't know what this is for, just leave it empty.
-    Read more about conftest.py under:
-    - https://docs.pytest.org/en/stable/fixture.html
-    - https://docs.pytest.org/en/stable/writing_plugins.html
+If you don't know what this is for, just leave it empty.
+Read more about conftest.py under:
+- https://docs.pytest.org/en/stable/fixture.html
+- https://docs.pytest.org/en/stable/writing_plugins.html
 """
 
-# import pytest
+import pathlib
+
+import pytest
+
+from giftmaster import fakesigntool
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch) -> pathlib.Path:
+    """Per-test cache dir, so no test writes to the real ~/.cache/giftmaster"""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    return path
+
+
+@pytest.fixture
+def fake_signtool(tmp_path, monkeypatch) -> pathlib.Path:
+    """Executable fake signtool; signtool log files land in tmp_path"""
+    path = fakesigntool.install(tmp_path / "bin")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FAKE_SIGNTOOL_CALLS", str(tmp_path / "calls.txt"))
+    monkeypatch.setenv("SAFENET_CLIENT_CREDENTIALS", "c2VjcmV0")
+    return path
+
+
+@pytest.fixture
+def signtool_calls(tmp_path):
+    """Return a callable listing the fake signtool invocations so far"""
+
+    def calls():
+        path = tmp_path / "calls.txt"
+        return path.read_text().splitlines() if path.exists() else []
+
+    return calls
+
+
+@pytest.fixture
+def unsigned_files(tmp_path):
+    """Return a factory creating n unsigned files under tmp_path/files"""
+
+    def make(n, signed=()):
+        root = tmp_path / "files"
+        root.mkdir(exist_ok=True)
+        paths = []
+        for i in range(n):
+            path = root / f"file{i:05d}.dll"
+            data = b"MZ" + bytes(62)
+            if i in signed:
+                data += fakesigntool.MARKER
+            path.write_bytes(data)
+            paths.append(str(path))
+        return paths
+
+    return make
@@ -0,0 +1,56 @@
+"""
+Local stand-in for an RFC 3161 timestamp authority.
+
+It accepts ``application/timestamp-query`` POSTs and answers with a
+minimal TimeStampResp whose PKIStatus is granted, after an optional
+delay.  Setting ``fail`` makes it answer 503 instead.
+"""
+
+import http.server
+import threading
+import time
+
+# TimeStampResp ::= SEQUENCE { status PKIStatusInfo ::= SEQUENCE { granted(0) } }
+GRANTED = bytes.fromhex("30053003020100")
+
+
+class FakeTSA:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.requests = 0
+        tsa = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                tsa.requests += 1
+                time.sleep(tsa.delay)
+                valid = (
+                    self.headers.get("Content-Type") == "application/timestamp-query"
+                    and body[:1] == b"\x30"
+                )
+                if tsa.fail or not valid:
+                    self.send_response(503 if tsa.fail else 400)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/timestamp-reply")
+                self.send_header("Content-Length", str(len(GRANTED)))
+                self.end_headers()
+                self.wfile.write(GRANTED)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/tsa"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
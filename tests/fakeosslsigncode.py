@@ -0,0 +1,108 @@
+"""
+Stand-in for osslsigncode so the osslsigncode backend can be exercised in tests.
+
+Mirrors fakesigntool: a file counts as signed when it contains ``MARKER``,
+which ``sign`` appends to the copy it writes to ``-out``, files containing
+``CORRUPT`` can't be signed, and every invocation is appended to
+``$FAKE_SIGNTOOL_CALLS`` when that is set.
+"""
+
+import os
+import pathlib
+import sys
+import time
+
+# the same bytes as fakesigntool, so each fake sees the other's signatures
+MARKER = b"\x00FAKESIGNED\x00"
+CORRUPT = b"\x00FAKECORRUPT\x00"
+
+OPTIONS_WITH_VALUES = {
+    "-pkcs11module",
+    "-pkcs11engine",
+    "-certs",
+    "-key",
+    "-pass",
+    "-h",
+    "-n",
+    "-i",
+    "-t",
+    "-ts",
+    "-in",
+    "-out",
+}
+
+
+def split_args(argv):
+    options = {}
+    it = iter(argv)
+    for arg in it:
+        if arg not in OPTIONS_WITH_VALUES:
+            print(f"Unknown option: {arg}", file=sys.stderr)
+            return None
+        options[arg] = next(it)
+    return options
+
+
+def latency(name):
+    return float(os.environ.get(f"FAKE_SIGNTOOL_{name}", 0))
+
+
+def verify(options):
+    time.sleep(latency("VERIFY_LATENCY"))
+    path = options.get("-in", "")
+    if not os.path.exists(path):
+        print(f"Failed to open file: {path}", file=sys.stderr)
+        return 1
+    if MARKER not in pathlib.Path(path).read_bytes():
+        print("No signature found", file=sys.stderr)
+        print("Failed", file=sys.stderr)
+        return 1
+    print("Signature verification: ok")
+    print("Succeeded")
+    return 0
+
+
+def sign(options):
+    time.sleep(latency("SIGN_LATENCY") + latency("TSA_DELAY"))
+    data = pathlib.Path(options["-in"]).read_bytes()
+    if CORRUPT in data:
+        print("Unrecognized file type", file=sys.stderr)
+        print("Failed", file=sys.stderr)
+        return 1
+    out = pathlib.Path(options["-out"])
+    if out.exists():
+        print(f"Failed to create file: {out}", file=sys.stderr)
+        return 1
+    out.write_bytes(data + MARKER)
+    print("Succeeded")
+    return 0
+
+
+def main(argv):
+    if calls := os.environ.get("FAKE_SIGNTOOL_CALLS"):
+        with open(calls, "a") as f:
+            f.write(" ".join(argv) + "\n")
+
+    time.sleep(latency("DELAY"))
+    command, *rest = argv
+    if (options := split_args(rest)) is None:
+        return 1
+    if command == "verify":
+        return verify(options)
+    if command == "sign":
+        return sign(options)
+    print(f"Unknown command: {command}", file=sys.stderr)
+    return 1
+
+
+def install(directory, name="osslsigncode") -> pathlib.Path:
+    """Write this module out as an executable script in directory (POSIX only)"""
+    path = pathlib.Path(directory) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"#!{sys.executable}\n" + pathlib.Path(__file__).read_text())
+    path.chmod(0o755)
+    return path
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from giftmaster import aiosigntool, signtool, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_remove_already_signed_multiplexes_verify(
+    fake_signtool, signtool_calls, unsigned_files, monkeypatch
+):
+    monkeypatch.setenv("FAKE_SIGNTOOL_DELAY", "0.3")
+    files = unsigned_files(8, signed={1, 6})
+    tool = aiosigntool.AsyncSignTool.from_list(files, signtool=[str(fake_signtool)])
+
+    start = time.monotonic()
+    tool.remove_already_signed(batch_size=2)
+    elapsed = time.monotonic() - start
+
+    assert tool.files_to_sign == [f for i, f in enumerate(files) if i not in {1, 6}]
+    assert len(signtool_calls()) == 4
+    assert elapsed < 4 * 0.3
+
+
+def test_timeout_kills_invocation(fake_signtool, unsigned_files, monkeypatch):
+    monkeypatch.setenv("FAKE_SIGNTOOL_DELAY", "30")
+    monkeypatch.setattr(aiosigntool.AsyncSignTool, "TIMEOUT", 0.5)
+    files = unsigned_files(1)
+    tool = aiosigntool.AsyncSignTool.from_list(files, signtool=[str(fake_signtool)])
+
+    start = time.monotonic()
+    result = tool.run_process(tool.verify_cmd(*files))
+    assert result.returncode != 0
+    assert time.monotonic() - start < 5
+
+
+def test_private_key_error_detected_while_streaming(
+    fake_signtool, unsigned_files, monkeypatch
+):
+    monkeypatch.setenv("FAKE_SIGNTOOL_NO_KEY", "1")
+    files = unsigned_files(1)
+    tool = aiosigntool.AsyncSignTool.from_list(files, signtool=[str(fake_signtool)])
+
+    start = time.monotonic()
+    with pytest.raises(signtool.SigntoolPrivatekeyException):
+        tool.run_process(tool.sign_cmd())
+    assert time.monotonic() - start < 5
+
+
+def test_client_with_async_engine(fake_signtool, unsigned_files):
+    files = unsigned_files(6, signed={0})
+    results = skeleton.client(
+        files, [str(fake_signtool)], 3, tool_class=aiosigntool.AsyncSignTool
+    )
+    assert [len(r.signed) for r in results] == [2, 3]
@@ -0,0 +1,59 @@
+import pytest
+
+from giftmaster import batching, signtool, timestamp
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_cmdline_length_counts_quoting_and_utf16():
+    assert batching.cmdline_length(["signtool", "sign"]) == len("signtool sign")
+    assert batching.cmdline_length(["a b"]) == len('"a b"')
+    assert batching.cmdline_length(["\U0001f600"]) == 2
+
+
+@pytest.mark.parametrize("limit", [200, 1000, batching.CMDLINE_LIMIT])
+def test_pack_respects_limit(limit):
+    prefix = ["C:\\Program Files\\signtool.exe", "sign", "/v"]
+    paths = [f"C:\\build\\out dir\\{'x' * (i % 37)}\\file{i}.dll" for i in range(3000)]
+    chunks = list(batching.pack(paths, prefix, limit=limit))
+
+    assert [p for chunk in chunks for p in chunk] == paths
+    for i, chunk in enumerate(chunks):
+        assert batching.cmdline_length(prefix + chunk) < limit
+        if i + 1 < len(chunks):
+            grown = prefix + chunk + chunks[i + 1][:1]
+            assert batching.cmdline_length(grown) >= limit
+
+
+def test_pack_max_files_and_oversized_path():
+    chunks = list(batching.pack(["a", "b", "c"], ["tool"], max_files=2))
+    assert chunks == [["a", "b"], ["c"]]
+    with pytest.raises(ValueError):
+        list(batching.pack(["x" * 100], ["tool"], limit=50))
+
+
+def test_sign_cmds_split_by_length(fake_signtool, unsigned_files):
+    files = unsigned_files(40)
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    cmds = tool.sign_cmds(limit=1000)
+
+    assert len(cmds) > 1
+    assert all(batching.cmdline_length(cmd) < 1000 for cmd in cmds)
+    assert [p for cmd in cmds for p in cmd if p in files] == files
+
+
+def test_sign_chunks_fit_every_timestamp_url(
+    fake_signtool, unsigned_files, monkeypatch
+):
+    urls = ["http://ts.example", "http://timestamp.example.com/" + "x" * 40]
+    manager = timestamp.TimeStampURLManager(urls)
+    monkeypatch.setattr(signtool.SignTool, "url_manager", manager)
+    files = unsigned_files(40)
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+
+    for _ in range(10):
+        for chunk in tool.sign_chunks(limit=1000):
+            for url in urls:
+                assert batching.cmdline_length(tool.sign_prefix(url) + chunk) < 1000
@@ -0,0 +1,40 @@
+import json
+
+from giftmaster import bench, pe
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_make_tree(tmp_path):
+    paths = bench.make_tree(tmp_path, 30, per_dir=10, signed_ratio=0.5)
+    assert len(paths) == 30
+    assert len(list(tmp_path.iterdir())) == 3
+    signed = [pe.has_certificate_table(path) for path in paths]
+    assert True in signed and False in signed
+
+
+def test_bench_report(tmp_path):
+    output = tmp_path / "bench.json"
+    bench.main(
+        [
+            "--files",
+            "40",
+            "--batch-sizes",
+            "0,10",
+            "--jobs",
+            "2",
+            "--failure-rate",
+            "0.1",
+            "--output",
+            str(output),
+        ]
+    )
+    report = json.loads(output.read_text())
+
+    assert [r["batch_size"] for r in report["results"]] == [0, 10]
+    for result in report["results"]:
+        assert result["files_per_second"] > 0
+        assert result["spawns"] >= result["batches"]
+        assert result["peak_rss_kib"] > 0
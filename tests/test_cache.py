@@ -0,0 +1,56 @@
+import concurrent.futures
+import os
+
+from giftmaster import cache, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    db = cache.SignatureCache(tmp_path / "cache.sqlite3")
+    path = tmp_path / "a.dll"
+    path.write_bytes(b"signed")
+    db.record([str(path)])
+
+    assert db.is_signed(str(path))
+
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert db.is_signed(str(path)), "same bytes with a new mtime is still a hit"
+
+    path.write_bytes(b"SIGNED")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    assert not db.is_signed(str(path))
+    assert len(db) == 0
+
+
+def test_cache_shared_between_connections(tmp_path):
+    paths = []
+    for i in range(20):
+        path = tmp_path / f"{i}.dll"
+        path.write_bytes(bytes([i]))
+        paths.append(str(path))
+
+    def record(path):
+        cache.SignatureCache(tmp_path / "cache.sqlite3").record([path])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(record, paths))
+
+    signed, unknown = cache.SignatureCache(tmp_path / "cache.sqlite3").split(paths)
+    assert signed == paths and unknown == []
+
+
+def test_client_skips_cached_files(
+    fake_signtool, signtool_calls, unsigned_files, tmp_path
+):
+    db = cache.SignatureCache(tmp_path / "cache.sqlite3")
+    files = unsigned_files(6, signed={0})
+    skeleton.client(files, [str(fake_signtool)], 0, cache=db)
+    calls = len(signtool_calls())
+
+    assert len(db) == 6
+    skeleton.client(files, [str(fake_signtool)], 0, cache=db)
+    assert len(signtool_calls()) == calls
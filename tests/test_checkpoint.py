@@ -0,0 +1,113 @@
+import pytest
+
+from giftmaster import checkpoint, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_checkpoint_completed_and_torn_line(tmp_path):
+    path = tmp_path / "ckpt.jsonl"
+    with checkpoint.Checkpoint(path) as ckpt:
+        ckpt.record(0, ["/a", "/b"], ["/c"])
+        ckpt.record(1, ["/c"], ["/b"])
+    with open(path, "a") as f:
+        f.write('{"batch": 2, "done": ["/d"')
+
+    with checkpoint.Checkpoint(path, resume=True) as ckpt:
+        assert ckpt.completed() == {"/a", "/c"}
+    with checkpoint.Checkpoint(path) as ckpt:
+        assert ckpt.completed() == set(), "a fresh run starts over"
+
+
+def test_main_resume_retries_only_unfinished_files(
+    fake_signtool, signtool_calls, unsigned_files, tmp_path, monkeypatch
+):
+    files = unsigned_files(6, signed={0, 1})
+    argv = [
+        *files,
+        "--signtool",
+        str(fake_signtool),
+        "--batch-size",
+        "2",
+        "--keep-going",
+        "--no-cache",
+        "--retry-backoff",
+        "0",
+        "--checkpoint",
+        str(tmp_path / "ckpt.jsonl"),
+    ]
+    monkeypatch.setenv("FAKE_SIGNTOOL_FAILURE_RATE", "1")
+    skeleton.main(argv)
+
+    monkeypatch.setenv("FAKE_SIGNTOOL_FAILURE_RATE", "0")
+    first_run = len(signtool_calls())
+    skeleton.main([*argv, "--resume"])
+
+    resumed = " ".join(signtool_calls()[first_run:])
+    assert files[0] not in resumed and files[1] not in resumed
+    assert all(path in resumed for path in files[2:])
+
+    second_run = len(signtool_calls())
+    skeleton.main([*argv, "--resume"])
+    assert len(signtool_calls()) == second_run, "nothing left to do"
+
+
+def test_unfinished_checkpoint_is_kept(tmp_path, caplog):
+    path = tmp_path / "ckpt.jsonl"
+    with checkpoint.Checkpoint(path) as ckpt:
+        ckpt.record(0, ["/a"], ["/b"])
+        ckpt.finish()
+
+    with checkpoint.Checkpoint(path) as ckpt:
+        ckpt.record(0, ["/a", "/b"], [])
+    assert "unfinished" in caplog.text
+    prev = tmp_path / "ckpt.jsonl.prev"
+    with checkpoint.Checkpoint(prev, resume=True) as ckpt:
+        assert ckpt.completed() == {"/a"}
+
+    caplog.clear()
+    with checkpoint.Checkpoint(path) as ckpt:
+        ckpt.record(0, ["/c"], [])
+        ckpt.finish()
+    assert "unfinished" in caplog.text, "no finish() means the run stopped early"
+
+    caplog.clear()
+    checkpoint.Checkpoint(path).close()
+    assert "unfinished" not in caplog.text
+
+
+def test_main_checkpoints_to_the_cache_dir(fake_signtool, unsigned_files, tmp_path):
+    files = unsigned_files(3)
+    skeleton.main([*files[:2], "--signtool", str(fake_signtool)])
+    skeleton.main([files[2], "--signtool", str(fake_signtool)])
+
+    assert not (tmp_path / "giftmaster-checkpoint.jsonl").exists()
+    paths = sorted((tmp_path / "cache" / "giftmaster").glob("checkpoint-*.jsonl"))
+    assert len(paths) == 2, "each job gets its own checkpoint"
+    key = checkpoint.job_key(files[:2], None, None, None)
+    assert checkpoint.default_path(key) in paths
+    assert not any(checkpoint.unfinished(path) for path in paths)
+    done = set()
+    for path in paths:
+        with checkpoint.Checkpoint(path, resume=True) as ckpt:
+            done |= ckpt.completed()
+    assert len(done) == 3
+
+
+def test_checkpoint_in_use(fake_signtool, unsigned_files, tmp_path, caplog):
+    path = tmp_path / "ckpt.jsonl"
+    files = unsigned_files(1)
+    with checkpoint.Checkpoint(path) as ckpt:
+        ckpt.record(0, ["/a"], [])
+        with pytest.raises(checkpoint.CheckpointInUse):
+            checkpoint.Checkpoint(path)
+
+        argv = [*files, "--signtool", str(fake_signtool), "--checkpoint", str(path)]
+        assert skeleton.main(argv) == 1
+        assert "in use" in caplog.text
+        assert not (tmp_path / "ckpt.jsonl.prev").exists(), "left alone"
+
+    with checkpoint.Checkpoint(path, resume=True) as ckpt:
+        assert ckpt.completed() == {"/a"}
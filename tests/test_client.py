@@ -0,0 +1,79 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from giftmaster import fakesigntool, signtool, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_client_signs_batches_in_parallel(fake_signtool, unsigned_files):
+    files = unsigned_files(9, signed={4})
+    results = skeleton.client(files, [str(fake_signtool)], 3, jobs=3)
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert all(result.ok for result in results)
+    assert results[1].already_signed == [files[4]]
+    assert sum(len(result.signed) for result in results) == 8
+
+
+def test_client_caps_concurrent_sign_calls_per_token(
+    fake_signtool, unsigned_files, monkeypatch
+):
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    real_run = signtool.SignTool.run_process
+
+    def run(self, cmd):
+        nonlocal active, peak
+        if cmd and cmd[1] == "sign":
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+        return real_run(self, cmd)
+
+    monkeypatch.setattr(signtool.SignTool, "run_process", run)
+    files = unsigned_files(8)
+    skeleton.client(files, [str(fake_signtool)], 1, jobs=4, token_jobs=2)
+
+    assert peak == 2
+
+
+@pytest.mark.parametrize("keep_going", [False, True])
+def test_client_fail_fast_or_keep_going(
+    fake_signtool, unsigned_files, monkeypatch, keep_going
+):
+    monkeypatch.setattr(
+        signtool.SignTool, "sign_prefix", lambda self, url=None: ["false"]
+    )
+    files = unsigned_files(4)
+    results = skeleton.client(
+        files, [str(fake_signtool)], 1, jobs=1, keep_going=keep_going
+    )
+
+    assert len(results) == (4 if keep_going else 1)
+    assert not any(result.ok for result in results)
+
+
+@pytest.mark.parametrize("corrupt", [False, True])
+def test_exit_status_reports_unsigned_files(fake_signtool, unsigned_files, corrupt):
+    files = unsigned_files(4)
+    if corrupt:
+        with open(files[2], "ab") as f:
+            f.write(fakesigntool.CORRUPT)
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "giftmaster.skeleton", *files, "--keep-going"]
+        + ["--signtool", str(fake_signtool), "--no-cache", "--retries", "0"],
+    )
+
+    assert proc.returncode == (1 if corrupt else 0)
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from giftmaster import coalesce
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    def __call__(self, submissions):
+        self.calls.append(submissions)
+        time.sleep(self.delay)
+        return [sum(items) for items in submissions]
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+def test_window_merges_submissions(recorder):
+    coalescer = coalesce.Coalescer(recorder, window=0.5)
+    coalescer.start()
+    futures = []
+    for n in range(3):
+        futures.append(coalescer.submit([n, n]))
+        time.sleep(0.01)
+
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4]
+    coalescer.close()
+    assert recorder.calls == [[[0, 0], [1, 1], [2, 2]]]
+
+
+def test_size_threshold_closes_batch_early(recorder):
+    coalescer = coalesce.Coalescer(recorder, window=5, max_items=4)
+    coalescer.start()
+    start = time.monotonic()
+    futures = [coalescer.submit([1, 1]) for _ in range(2)]
+
+    assert [future.result(timeout=5) for future in futures] == [2, 2]
+    assert time.monotonic() - start < 5
+    coalescer.close()
+
+
+def test_busy_workers_grow_the_next_batch():
+    recorder = Recorder(delay=0.3)
+    coalescer = coalesce.Coalescer(recorder, jobs=1)
+    coalescer.start()
+    first = coalescer.submit([1])
+    time.sleep(0.1)
+    rest = [coalescer.submit([n]) for n in range(2, 6)]
+
+    assert first.result(timeout=5) == 1
+    assert [future.result(timeout=5) for future in rest] == [2, 3, 4, 5]
+    coalescer.close()
+    assert recorder.calls == [[[1]], [[2], [3], [4], [5]]]
+
+
+def test_handler_error_reaches_every_submitter():
+    def fail(submissions):
+        raise RuntimeError("token unplugged")
+
+    coalescer = coalesce.Coalescer(fail, window=0.2)
+    coalescer.start()
+    futures = [coalescer.submit([n]) for n in range(2)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="unplugged"):
+            future.result(timeout=5)
+    coalescer.close()
+
+
+def test_close_finishes_queued_submissions(recorder):
+    coalescer = coalesce.Coalescer(recorder, jobs=2)
+    futures = [coalescer.submit([n]) for n in range(3)]
+    coalescer.start()
+    coalescer.close()
+
+    assert all(future.done() for future in futures)
@@ -0,0 +1,119 @@
+import json
+
+from giftmaster import bench, fakesigntool, incremental, inputs, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_scan_matches_walk(tmp_path):
+    bench.make_tree(tmp_path, 50, per_dir=7)
+    (tmp_path / "d0000" / "deeper").mkdir()
+    (tmp_path / "d0000" / "deeper" / "x.exe").write_bytes(b"MZ")
+    (tmp_path / "notes.txt").write_text("")
+
+    for include in (None, ["*.dll"], ["d0000/deeper/*"]):
+        scanned = dict(incremental.scan([str(tmp_path)], include=include, jobs=4))
+        assert sorted(scanned) == sorted(inputs.walk(str(tmp_path), include=include))
+
+    path = str(tmp_path / "notes.txt")
+    assert scanned.get(path) is None
+    assert dict(incremental.scan([str(tmp_path)]))[path] == incremental.stat_entry(path)
+
+
+def signed_calls(calls):
+    return [call for call in calls if call.startswith("sign")]
+
+
+def test_main_incremental(fake_signtool, signtool_calls, unsigned_files, tmp_path):
+    files = unsigned_files(4)
+    manifest = tmp_path / "manifest.json"
+    argv = [
+        "--walk",
+        str(tmp_path / "files"),
+        "--signtool",
+        str(fake_signtool),
+        "--no-cache",
+        "--incremental",
+        "--manifest",
+        str(manifest),
+    ]
+
+    skeleton.main(argv)
+    assert len(signed_calls(signtool_calls())) == 1
+    entries = json.loads(manifest.read_text())["files"]
+    assert sorted(entries) == sorted(files)
+
+    first_run = len(signtool_calls())
+    skeleton.main(argv)
+    assert len(signtool_calls()) == first_run, "nothing changed, nothing to do"
+
+    # a rebuild of one file, a new file and one that's gone
+    with open(files[1], "wb") as f:
+        f.write(b"MZ" + bytes(62))
+    (tmp_path / "files" / "new.dll").write_bytes(b"MZ" + bytes(62))
+    (tmp_path / "files" / "file00003.dll").unlink()
+
+    skeleton.main(argv)
+    rerun = " ".join(signtool_calls()[first_run:])
+    assert files[1] in rerun and "new.dll" in rerun
+    assert files[0] not in rerun and files[2] not in rerun
+
+    entries = json.loads(manifest.read_text())["files"]
+    assert files[3] not in entries and str(tmp_path / "files" / "new.dll") in entries
+
+
+def test_main_incremental_retries_failures(
+    fake_signtool, signtool_calls, unsigned_files, tmp_path
+):
+    files = unsigned_files(3)
+    with open(files[2], "ab") as f:
+        f.write(fakesigntool.CORRUPT)
+    argv = [
+        *files,
+        "--signtool",
+        str(fake_signtool),
+        "--no-cache",
+        "--retries",
+        "0",
+        "--incremental",
+        "--manifest",
+        str(tmp_path / "manifest.json"),
+    ]
+
+    skeleton.main(argv)
+    first_run = len(signtool_calls())
+    skeleton.main(argv)
+
+    rerun = " ".join(signtool_calls()[first_run:])
+    assert files[2] in rerun, "a file that failed isn't recorded"
+    assert files[0] not in rerun and files[1] not in rerun
+
+
+def test_main_incremental_records_dropped_files(
+    fake_signtool, unsigned_files, tmp_path, caplog
+):
+    unsigned_files(2)
+    notes = tmp_path / "files" / "notes.txt"
+    notes.write_text("not signable")
+    manifest = tmp_path / "manifest.json"
+    argv = [
+        "--walk",
+        str(tmp_path / "files"),
+        "--signtool",
+        str(fake_signtool),
+        "--no-cache",
+        "--drop-unsupported",
+        "--incremental",
+        "--manifest",
+        str(manifest),
+    ]
+
+    skeleton.main(argv)
+    assert str(notes) in json.loads(manifest.read_text())["files"]
+
+    caplog.clear()
+    skeleton.main(argv)
+    assert "notes.txt" not in caplog.text, "not looked at again"
+    assert not list(tmp_path.glob("manifest.json.*"))
@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+from giftmaster import batching, inputs, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+@pytest.mark.parametrize("null", [False, True])
+def test_read_file_list_across_chunks(tmp_path, monkeypatch, null):
+    monkeypatch.setattr(inputs, "READ_CHUNK_SIZE", 7)
+    names = [f"/build/out/file {i}.dll" for i in range(50)]
+    sep = "\0" if null else "\r\n"
+    listing = tmp_path / "files.txt"
+    listing.write_text(sep.join(names) + sep)
+
+    assert list(inputs.read_file_list(str(listing), null=null)) == names
+
+
+def test_read_file_list_stdin(monkeypatch):
+    stdin = io.TextIOWrapper(io.BytesIO(b"a.dll\nb.dll"))
+    monkeypatch.setattr("sys.stdin", stdin)
+    assert list(inputs.read_file_list("-")) == ["a.dll", "b.dll"]
+
+
+def test_walk_include(tmp_path):
+    for rel in ["a.dll", "b.txt", "sub/c.exe", "sub/d.dll"]:
+        (tmp_path / rel).parent.mkdir(exist_ok=True)
+        (tmp_path / rel).touch()
+
+    found = inputs.walk(str(tmp_path), include=["*.dll", "sub/*.exe"])
+    assert [p[len(str(tmp_path)) + 1 :] for p in found] == [
+        "a.dll",
+        "sub/c.exe",
+        "sub/d.dll",
+    ]
+
+
+def test_batched_is_lazy():
+    consumed = []
+
+    def source():
+        for i in range(10):
+            consumed.append(i)
+            yield str(i)
+
+    batches = inputs.batched(source(), 3)
+    assert next(batches) == ["0", "1", "2"]
+    assert consumed == [0, 1, 2]
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert list(inputs.batched(iter([]), 0)) == []
+
+
+def test_batched_zero_fills_command_lines_lazily():
+    consumed = []
+
+    def source():
+        for i in range(100_000):
+            consumed.append(i)
+            yield f"C:\\build\\out\\file{i:06d}.dll"
+
+    batches = inputs.batched(source(), 0)
+    first = next(batches)
+    assert len(consumed) == len(first) + 1, "one path read ahead, no more"
+    limit = batching.CMDLINE_LIMIT - inputs.PREFIX_ROOM
+    assert batching.cmdline_length(first) < limit
+    assert sum(len(batch) for batch in batches) + len(first) == 100_000
+
+
+def test_main_files_from(fake_signtool, signtool_calls, unsigned_files, tmp_path):
+    files = unsigned_files(5)
+    listing = tmp_path / "files.txt"
+    listing.write_text("\n".join(files))
+    skeleton.main(
+        [
+            "--files-from",
+            str(listing),
+            "--signtool",
+            str(fake_signtool),
+            "--batch-size",
+            "2",
+            "--no-cache",
+        ]
+    )
+
+    signs = [call for call in signtool_calls() if call.startswith("sign")]
+    assert len(signs) == 3
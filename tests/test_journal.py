@@ -0,0 +1,62 @@
+import pytest
+
+from giftmaster import journal, signtool, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+@pytest.mark.parametrize(
+    "level, captured", [("summary", []), ("failures", [1]), ("all", [0, 1])]
+)
+def test_journal_levels(tmp_path, level, captured):
+    with journal.RunJournal(tmp_path / "j.jsonl", level=level) as j:
+        j.record(["signtool", "verify"], 0, "out", "", 0.0, 0.5)
+        j.record(["signtool", "sign"], 1, "out", "boom", 0.0, 0.5)
+
+    entries = list(journal.read(tmp_path / "j.jsonl"))
+    assert [e["returncode"] for e in entries] == [0, 1]
+    assert len({e["id"] for e in entries}) == 2
+    assert [i for i, e in enumerate(entries) if "stdout" in e] == captured
+
+
+def test_journal_masks_credentials_and_rotates(tmp_path):
+    path = tmp_path / "j.jsonl.gz"
+    with journal.RunJournal(path, level="all", max_bytes=300, compress=True) as j:
+        for _ in range(5):
+            j.record(["signtool", "sign", "/kc", "hunter2"], 0, "x" * 100, "", 0, 0)
+        j.record(["signtool", "sign", "/kc", "[{{hunt er2}}]=x"], 0, "", "", 0, 0)
+
+    rotated = sorted(tmp_path.glob("j.jsonl.gz*"))
+    assert len(rotated) > 1
+    entries = [e for p in rotated for e in journal.read(p)]
+    assert all("hunter2" not in e["cmd"] for e in entries)
+    assert all("er2" not in e["cmd"] for e in entries), "shlex quoting spaces"
+    assert entries[-1]["cmd"] == "signtool sign /kc '[MASKED]'"
+
+
+def test_run_writes_journal_instead_of_log_files(
+    fake_signtool, unsigned_files, tmp_path, monkeypatch
+):
+    j = journal.RunJournal(tmp_path / "run.jsonl")
+    monkeypatch.setattr(signtool.SignTool, "journal", j)
+    files = unsigned_files(2)
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    tool.run(tool.verify_cmd(*files))
+    j.close()
+
+    assert not list(tmp_path.glob("signtool-*"))
+    (entry,) = journal.read(tmp_path / "run.jsonl")
+    assert entry["returncode"] == 1
+    assert "No signature found" in entry["stderr"]
+
+
+def test_main_journals_to_the_cache_dir(
+    fake_signtool, unsigned_files, tmp_path, cache_dir
+):
+    skeleton.main([*unsigned_files(2), "--signtool", str(fake_signtool)])
+
+    assert not list(tmp_path.glob("giftmaster-*"))
+    (path,) = (cache_dir / "giftmaster" / "journal").glob("giftmaster-*.jsonl")
+    assert list(journal.read(path))
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from giftmaster import metrics, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    yield
+    metrics.registry.enabled = False
+    metrics.registry.reset()
+
+
+def test_disabled_metrics_are_noops():
+    registry = metrics.Metrics()
+    assert registry.phase("a") is registry.phase("b")
+    with registry.phase("a"):
+        registry.count("n")
+    assert not registry.phases and not registry.counters
+
+
+def test_enabled_metrics_record():
+    registry = metrics.Metrics()
+    registry.enabled = True
+    for _ in range(3):
+        with registry.phase("verify"):
+            registry.count("files", 2)
+    registry.gauge("latency", 0.5, url="http://tsa")
+
+    assert registry.phases["verify"].count == 3
+    text = registry.prometheus()
+    assert 'giftmaster_phase_count_total{phase="verify"} 3' in text
+    assert "giftmaster_files_total 6" in text
+    assert 'giftmaster_latency{url="http://tsa"} 0.5' in text
+    names = [
+        m["name"]
+        for m in registry.otel()["resourceMetrics"][0]["scopeMetrics"][0]["metrics"]
+    ]
+    assert "giftmaster.phase.duration" in names
+
+
+def test_main_exports_metrics(fake_signtool, unsigned_files, tmp_path):
+    files = unsigned_files(4, signed={1})
+    skeleton.main(
+        [
+            *files,
+            "--signtool",
+            str(fake_signtool),
+            "--metrics-prom",
+            str(tmp_path / "giftmaster.prom"),
+            "--metrics-json",
+            str(tmp_path / "giftmaster.json"),
+        ]
+    )
+
+    prom = (tmp_path / "giftmaster.prom").read_text()
+    for phase in ["resolve_tool", "verify", "sign", "batch", "run"]:
+        assert f'phase="{phase}"' in prom
+    assert "giftmaster_files_signed_total 3" in prom
+    assert json.loads((tmp_path / "giftmaster.json").read_text())["resourceMetrics"]
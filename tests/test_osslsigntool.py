@@ -0,0 +1,63 @@
+import os
+
+import fakeosslsigncode
+import pytest
+
+from giftmaster import logger, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+@pytest.fixture
+def osslsigncode(fake_signtool):
+    """Executable fake osslsigncode next to the fake signtool"""
+    return fakeosslsigncode.install(fake_signtool.parent)
+
+
+def is_signed(path):
+    return fakeosslsigncode.MARKER in open(path, "rb").read()
+
+
+@pytest.mark.parametrize("engine", ["subprocess", "asyncio"])
+def test_main_signs_with_osslsigncode(
+    osslsigncode, signtool_calls, unsigned_files, engine
+):
+    paths = unsigned_files(4, signed={1})
+    os.chmod(paths[0], 0o751)
+
+    skeleton.main(
+        paths
+        + ["--backend", "osslsigncode", "--engine", engine]
+        + ["--signtool", str(osslsigncode), "--no-cache"]
+    )
+
+    assert all(is_signed(path) for path in paths)
+    assert os.stat(paths[0]).st_mode & 0o777 == 0o751
+    assert sorted(os.listdir(os.path.dirname(paths[0]))) == sorted(
+        os.path.basename(path) for path in paths
+    )
+
+    calls = signtool_calls()
+    assert [call.split()[0] for call in calls] == ["verify"] * 4 + ["sign"] * 3
+    assert all("-pass" in call for call in calls if call.startswith("sign"))
+
+
+def test_main_isolates_failing_file(osslsigncode, unsigned_files):
+    paths = unsigned_files(3)
+    with open(paths[1], "ab") as f:
+        f.write(fakeosslsigncode.CORRUPT)
+
+    skeleton.main(
+        paths + ["--backend", "osslsigncode", "--signtool", str(osslsigncode)]
+    )
+
+    assert [is_signed(path) for path in paths] == [True, False, True]
+
+
+def test_password_is_masked_in_logs():
+    cmd = "osslsigncode sign -pass hunter2 -in a.dll"
+    assert logger.SensitiveFormatter._filter(cmd) == (
+        "osslsigncode sign -pass [MASKED] -in a.dll"
+    )
@@ -0,0 +1,152 @@
+import pytest
+
+from giftmaster import bench, parse
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+VERIFY = bench.VERIFY_ENTRY.format(path="/a.dll", digest="AB" * 32, digest40="C" * 40)
+
+
+def test_verify_entry_fields():
+    out = VERIFY + "Successfully verified: /a.dll\n\nVerifying: /b.dll\n\n"
+    parser = parse.parse(out.encode(), b"SignTool Error: No signature found.\n")
+
+    a, b = parser.files["/a.dll"], parser.files["/b.dll"]
+    assert a.signed and a.signer == "Streambox Inc."
+    assert a.timestamp == "Mon Jun 02 10:21:13 2025"
+    assert b.signed is False and b.signer is None
+    assert parser.error_classes == {"unsigned"}
+    assert parser.verify_status(["/a.dll", "/b.dll"]) == {
+        "/a.dll": True,
+        "/b.dll": False,
+    }
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1 << 16])
+def test_feed_in_chunks_matches_one_go(chunk):
+    stdout, stderr, files = bench.synthetic_output("verify", 0.05, signed_ratio=0.5)
+    whole = parse.parse(stdout, stderr)
+
+    parser = parse.OutputParser()
+    for i in range(0, len(stdout), chunk):
+        parser.feed(stdout[i : i + chunk])
+    parser.close()
+
+    assert len(parser.files) == len(whole.files) == files
+    assert parser.counts == whole.counts
+    assert sorted(p for p, r in parser.files.items() if r.signed) == sorted(
+        p for p, r in whole.files.items() if r.signed
+    )
+    assert all(not path.endswith("\r") for path in parser.files)
+
+
+def test_sign_output_and_errors():
+    stdout = (
+        b"The following certificate was selected:\r\n"
+        b"    Issued to: Streambox Inc.\r\n"
+        b"Successfully signed: /a.dll\r\n"
+    )
+    stderr = (
+        b"SignTool Error: An unexpected internal error has occurred.\r\n"
+        b"SignTool Error: /b.dll\r\n"
+    )
+    parser = parse.parse(stdout, stderr)
+
+    assert parser.signed_paths(["/a.dll", "/b.dll"]) == {"/a.dll"}
+    assert parser.files["/a.dll"].signer == "Streambox Inc."
+    assert parser.file_errors(["/a.dll", "/b.dll"]) == {"/b.dll": "internal"}
+    assert parser.error_classes == {"internal", "error"}
+
+
+@pytest.mark.parametrize(
+    "stderr, error_class",
+    [
+        (b"SignTool Error: No private key is available.", "private_key"),
+        (
+            b"SignTool Error: The specified timestamp server either could not "
+            b"be reached or returned an invalid response.",
+            "timestamp",
+        ),
+        # osslsigncode has no "SignTool Error:" prefix
+        (b"Initialization error or timestamping failed", "timestamp"),
+    ],
+)
+def test_error_classes(stderr, error_class):
+    parser = parse.OutputParser()
+    parser.feed(stderr + b"\n", stderr=True)
+    assert error_class in parser.error_classes
+
+
+def test_multi_megabyte_output():
+    result = bench.run_parse_scenario(
+        {"command": "verify", "megabytes": 4, "chunk_size": 1 << 16}
+    )
+    assert result["bytes"] >= 4 << 20
+    assert result["parsed"] == result["files"]
+    assert result["megabytes_per_second"] > 0
+
+
+def test_file_errors_are_per_file():
+    stderr = (
+        b"SignTool Error: File not found: /a.dll\r\n"
+        b"SignTool Error: An unexpected internal error has occurred.\r\n"
+        b"SignTool Error: /b.dll\r\n"
+        b"SignTool Error: The specified timestamp server either could not be "
+        b"reached or returned an invalid response.\r\n"
+    )
+    parser = parse.parse(stderr=stderr)
+
+    assert parser.file_errors(["/a.dll", "/b.dll", "/c.dll"]) == {
+        "/a.dll": "not_found",
+        "/b.dll": "internal",
+    }
+
+
+def verify_output(verified, unverified):
+    lines = []
+    for path in verified:
+        lines += [f"Verifying: {path}", f"Successfully verified: {path}", ""]
+    for path in unverified:
+        lines += [f"Verifying: {path}", ""]
+    lines.append(f"Number of files successfully Verified: {len(verified)}")
+    return "\n".join(lines)
+
+
+def test_verify_status_maps_each_file():
+    out = verify_output(["/a.dll"], ["/b.dll", "/c.dll"])
+    status = parse.parse(out.encode()).verify_status(["/a.dll", "/b.dll", "/c.dll"])
+    assert status == {"/a.dll": True, "/b.dll": False, "/c.dll": False}
+
+
+@pytest.mark.parametrize(
+    "out",
+    [
+        "",
+        verify_output(["/a.dll"], []),
+        verify_output(["/a.dll"], ["/b.dll", "/x.dll"]),
+        verify_output(["/a.dll"], ["/b.dll"]).replace("Verified: 1", "Verified: 2"),
+    ],
+)
+def test_verify_status_ambiguous(out):
+    assert parse.parse(out.encode()).verify_status(["/a.dll", "/b.dll"]) is None
+
+
+def test_stderr_errors_are_linked_to_failed_files():
+    out = verify_output(["/a.dll"], ["/b.dll", "/c.dll"])
+    stderr = (
+        b"SignTool Error: No signature found.\r\n"
+        b"SignTool Error: A certificate chain processed, but terminated in a "
+        b"root certificate which is not trusted by the trust provider.\r\n"
+    )
+    parser = parse.parse(out.encode(), stderr)
+    assert [parser.files[p].error for p in ("/a.dll", "/b.dll", "/c.dll")] == [
+        None,
+        "unsigned",
+        "untrusted",
+    ]
+
+    # one error line for two failed files: can't tell which it's about
+    parser = parse.parse(out.encode(), stderr.splitlines(True)[0])
+    assert parser.files["/b.dll"].error is None
@@ -0,0 +1,62 @@
+import struct
+
+import pytest
+
+from giftmaster import pe, signtool
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def pe_image(certificate=None, plus=False) -> bytes:
+    e_lfanew = 0x80
+    data = bytearray(0x400)
+    data[:2] = b"MZ"
+    struct.pack_into("<I", data, 0x3C, e_lfanew)
+    data[e_lfanew : e_lfanew + 4] = b"PE\0\0"
+    optional = e_lfanew + 24
+    struct.pack_into("<H", data, optional, pe.PE32_PLUS_MAGIC if plus else 0x10B)
+    count_offset = optional + (108 if plus else 92)
+    struct.pack_into("<I", data, count_offset, 16)
+    if certificate:
+        struct.pack_into("<II", data, count_offset + 4 + 8 * 4, *certificate)
+    return bytes(data)
+
+
+@pytest.mark.parametrize("plus", [False, True])
+def test_has_certificate_table(tmp_path, plus):
+    unsigned = tmp_path / "unsigned.dll"
+    unsigned.write_bytes(pe_image(plus=plus))
+    signed = tmp_path / "signed.dll"
+    signed.write_bytes(pe_image(certificate=(0x400, 0x100), plus=plus))
+
+    assert pe.has_certificate_table(unsigned) is False
+    assert pe.has_certificate_table(signed) is True
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"MZ", b"not a pe file" * 10, b"MZ" + bytes(0x3E) + b"\xff" * 4]
+)
+def test_has_certificate_table_not_pe(tmp_path, data):
+    path = tmp_path / "x.bin"
+    path.write_bytes(data)
+    assert pe.has_certificate_table(path) is None
+    assert pe.has_certificate_table(tmp_path / "missing.bin") is None
+
+
+def test_remove_already_signed_skips_pe_without_certificate(
+    fake_signtool, signtool_calls, tmp_path
+):
+    files = []
+    for i, data in enumerate([pe_image(), pe_image(), pe_image((0x400, 8))]):
+        path = tmp_path / f"{i}.dll"
+        path.write_bytes(data)
+        files.append(str(path))
+
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    tool.remove_already_signed()
+
+    assert tool.files_to_sign == files
+    (call,) = signtool_calls()
+    assert files[2] in call and files[0] not in call
@@ -0,0 +1,35 @@
+import json
+
+from giftmaster import bench, plan, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_dry_run_prints_plan_without_running_signtool(
+    fake_signtool, signtool_calls, tmp_path, capsys
+):
+    root = tmp_path / "files"
+    root.mkdir()
+    for i in range(5):
+        (root / f"{i}.dll").write_bytes(bench.synthetic_pe())
+    (root / "setup.msi").write_bytes(bytes.fromhex("d0cf11e0a1b11ae1") + bytes(64))
+
+    skeleton.main(
+        ["--dry-run", "-b", "4", "--walk", str(root), "--signtool", str(fake_signtool)]
+    )
+
+    out = capsys.readouterr().out
+    assert "batch 1: 4 file(s)" in out and "batch 2: 2 file(s)" in out
+    assert "5 without a certificate table, 1 of unknown type" in out
+    assert "process spawns: 3 (1 verify, 2 sign)" in out
+    assert "estimated duration" in out
+    assert signtool_calls() == []
+
+
+def test_run_records_timings(fake_signtool, unsigned_files, tmp_path):
+    skeleton.main(unsigned_files(3) + ["--signtool", str(fake_signtool)])
+
+    sums = json.loads((tmp_path / "cache" / "giftmaster" / "timings.json").read_text())
+    assert set(sums) == {"verify", "sign"}
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from giftmaster import bench, preflight, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+CATALOG = bytes.fromhex("308203a506092a864886f70d010702a08203963082039202010131") + (
+    preflight.CTL_OID + bytes(40)
+)
+
+
+@pytest.mark.parametrize(
+    "name, data, kind",
+    [
+        ("a.dll", bench.synthetic_pe(), "pe"),
+        ("a.msi", preflight.OLE_MAGIC + bytes(100), "msi"),
+        ("a.cab", b"MSCF" + bytes(100), "cab"),
+        ("a.cat", CATALOG, "cat"),
+        ("a.ps1", b"Write-Host hi", "script"),
+        ("a.dll", b"MZ" + bytes(100), None),
+        ("a.txt", b"hello", None),
+        ("empty.dll", b"", None),
+    ],
+)
+def test_classify(tmp_path, name, data, kind):
+    path = tmp_path / name
+    path.write_bytes(data)
+    assert preflight.classify(str(path)) == kind
+
+
+def test_preflight_dedupes_and_drops(tmp_path):
+    real = tmp_path / "real.dll"
+    real.write_bytes(bench.synthetic_pe())
+    os.symlink(real, tmp_path / "link.dll")
+    os.link(real, tmp_path / "hard.dll")
+    (tmp_path / "notes.txt").write_text("not signable")
+
+    check = preflight.Preflight(drop_unsupported=True)
+    kept = list(
+        check(
+            [
+                str(real),
+                str(tmp_path / "sub" / ".." / "real.dll"),
+                str(tmp_path / "link.dll"),
+                str(tmp_path / "hard.dll"),
+                str(tmp_path / "notes.txt"),
+                str(tmp_path / "missing.dll"),
+            ]
+        )
+    )
+
+    assert kept == [str(real)]
+    assert check.counts == {"pe": 1, "duplicate": 3, "unsupported": 1, "missing": 1}
+
+
+def test_main_signs_duplicates_once(fake_signtool, signtool_calls, tmp_path):
+    path = tmp_path / "a.dll"
+    path.write_bytes(bench.synthetic_pe())
+    os.symlink(path, tmp_path / "b.dll")
+    skeleton.main(
+        [str(path), str(tmp_path / "b.dll"), "--signtool", str(fake_signtool)]
+    )
+
+    (sign,) = [call for call in signtool_calls() if call.startswith("sign")]
+    assert sign.endswith(str(path)) and "b.dll" not in sign
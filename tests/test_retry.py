@@ -0,0 +1,132 @@
+from giftmaster import aiosigntool, fakesigntool, retry, signtool, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+class FlakySigner:
+    """Fails each file for error_class the first `failures` times it's signed"""
+
+    def __init__(self, failures, error_class="timestamp"):
+        self.failures = dict(failures)
+        self.error_class = error_class
+        self.calls = []
+
+    def __call__(self, files):
+        self.calls.append(list(files))
+        failed = [path for path in files if self.failures.get(path, 0) > 0]
+        for path in failed:
+            self.failures[path] -= 1
+        return [path for path in files if path not in failed], failed
+
+    def classify(self, path):
+        return self.error_class
+
+
+def test_retries_only_the_failed_files():
+    signer = FlakySigner({"b": 1, "c": 2})
+    policy = retry.RetryPolicy(retries=2, backoff=0)
+
+    signed, failed = policy.run(signer, ["a", "b", "c"], signer.classify)
+
+    assert signed == ["a", "b", "c"] and failed == []
+    assert signer.calls == [["a", "b", "c"], ["b", "c"], ["c"]]
+
+
+def test_gives_up_after_retries():
+    signer = FlakySigner({"a": 5})
+    signed, failed = retry.RetryPolicy(retries=2, backoff=0).run(
+        signer, ["a"], signer.classify
+    )
+    assert (signed, failed) == ([], ["a"])
+    assert len(signer.calls) == 3
+
+
+def test_permanent_failures_are_not_retried():
+    signer = FlakySigner({"a": 1}, error_class="unsigned")
+    signed, failed = retry.RetryPolicy(backoff=0).run(signer, ["a"], signer.classify)
+    assert (signed, failed) == ([], ["a"])
+    assert len(signer.calls) == 1
+
+
+def test_budget_is_shared():
+    budget = retry.RetryBudget(3)
+    policy = retry.RetryPolicy(retries=2, backoff=0, budget=budget)
+    calls = 0
+    for name in "abc":
+        signer = FlakySigner({name: 5})
+        policy.run(signer, [name], signer.classify)
+        calls += len(signer.calls)
+    assert budget.used == 3
+    assert calls == 3 + 3, "one retry budget for all batches"
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = retry.RetryPolicy(backoff=1.0, max_backoff=5.0)
+    delays = [policy.delay(attempt) for attempt in range(6) for _ in range(50)]
+    assert all(0 <= delay <= 5.0 for delay in delays)
+    assert 0 <= policy.delay(0) <= 1.0
+    assert len(set(delays)) > 1
+
+
+def test_sign_isolating_records_failure_classes(fake_signtool, unsigned_files):
+    files = unsigned_files(3)
+    with open(files[1], "ab") as f:
+        f.write(fakesigntool.CORRUPT)
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+
+    signed, failed = tool.sign_isolating(tool.files_to_sign)
+
+    assert len(signed) == 2 and len(failed) == 1
+    assert tool.failure_classes == {failed[0]: "internal"}
+
+
+def test_private_key_failure_is_not_retried(
+    fake_signtool, unsigned_files, signtool_calls, monkeypatch
+):
+    monkeypatch.setenv("FAKE_SIGNTOOL_NO_KEY", "1")
+    monkeypatch.setattr(signtool.SignTool, "retry_policy", retry.RetryPolicy(backoff=0))
+
+    # the asyncio engine kills signtool as soon as it reports the missing key
+    result = skeleton.sign_batch(
+        0,
+        unsigned_files(1),
+        [str(fake_signtool)],
+        tool_class=aiosigntool.AsyncSignTool,
+    )
+
+    assert isinstance(result.error, signtool.SigntoolPrivatekeyException)
+    assert len([c for c in signtool_calls() if c.startswith("sign")]) == 1
+
+
+def test_bad_file_is_not_retried(fake_signtool, unsigned_files, signtool_calls):
+    files = unsigned_files(3)
+    with open(files[1], "ab") as f:
+        f.write(fakesigntool.CORRUPT)
+    policy = retry.RetryPolicy(backoff=0, budget=retry.RetryBudget(5))
+
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    signed, failed = policy.run(
+        tool.sign_isolating, tool.files_to_sign, tool.failure_classes.get
+    )
+
+    assert len(signed) == 2 and len(failed) == 1
+    assert policy.budget.used == 0, "an internal error doesn't look transient"
+
+
+def test_busy_batch_is_not_bisected(
+    fake_signtool, unsigned_files, signtool_calls, monkeypatch
+):
+    monkeypatch.setenv("FAKE_SIGNTOOL_BUSY", "1")
+    files = unsigned_files(16)
+    policy = retry.RetryPolicy(retries=2, backoff=0)
+
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    signed, failed = policy.run(
+        tool.sign_isolating, tool.files_to_sign, tool.failure_classes.get
+    )
+
+    assert (signed, len(failed)) == ([], 16)
+    assert set(tool.failure_classes.values()) == {"busy"}
+    assert len(signtool_calls()) == 3, "one sign per attempt, nothing else"
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+from giftmaster import fakesigntool, server, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+@pytest.fixture
+def address(tmp_path):
+    return str(tmp_path / "giftmaster.sock")
+
+
+def sign_calls(signtool_calls):
+    return [call for call in signtool_calls() if call.startswith("sign")]
+
+
+def test_parse_address():
+    assert server.parse_address("tcp:localhost:1234")[1] == ("localhost", 1234)
+    assert server.parse_address("/run/giftmaster.sock")[1] == "/run/giftmaster.sock"
+    assert server.parse_address("pipe:giftmaster") == (
+        "AF_PIPE",
+        r"\\.\pipe\giftmaster",
+    )
+
+
+def test_tcp_requires_the_key(fake_signtool, tmp_path):
+    key_file = tmp_path / "server.key"
+    key = server.read_key(key_file, create=True)
+    assert key_file.stat().st_mode & 0o777 == 0o600
+    assert server.read_key(key_file) == key, "made once, then reused"
+
+    sign_queue = server.SignQueue([str(fake_signtool)])
+    worker = server.SignServer("tcp:127.0.0.1:0", sign_queue, key=key)
+    address = worker.address
+    thread = threading.Thread(target=worker.serve_forever)
+    thread.start()
+    try:
+        assert server.request(address, {"op": "ping"}, key=key) == {"ok": True}
+        with pytest.raises(server.AuthError):
+            server.request(address, {"op": "ping"}, key=b"guess")
+    finally:
+        worker.shutdown()
+        thread.join(timeout=30)
+        worker.server_close()
+
+    assert not thread.is_alive()
+
+
+def test_queue_merges_waiting_requests(fake_signtool, signtool_calls, unsigned_files):
+    paths = unsigned_files(5)
+    sign_queue = server.SignQueue([str(fake_signtool)], cache=None)
+    futures = [
+        sign_queue.submit(paths[:2]),
+        sign_queue.submit(paths[2:4]),
+        sign_queue.submit(paths[3:]),
+    ]
+    sign_queue.start()
+    replies = [future.result(timeout=30) for future in futures]
+    sign_queue.close()
+
+    assert len(sign_calls(signtool_calls)) == 1
+    assert [reply["signed"] for reply in replies] == [
+        paths[:2],
+        paths[2:4],
+        paths[3:],
+    ]
+
+
+def test_queue_respects_max_files(fake_signtool, signtool_calls, unsigned_files):
+    paths = unsigned_files(4)
+    sign_queue = server.SignQueue([str(fake_signtool)], max_files=2)
+    futures = [sign_queue.submit([path]) for path in paths]
+    sign_queue.start()
+    for future in futures:
+        assert not future.result(timeout=30)["failed"]
+    sign_queue.close()
+
+    assert len(sign_calls(signtool_calls)) == 2
+
+
+def test_serve_and_submit(fake_signtool, unsigned_files, address):
+    paths = unsigned_files(3)
+    thread = threading.Thread(
+        target=skeleton.main,
+        args=(["serve", "--socket", address, "--signtool", str(fake_signtool)],),
+    )
+    thread.start()
+    try:
+        for _ in range(100):
+            if server._listening(address):
+                break
+            threading.Event().wait(0.05)
+
+        assert skeleton.main(["submit", "--socket", address, *paths]) == 0
+        for path in paths:
+            assert open(path, "rb").read().endswith(fakesigntool.MARKER)
+
+        reply = server.request(address, {"op": "sign", "files": ["relative.dll"]})
+        assert "absolute" in reply["error"]
+    finally:
+        skeleton.main(["submit", "--socket", address, "--shutdown"])
+        thread.join(timeout=30)
+
+    assert not thread.is_alive()
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from giftmaster import fakesigntool, server, shard, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+class StandIn:
+    """Signing target that signs instantly, slowly or not at all"""
+
+    def __init__(self, name, delay=0.0, broken=False):
+        self.name = name
+        self.delay = delay
+        self.broken = broken
+        self.batches = []
+
+    def sign(self, index, files):
+        self.batches.append(index)
+        time.sleep(self.delay)
+        result = skeleton.BatchResult(index, list(files))
+        if self.broken:
+            result.error = ConnectionError(f"{self.name} is down")
+        else:
+            result.signed = list(files)
+            result.returncode = 0
+        return result
+
+
+def batches(n, size=2):
+    return [[f"b{i}f{j}" for j in range(size)] for i in range(n)]
+
+
+def test_fast_target_takes_more_batches():
+    fast, slow = StandIn("fast", delay=0.01), StandIn("slow", delay=0.2)
+    results = list(shard.ShardScheduler([fast, slow]).run(batches(12)))
+
+    assert sorted(result.index for result in results) == list(range(12))
+    assert all(result.ok for result in results)
+    assert len(fast.batches) > len(slow.batches) >= 1
+
+
+def test_failed_batches_move_to_healthy_target():
+    broken, healthy = StandIn("broken", broken=True), StandIn("healthy", delay=0.05)
+    scheduler = shard.ShardScheduler([broken, healthy])
+    results = list(scheduler.run(batches(6)))
+
+    assert len(results) == 6
+    assert all(result.ok and result.target == "healthy" for result in results)
+    assert len(broken.batches) == shard.ShardScheduler.MAX_FAILURES
+    assert sorted(healthy.batches) == list(range(6))
+
+
+def test_batch_fails_when_no_target_is_healthy():
+    targets = [StandIn("a", broken=True), StandIn("b", broken=True)]
+    results = list(shard.ShardScheduler(targets, keep_going=True).run(batches(3)))
+
+    assert len(results) == 3
+    assert all(result.error is not None for result in results)
+
+
+def test_retry_runs_while_the_input_is_slow():
+    retried = threading.Event()
+    attempts = []
+
+    class FailsOnce(StandIn):
+        def sign(self, index, files):
+            attempts.append(index)
+            result = super().sign(index, files)
+            if attempts.count(index) == 1:
+                result.error = ConnectionError("try elsewhere")
+            elif index == 0:
+                retried.set()
+            return result
+
+    waited = []
+
+    def slow_input():
+        yield ["b0f0"]
+        # a slow directory scan; the retry mustn't have to wait for it
+        waited.append(retried.wait(timeout=5))
+        yield ["b1f0"]
+
+    targets = [FailsOnce("a"), FailsOnce("b")]
+    results = list(shard.ShardScheduler(targets, keep_going=True).run(slow_input()))
+
+    assert waited == [True]
+    assert sorted(result.index for result in results) == [0, 1]
+
+
+def test_input_errors_reach_the_caller():
+    def broken_input():
+        yield ["b0f0"]
+        raise OSError("file list went away")
+
+    with pytest.raises(OSError):
+        list(shard.ShardScheduler([StandIn("a")]).run(broken_input()))
+
+
+def test_client_raises_without_keep_going(unsigned_files):
+    with pytest.raises(ConnectionError):
+        shard.client(unsigned_files(4), [StandIn("a", broken=True)], batch_size=2)
+
+
+def test_parse_target(fake_signtool):
+    local = shard.parse_target("local:Token A", [str(fake_signtool)])
+    assert local.name == "local:Token A"
+    assert local.tool_class.CSP == "Token A"
+    assert local.signtool_candidates == [str(fake_signtool)]
+
+    other = shard.parse_target("local:Token B@/opt/signtool", [])
+    assert other.signtool_candidates == ["/opt/signtool"]
+
+    remote = shard.parse_target("remote:tcp:127.0.0.1:4000", [])
+    assert remote.address == "tcp:127.0.0.1:4000"
+
+    with pytest.raises(ValueError):
+        shard.parse_target("ssh:somewhere", [])
+
+
+def test_main_spreads_over_local_and_remote_targets(
+    fake_signtool, unsigned_files, tmp_path
+):
+    address = str(tmp_path / "worker.sock")
+    sign_queue = server.SignQueue([str(fake_signtool)])
+    sign_queue.start()
+    worker = server.SignServer(address, sign_queue)
+    thread = threading.Thread(target=worker.serve_forever)
+    thread.start()
+    try:
+        paths = unsigned_files(8)
+        skeleton.main(
+            paths
+            + ["-b", "2", "--signtool", str(fake_signtool)]
+            + ["--target", "local:Token A", "--target", f"remote:{address}"]
+            + ["--target", "local:Token B@/nonexistent/signtool"]
+        )
+    finally:
+        worker.shutdown()
+        worker.server_close()
+        thread.join()
+        sign_queue.close()
+
+    for path in paths:
+        assert open(path, "rb").read().endswith(fakesigntool.MARKER)
@@ -0,0 +1,65 @@
+import os
+
+from giftmaster import fakesigntool, signonce, skeleton
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def sign_calls(signtool_calls):
+    return [call for call in signtool_calls() if call.startswith("sign")]
+
+
+def test_group_by_content(tmp_path):
+    paths = []
+    for name, data in [("a", b"1"), ("b", b"2"), ("c", b"1")]:
+        (tmp_path / name).write_bytes(data)
+        paths.append(str(tmp_path / name))
+
+    groups = signonce.group_by_content(paths + [str(tmp_path / "missing")], jobs=2)
+
+    assert sorted(groups.values()) == [[paths[0], paths[2]], [paths[1]]]
+
+
+def test_replace_atomically_keeps_mode(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.write_bytes(b"signed")
+    dst.write_bytes(b"unsigned")
+    os.chmod(dst, 0o640)
+
+    signonce.replace_atomically(src, dst)
+
+    assert dst.read_bytes() == b"signed"
+    assert os.stat(dst).st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(tmp_path)) == ["dst", "src"]
+
+
+def test_main_signs_identical_files_once(fake_signtool, signtool_calls, unsigned_files):
+    paths = unsigned_files(4)
+
+    skeleton.main(paths + ["--sign-once", "--signtool", str(fake_signtool)])
+
+    (sign,) = sign_calls(signtool_calls)
+    assert paths[0] in sign and paths[1] not in sign
+    for path in paths:
+        assert open(path, "rb").read().endswith(fakesigntool.MARKER)
+
+
+def test_main_reuses_artifact_store(
+    fake_signtool, signtool_calls, unsigned_files, tmp_path
+):
+    store = str(tmp_path / "store")
+    paths = unsigned_files(2)
+    skeleton.main(paths + ["--artifact-store", store, "--signtool", str(fake_signtool)])
+    assert len(sign_calls(signtool_calls)) == 1
+
+    paths = unsigned_files(3)
+    skeleton.main(
+        paths
+        + ["--artifact-store", store, "--no-cache", "--signtool", str(fake_signtool)]
+    )
+
+    assert len(sign_calls(signtool_calls)) == 1
+    for path in paths:
+        assert open(path, "rb").read().endswith(fakesigntool.MARKER)
@@ -0,0 +1,76 @@
+import pytest
+
+from giftmaster import fakesigntool, journal, signtool
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_remove_already_signed_batches_verify(
+    fake_signtool, signtool_calls, unsigned_files
+):
+    files = unsigned_files(10, signed={2, 7})
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    tool.remove_already_signed(batch_size=4)
+
+    assert tool.files_to_sign == [f for i, f in enumerate(files) if i not in {2, 7}]
+    assert len(signtool_calls()) == 3
+
+
+def test_remove_already_signed_bisects_unparseable_output(
+    fake_signtool, signtool_calls, unsigned_files, monkeypatch
+):
+    monkeypatch.setenv("FAKE_SIGNTOOL_TERSE", "1")
+    files = unsigned_files(8, signed={5})
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    tool.remove_already_signed(batch_size=8)
+
+    assert tool.files_to_sign == [f for i, f in enumerate(files) if i != 5]
+    assert len(signtool_calls()) > 1
+
+
+@pytest.mark.parametrize("terse", [False, True])
+def test_sign_isolating_sets_bad_files_aside(
+    fake_signtool, signtool_calls, unsigned_files, monkeypatch, terse
+):
+    if terse:
+        monkeypatch.setenv("FAKE_SIGNTOOL_TERSE", "1")
+    files = unsigned_files(8)
+    bad = [files[3], files[6]]
+    for path in bad:
+        with open(path, "ab") as f:
+            f.write(fakesigntool.CORRUPT)
+
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+    signed, failed = tool.sign_isolating(files)
+
+    assert failed == bad
+    assert signed == [path for path in files if path not in bad]
+    calls = signtool_calls()
+    signs = [call for call in calls if call.startswith("sign")]
+    if not terse:
+        assert len(signs) == 1
+    else:
+        # bisecting, and verifying what each failed sign left signed
+        assert len(signs) <= 2 * len(files)
+        assert len(calls) - len(signs) <= 2 * len(files)
+    for path in signed:
+        with open(path, "rb") as f:
+            assert f.read().count(fakesigntool.MARKER) == 1, "signed exactly once"
+
+
+def test_run_process_keeps_stdout_only_for_the_journal(
+    fake_signtool, unsigned_files, tmp_path, monkeypatch
+):
+    files = unsigned_files(3, signed={0})
+    tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+
+    result = tool.run_process(tool.verify_cmd(*files))
+    assert result.stdout == "" and "No signature found" in result.stderr
+    assert result.parsed.verify_status(files) == dict(zip(files, [1, 0, 0]))
+    assert {result.parsed.files[path].error for path in files[1:]} == {"unsigned"}
+
+    j = journal.RunJournal(tmp_path / "run.jsonl", level="all")
+    monkeypatch.setattr(signtool.SignTool, "journal", j)
+    assert "Successfully verified" in tool.run_process(tool.verify_cmd(*files)).stdout
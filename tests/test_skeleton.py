@@ -86,3 +86,17 @@ def test_main_default_signtool_makes_simple_invocation(small_file_list):
     )
     # captured = capsys.readouterr()
     # assert "The 7-th Fibonacci number is 13" in captured.out
+
+
+@pytest.mark.parametrize("engine", ["subprocess", "asyncio"])
+def test_main_leaves_tool_classes_as_it_found_them(
+    fake_signtool, unsigned_files, engine
+):
+    from giftmaster import aiosigntool, signtool
+
+    classes = [signtool.SignTool, aiosigntool.AsyncSignTool]
+    before = [dict(vars(cls)) for cls in classes]
+    argv = [*unsigned_files(2), "--signtool", str(fake_signtool), "--engine", engine]
+    assert not skeleton.main([*argv, "--journal-level", "all", "--timeout", "60"])
+
+    assert [dict(vars(cls)) for cls in classes] == before
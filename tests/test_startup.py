@@ -0,0 +1,94 @@
+import subprocess
+import sys
+
+import pytest
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+# cumulative import time of giftmaster.skeleton, in microseconds; it takes
+# about a quarter of this on a developer laptop
+STARTUP_BUDGET_US = 100_000
+
+# what a run with nothing to sign has no business importing
+HEAVY = [
+    "giftmaster.signtool",
+    "giftmaster.aiosigntool",
+    "giftmaster.server",
+    "foodsale",
+    "subprocess",
+    "asyncio",
+    "importlib.metadata",
+    "dataclasses",
+]
+
+
+def importtime(code: str):
+    """Cumulative microseconds per module imported while running code"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        [],
+        ["--help"],
+        ["--version"],
+    ],
+)
+def test_startup_avoids_heavy_imports(argv):
+    code = (
+        "from giftmaster import skeleton\n"
+        "try:\n"
+        f"    skeleton.main({argv!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    imported = importtime(code)
+
+    assert "giftmaster.skeleton" in imported
+    heavy = [name for name in HEAVY if name in imported]
+    if argv == ["--version"]:
+        heavy.remove("importlib.metadata")
+    assert not heavy
+
+
+def test_startup_budget():
+    best = min(
+        importtime("import giftmaster.skeleton")["giftmaster.skeleton"]
+        for _ in range(3)
+    )
+    assert best < STARTUP_BUDGET_US
+
+
+def test_signing_imports_only_its_engine(tmp_path):
+    path = tmp_path / "a.dll"
+    path.write_bytes(b"MZ" + bytes(62))
+    code = (
+        "import os\n"
+        "from giftmaster import fakesigntool, skeleton\n"
+        f"os.chdir({str(tmp_path)!r})\n"
+        "os.environ['SAFENET_CLIENT_CREDENTIALS'] = 'c2VjcmV0'\n"
+        f"os.environ['XDG_CACHE_HOME'] = {str(tmp_path / 'cache')!r}\n"
+        f"signtool = fakesigntool.install({str(tmp_path / 'bin')!r})\n"
+        f"skeleton.main([{str(path)!r}, '--signtool', str(signtool), '--no-cache'])\n"
+    )
+    imported = importtime(code)
+
+    assert "giftmaster.signtool" in imported
+    unused = ["giftmaster.aiosigntool", "asyncio", "giftmaster.plan"]
+    assert not [name for name in unused if name in imported]
@@ -0,0 +1,73 @@
+import pytest
+from fake_tsa import FakeTSA
+
+from giftmaster import signtool, timestamp
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_ranked_prefers_fast_and_healthy_servers():
+    manager = timestamp.TimeStampURLManager(["http://a", "http://b", "http://c"])
+    manager.record_success("http://a", 2.0)
+    manager.record_success("http://b", 0.5)
+    manager.record_success("http://c", 0.1)
+    manager.record_failure("http://c")
+
+    assert manager.ranked() == ["http://b", "http://a", "http://c"]
+    assert manager.url == "http://b"
+
+
+def test_ewma_latency():
+    manager = timestamp.TimeStampURLManager(["http://a"])
+    manager.record_success("http://a", 1.0)
+    manager.record_success("http://a", 2.0)
+    assert manager.stats["http://a"].latency == pytest.approx(1.3)
+
+
+def test_circuit_opens_and_cools_down(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(timestamp.time, "time", lambda: now)
+    manager = timestamp.TimeStampURLManager(["http://a", "http://b"])
+    manager.record_success("http://b", 9.0)
+    for _ in range(manager.FAILURE_THRESHOLD):
+        manager.record_failure("http://a")
+    assert manager.ranked() == ["http://b", "http://a"]
+
+    now += manager.COOLDOWN + 1
+    manager.record_failure("http://a")
+    assert manager.stats["http://a"].opened_at == now, "half-open trial failed"
+
+    now += manager.COOLDOWN + 1
+    manager.record_success("http://a", 0.1)
+    assert manager.ranked() == ["http://a", "http://b"]
+
+
+def test_stats_persist_between_runs(tmp_path):
+    state = tmp_path / "tsa.json"
+    manager = timestamp.TimeStampURLManager(["http://a"], state_path=state)
+    manager.record_success("http://a", 0.25)
+    manager.save()
+
+    again = timestamp.TimeStampURLManager(["http://a"], state_path=state)
+    assert again.stats["http://a"].latency == 0.25
+    state.write_text("not json")
+    assert timestamp.TimeStampURLManager(["http://a"], state_path=state).url
+
+
+def test_sign_retries_on_next_server(fake_signtool, unsigned_files, monkeypatch):
+    with FakeTSA(fail=True) as down, FakeTSA() as up:
+        manager = timestamp.TimeStampURLManager([down.url, up.url])
+        manager.record_success(down.url, 0.01)
+        manager.record_success(up.url, 1.0)
+        monkeypatch.setattr(signtool.SignTool, "url_manager", manager)
+
+        files = unsigned_files(3)
+        tool = signtool.SignTool.from_list(files, signtool=[str(fake_signtool)])
+        result = tool.sign_files(files)
+
+        assert result.returncode == 0
+        assert down.requests == 1 and up.requests == 3
+        assert manager.stats[down.url].failures == 1
+        assert manager.url == up.url
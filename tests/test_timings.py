@@ -0,0 +1,31 @@
+import pytest
+
+from giftmaster import timings as timingsmod
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+def test_timings_fit_spawn_and_per_file_cost(tmp_path):
+    timings = timingsmod.Timings(tmp_path / "timings.json")
+    for files in (1, 10, 100):
+        timings.observe("sign", files, 2.0 + 0.5 * files)
+
+    assert timings.coefficients("sign") == pytest.approx((2.0, 0.5))
+    assert timings.estimate("sign", 20) == pytest.approx(12.0)
+
+    timings.save()
+    assert timingsmod.Timings(tmp_path / "timings.json").estimate(
+        "sign", 20
+    ) == pytest.approx(12.0)
+
+
+def test_timings_defaults_and_single_size():
+    timings = timingsmod.Timings()
+    assert timings.coefficients("verify") == timingsmod.Timings.DEFAULTS["verify"]
+
+    timings.observe("verify", 10, 1.2)
+    spawn, per_file = timings.coefficients("verify")
+    assert per_file == timingsmod.Timings.DEFAULTS["verify"][1]
+    assert spawn + 10 * per_file == pytest.approx(1.2)
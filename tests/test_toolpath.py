@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from giftmaster import toolpath
+
+__author__ = "Taylor Monacelli"
+__copyright__ = "Taylor Monacelli"
+__license__ = "MPL-2.0"
+
+
+@pytest.fixture
+def sdk(tmp_path):
+    def install(version):
+        tool = tmp_path / "Windows Kits" / "10" / "bin" / version / "x64" / "signtool"
+        tool.parent.mkdir(parents=True)
+        tool.touch()
+        return tool
+
+    for version in ["10.0.9600.0", "10.0.22621.0", "10.0.19041.0"]:
+        install(version)
+    yield install, [
+        str(tmp_path / "Windows Kits" / "*" / "bin" / "*" / "x64" / "signtool")
+    ]
+    toolpath.clear()
+
+
+@pytest.fixture
+def glob_calls(monkeypatch):
+    calls = []
+    real = toolpath.pathfromglob.abspathglob
+
+    def abspathglob(*globs):
+        calls.append(globs)
+        return real(*globs)
+
+    monkeypatch.setattr(toolpath.pathfromglob, "abspathglob", abspathglob)
+    return calls
+
+
+def test_resolve_picks_newest_sdk_once_per_process(sdk, glob_calls):
+    _, globs = sdk
+    path = toolpath.resolve(globs)
+    assert path.parts[-3] == "10.0.22621.0"
+    assert toolpath.resolve(globs) == path
+    assert len(glob_calls) == 1
+
+
+def test_resolve_cache_between_runs(sdk, glob_calls, tmp_path):
+    install, globs = sdk
+    cache = tmp_path / "signtool-path.json"
+    first = toolpath.resolve(globs, cache_path=cache)
+
+    toolpath.clear()
+    assert toolpath.resolve(globs, cache_path=cache) == first
+    assert len(glob_calls) == 1
+
+    toolpath.clear()
+    newer = install("10.0.26100.0")
+    bin_dir = newer.parent.parent.parent
+    st = bin_dir.stat()
+    os.utime(bin_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert toolpath.resolve(globs, cache_path=cache) == newer
+    assert len(glob_calls) == 2
+
+
+def test_resolve_no_match(tmp_path):
+    with pytest.raises(ValueError):
+        toolpath.resolve([str(tmp_path / "nothing" / "*" / "signtool")])